@@ -0,0 +1,140 @@
+"""
+Async (ASGI) versions of ChatView and IntentCheckView, backed by AsyncCognitiveEngine.
+
+Routed instead of the DRF views when SERVER_MODE=asgi (see api/urls.py). DRF's APIView
+has no native async handlers, so these are plain Django async views that keep the same
+request/response contract: JSON bodies, Firebase bearer auth on chat, SSE streaming.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+
+from api.authentication import FirebaseAuthentication
+from api.views import log_interaction, sse_event, validate_queries, write_interaction
+from inference.async_engine import AsyncCognitiveEngine
+from inference.tracing import span
+from storage.log_writer import get_writer
+
+
+async def alog_interaction(user_id, query, result):
+    # Queuing for the background writer is non-blocking; only the inline path needs a thread
+    if get_writer() is not None:
+        log_interaction(user_id, query, result)
+    else:
+        with span("log"):
+            await sync_to_async(write_interaction)(user_id, query, result)
+
+
+class AsyncAPIView(View):
+    """Minimal async base: JSON body parsing and CSRF exemption (like DRF's APIView)."""
+    http_method_names = ['post', 'options']
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    @staticmethod
+    def parse_json(request):
+        """The request body as a dict, or None when it isn't a JSON object."""
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+
+
+class AsyncIntentCheckView(AsyncAPIView):
+    async def post(self, request):
+        data = self.parse_json(request)
+        if data is None:
+            return JsonResponse({"error": "Request body must be a JSON object"}, status=400)
+        query = data.get('query')
+        context = data.get('context', {})
+        if not query:
+            return JsonResponse({"error": "Query required"}, status=400)
+        with span("intent"):
+            result = await AsyncCognitiveEngine.analyze_intent(query, context)
+        return JsonResponse(result)
+
+
+class AsyncIntentBatchView(AsyncAPIView):
+    async def post(self, request):
+        data = self.parse_json(request)
+        if data is None:
+            return JsonResponse({"error": "Request body must be a JSON object"}, status=400)
+        queries = data.get('queries')
+        error = validate_queries(queries)
+        if error:
+            return JsonResponse({"error": error}, status=400)
+        with span("intent"):
+            results = await AsyncCognitiveEngine.analyze_intents(queries)
+        return JsonResponse({"results": results})
+
+
+class AsyncChatView(AsyncAPIView):
+    authentication = FirebaseAuthentication()
+
+    async def authenticate(self, request):
+        """Returns the Django user, or None. Token verification and get_or_create run off the loop."""
+        try:
+            result = await sync_to_async(self.authentication.authenticate)(request)
+        except exceptions.AuthenticationFailed:
+            return None
+        return result[0] if result else None
+
+    @staticmethod
+    def wants_stream(request, data):
+        if request.GET.get('stream') in ('1', 'true'):
+            return True
+        if data.get('stream') is True:
+            return True
+        return 'text/event-stream' in request.META.get('HTTP_ACCEPT', '')
+
+    def stream(self, user_id, query):
+        """Same events as ChatView.stream, produced by an async generator."""
+        async def events():
+            try:
+                async for event, data in AsyncCognitiveEngine.run_rag_flow_stream(query):
+                    yield sse_event(event, data)
+                    if event == 'done':
+                        await alog_interaction(user_id, query, data)
+            except Exception as e:
+                print(f"Chat Stream Error: {e}")
+                yield sse_event('error', {"error": str(e)})
+
+        response = StreamingHttpResponse(events(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def post(self, request):
+        """Same contract as ChatView.post."""
+        user = await self.authenticate(request)
+        if user is None:
+            return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+
+        data = self.parse_json(request)
+        if data is None:
+            return JsonResponse({"error": "Request body must be a JSON object"}, status=400)
+        messages = data.get('messages', [])
+        if not messages or not isinstance(messages, list) or not isinstance(messages[-1], dict):
+            return JsonResponse({"error": "Messages required"}, status=400)
+
+        last_message = messages[-1].get('content')
+        if not last_message:
+            return JsonResponse({"error": "Content required"}, status=400)
+
+        if self.wants_stream(request, data):
+            return self.stream(user.username, last_message)
+
+        try:
+            result = await AsyncCognitiveEngine.run_rag_flow(last_message)
+            await alog_interaction(user.username, last_message, result)
+            return JsonResponse(result)
+        except Exception as e:
+            print(f"Chat Error: {e}")
+            return JsonResponse({"error": str(e)}, status=500)
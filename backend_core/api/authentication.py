@@ -1,9 +1,11 @@
 from rest_framework.authentication import BaseAuthentication
 from rest_framework import exceptions
 import firebase_admin
-from firebase_admin import auth, credentials
+from firebase_admin import credentials
 import os
+import time
 from django.contrib.auth.models import User
+from api.token_cache import LRUCache, VerifiedTokenCache, get_verifier
 
 # Initialize Firebase Admin if not already initialized
 if not len(firebase_admin._apps):
@@ -17,23 +19,38 @@ if not len(firebase_admin._apps):
 class FirebaseAuthentication(BaseAuthentication):
     """
     Firebase Authentication Middleware for DRF.
+    Verified tokens and uid -> User lookups are cached per process (api/token_cache.py),
+    so a repeat request with the same token costs one hash lookup. Users are only cached
+    for AUTH_USER_CACHE_TTL seconds, so deactivating one takes effect within that window.
     """
+    token_cache = VerifiedTokenCache(max_entries=int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000")))
+    user_cache = LRUCache(max_entries=int(os.getenv("AUTH_USER_CACHE_SIZE", "4096")))
+    user_cache_ttl = float(os.getenv("AUTH_USER_CACHE_TTL", "60"))
+
     def authenticate(self, request):
         auth_header = request.META.get('HTTP_AUTHORIZATION')
         if not auth_header:
             return None
 
-        try:
-            token = auth_header.split(" ").pop()
-            decoded_token = auth.verify_id_token(token)
-            uid = decoded_token.get("uid")
-        except Exception:
-            raise exceptions.AuthenticationFailed('Invalid Firebase Token')
+        token = auth_header.split(" ").pop()
+        decoded_token = self.token_cache.get(token)
+        if decoded_token is None:
+            try:
+                decoded_token = get_verifier()(token)
+            except Exception:
+                raise exceptions.AuthenticationFailed('Invalid Firebase Token')
+            self.token_cache.set(token, decoded_token)
+        uid = decoded_token.get("uid")
 
         if not uid:
             return None
 
         # Return a mock user or get_or_create a Django user mapped to UID
         # For Phase 2 simple migration, we trust the UID
-        user, _ = User.objects.get_or_create(username=uid) 
+        user = self.user_cache.get(uid)
+        if user is None:
+            user, _ = User.objects.get_or_create(username=uid)
+            if not user.is_active:
+                raise exceptions.AuthenticationFailed('User inactive or deleted')
+            self.user_cache.set(uid, user, expires_at=time.time() + self.user_cache_ttl)
         return (user, None)
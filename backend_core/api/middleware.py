@@ -0,0 +1,96 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from inference import tracing
+
+
+class TracingMiddleware:
+    """
+    Opens a stage-timing trace (inference/tracing.py) for each API request and adds the
+    Server-Timing header. Streaming responses are finished when the stream ends, with
+    the trace re-activated around each chunk so spans recorded during generation count.
+    Works under both WSGI and ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+    PREFIX = "/api/"
+    UNMATCHED = "unmatched" # one label for every 404, so raw paths never become metric labels
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def traced(self, request) -> bool:
+        return tracing.ENABLED and request.path.startswith(self.PREFIX) and "/health/" not in request.path
+
+    def endpoint(self, request) -> str:
+        match = getattr(request, "resolver_match", None)
+        if match is None:
+            return self.UNMATCHED
+        return match.url_name or match.route
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.traced(request):
+            return self.get_response(request)
+        trace, token = tracing.start(request.path)
+        try:
+            response = self.get_response(request)
+        finally:
+            tracing.deactivate(token)
+        return self.finish(trace, request, response)
+
+    async def __acall__(self, request):
+        if not self.traced(request):
+            return await self.get_response(request)
+        trace, token = tracing.start(request.path)
+        try:
+            response = await self.get_response(request)
+        finally:
+            tracing.deactivate(token)
+        return self.finish(trace, request, response)
+
+    def finish(self, trace, request, response):
+        trace.name = self.endpoint(request)
+        response["Server-Timing"] = trace.server_timing()
+        if not getattr(response, "streaming", False):
+            trace.finish(response.status_code)
+            return response
+        if response.is_async:
+            response.streaming_content = self._astream(trace, response.status_code, response.streaming_content)
+        else:
+            response.streaming_content = self._stream(trace, response.status_code, response.streaming_content)
+        return response
+
+    @staticmethod
+    def _stream(trace, status, content):
+        iterator = iter(content)
+        try:
+            while True:
+                token = tracing.activate(trace)
+                try:
+                    chunk = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    tracing.deactivate(token)
+                yield chunk
+        finally:
+            trace.finish(status)
+
+    @staticmethod
+    async def _astream(trace, status, content):
+        iterator = content.__aiter__()
+        try:
+            while True:
+                token = tracing.activate(trace)
+                try:
+                    chunk = await iterator.__anext__()
+                except StopAsyncIteration:
+                    return
+                finally:
+                    tracing.deactivate(token)
+                yield chunk
+        finally:
+            trace.finish(status)
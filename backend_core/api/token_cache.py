@@ -0,0 +1,262 @@
+"""
+Cached Firebase ID-token verification for FirebaseAuthentication.
+
+The chat client reuses one ID token for its whole (1 hour) lifetime, so verification
+is done once per token and then served from memory:
+    VerifiedTokenCache - sha256(token) -> decoded claims, expiring at the token's `exp`
+    LRUCache           - uid -> Django User for a short TTL, so repeat requests skip get_or_create
+    PublicKeySet       - Google's securetoken x509 certs, fetched once, then refreshed
+                         by a background thread before their Cache-Control max-age runs out
+    TokenVerifier      - checks alg (RS256 only), kid, signature, aud, iss, exp/iat and sub
+                         locally against the key set
+
+Selected with the FIREBASE_TOKEN_VERIFIER setting: admin (default;
+firebase_admin.auth.verify_id_token, which fetches certs on the request path) or
+local (opt-in, the TokenVerifier above). Cert prewarm and background refresh only
+apply to local: firebase_admin keeps its own HTTP-cached certs and fetches them on
+the first verify after they expire, so with admin prewarm() is a no-op.
+"""
+import base64
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+CERTS_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+ISSUER_PREFIX = "https://securetoken.google.com/"
+
+
+def fetch_certs(url=CERTS_URL, timeout=5.0):
+    """Returns ({kid: pem}, max_age_seconds) from Google's x509 endpoint."""
+    import urllib.request
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        certs = json.loads(response.read().decode("utf-8"))
+        match = re.search(r"max-age=(\d+)", response.headers.get("Cache-Control", ""))
+    return certs, int(match.group(1)) if match else 3600
+
+
+class LRUCache:
+    """Thread-safe LRU map; entries may carry an absolute expiry (time.time())."""
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires_at=None):
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class VerifiedTokenCache:
+    """Decoded claims by token hash; an entry never outlives the token's `exp` claim."""
+
+    def __init__(self, max_entries=10000):
+        self._cache = LRUCache(max_entries)
+
+    @staticmethod
+    def key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str):
+        return self._cache.get(self.key(token))
+
+    def set(self, token: str, claims: dict):
+        expires_at = claims.get("exp")
+        if not expires_at or expires_at <= time.time():
+            return
+        self._cache.set(self.key(token), claims, expires_at=float(expires_at))
+
+
+class PublicKeySet:
+    """
+    Token-signing certs with background refresh. `fetch() -> ({kid: pem}, max_age)`;
+    the refresh thread renews them `refresh_margin` seconds before they expire (and
+    retries every `retry_seconds` on failure), so request threads never fetch.
+    """
+
+    def __init__(self, fetch=fetch_certs, refresh_margin=300, retry_seconds=30):
+        self.fetch = fetch
+        self.refresh_margin = refresh_margin
+        self.retry_seconds = retry_seconds
+        self._state = ({}, 0.0) # (certs, expires_at), swapped as one reference
+        self._fetched_at = float("-inf")
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def refresh(self):
+        certs, max_age = self.fetch()
+        self._state = (certs, time.time() + max_age)
+        self._fetched_at = time.monotonic()
+        return certs
+
+    def get(self, force=False) -> dict:
+        self.start()
+        certs, expires_at = self._state
+        if certs and not force and time.time() < expires_at:
+            return certs
+        with self._lock:
+            certs, expires_at = self._state
+            if certs and not force and time.time() < expires_at:
+                return certs
+            # Forced refreshes (unknown kid) are rate-limited so junk tokens can't drive fetches
+            if certs and force and time.monotonic() - self._fetched_at < self.retry_seconds:
+                return certs
+            return self.refresh()
+
+    def start(self):
+        """Pre-warms the certs and starts the refresh thread (lazily, so it survives fork)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="firebase-certs-refresh", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                if not self._state[0]:
+                    self.get() # under the lock, so it never races a request thread's fetch
+                delay = max(self._state[1] - time.time() - self.refresh_margin, 0)
+                time.sleep(delay)
+                self.refresh()
+            except Exception as e:
+                print(f"⚠️ Firebase cert refresh failed: {e}")
+                time.sleep(self.retry_seconds)
+
+
+class TokenVerifier:
+    """Local equivalent of firebase_admin.auth.verify_id_token (without revocation checks)."""
+
+    def __init__(self, project_id: str, key_set: PublicKeySet, clock_skew=10):
+        self.project_id = project_id
+        self.key_set = key_set
+        self.clock_skew = clock_skew
+
+    def verify(self, token: str) -> dict:
+        """Returns the decoded claims plus "uid"; raises ValueError for any invalid token."""
+        # Requires google-auth (installed with firebase-admin)
+        from google.auth import jwt
+
+        header = self.header(token)
+        # Firebase only signs with RS256; anything else (none, HS256, ES256...) is forged
+        if header.get("alg") != "RS256":
+            raise ValueError(f"Token has incorrect algorithm: {header.get('alg')!r}, expected 'RS256'")
+        kid = header.get("kid")
+        if not isinstance(kid, str) or not kid:
+            raise ValueError("Token has no key id (kid)")
+        certs = self.key_set.get()
+        if kid not in certs:
+            # Unknown kid: Google rotated the signing keys before our refresh got to it
+            certs = self.key_set.get(force=True)
+            if kid not in certs:
+                raise ValueError(f"Token key id {kid!r} is not a current Firebase signing key")
+
+        # Only the header's own cert is offered, so the signature must verify under it
+        claims = jwt.decode(
+            token, certs={kid: certs[kid]}, audience=self.project_id,
+            clock_skew_in_seconds=self.clock_skew,
+        )
+        self.check_claims(claims)
+        claims["uid"] = claims["sub"]
+        return claims
+
+    @staticmethod
+    def header(token: str) -> dict:
+        if not isinstance(token, str) or token.count(".") != 2:
+            raise ValueError("Token is not a JWT")
+        segment = token.split(".", 1)[0]
+        try:
+            header = json.loads(base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4)))
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Token header can't be decoded: {e}")
+        if not isinstance(header, dict):
+            raise ValueError("Token header is not a JSON object")
+        return header
+
+    def check_claims(self, claims: dict):
+        """The checks firebase_admin applies on top of the signature (except revocation)."""
+        now = time.time()
+        if claims.get("aud") != self.project_id:
+            raise ValueError(f"Token has incorrect audience: {claims.get('aud')}")
+        if claims.get("iss") != ISSUER_PREFIX + self.project_id:
+            raise ValueError(f"Token has incorrect issuer: {claims.get('iss')}")
+        for field in ("exp", "iat"):
+            value = claims.get(field)
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                raise ValueError(f"Token has no valid {field} claim")
+        if claims["exp"] < now - self.clock_skew:
+            raise ValueError("Token has expired")
+        if claims["iat"] > now + self.clock_skew:
+            raise ValueError("Token iat is in the future")
+        subject = claims.get("sub")
+        if not isinstance(subject, str) or not subject or len(subject) > 128:
+            raise ValueError("Token has an invalid subject")
+        auth_time = claims.get("auth_time", 0)
+        if not isinstance(auth_time, (int, float)) or auth_time > now + self.clock_skew:
+            raise ValueError("Token auth_time is invalid or in the future")
+
+
+_verifier = None
+_verifier_lock = threading.Lock()
+
+
+def get_verifier():
+    """
+    Process-wide verifier function, chosen by settings.FIREBASE_TOKEN_VERIFIER:
+    admin (default) or local (opt-in).
+    """
+    global _verifier
+    if _verifier is None:
+        with _verifier_lock:
+            if _verifier is None:
+                from django.conf import settings
+                choice = getattr(settings, "FIREBASE_TOKEN_VERIFIER", "admin")
+                if choice == "local":
+                    project_id = getattr(settings, "FIREBASE_PROJECT_ID", "student-resource-hub-a758a")
+                    _verifier = TokenVerifier(project_id, PublicKeySet()).verify
+                elif choice == "admin":
+                    from firebase_admin import auth
+                    _verifier = auth.verify_id_token
+                else:
+                    raise ValueError(f"Unknown FIREBASE_TOKEN_VERIFIER '{choice}'. Choose admin or local.")
+    return _verifier
+
+
+def prewarm() -> bool:
+    """
+    Fetches the signing certs and starts their refresh thread (gunicorn post_worker_init).
+    Returns False without fetching anything for the admin verifier, whose cert cache is
+    internal to firebase_admin.
+    """
+    verifier = get_verifier()
+    key_set = getattr(getattr(verifier, "__self__", None), "key_set", None)
+    if key_set is None:
+        return False
+    try:
+        key_set.get()
+    except Exception as e:
+        print(f"⚠️ Firebase cert prewarm failed (will retry in background): {e}")
+    return True
@@ -1,7 +1,19 @@
+import os
+
 from django.urls import path
-from .views import IntentCheckView, ChatView
+from . import async_views, views
+
+# Under ASGI (SERVER_MODE=asgi) chat and intent endpoints are served by async views
+ASGI = os.getenv("SERVER_MODE", "wsgi") == "asgi"
+IntentCheckView = async_views.AsyncIntentCheckView if ASGI else views.IntentCheckView
+IntentBatchView = async_views.AsyncIntentBatchView if ASGI else views.IntentBatchView
+ChatView = async_views.AsyncChatView if ASGI else views.ChatView
 
 urlpatterns = [
     path('intent_check/', IntentCheckView.as_view(), name='intent_check'),
+    path('intent_check/batch/', IntentBatchView.as_view(), name='intent_check_batch'),
     path('chat/', ChatView.as_view(), name='chat'),
+    path('content/', views.ContentCatalogView.as_view(), name='content'),
+    path('content/<slug:slug>/', views.ContentCatalogView.as_view(), name='content_detail'),
+    path('health/ready/', views.ReadinessView.as_view(), name='readiness'),
 ]
@@ -1,11 +1,35 @@
+import json
+from django.http import HttpResponse, StreamingHttpResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from inference.engine import CognitiveEngine
+from inference.tracing import render_metrics, span
 from api.authentication import FirebaseAuthentication
+from storage.log_writer import get_writer
 from storage.models import InteractionLog, UserProfile
 
+class ReadinessView(APIView):
+    """
+    Readiness probe. Returns 503 until the worker's CognitiveEngine is warm,
+    so the container only takes traffic once SDK clients are built.
+    """
+    authentication_classes = []
+
+    def get(self, request):
+        state = CognitiveEngine.readiness()
+        code = status.HTTP_200_OK if state["ready"] else status.HTTP_503_SERVICE_UNAVAILABLE
+        return Response(state, status=code)
+
+def metrics_view(request):
+    """Prometheus scrape endpoint for the stage-timing histograms (inference/tracing.py)."""
+    rendered = render_metrics()
+    if rendered is None:
+        return HttpResponse("prometheus_client not installed\n", status=503, content_type="text/plain")
+    body, content_type = rendered
+    return HttpResponse(body, content_type=content_type)
+
 class IntentCheckView(APIView):
     """
     API Endpoint for the 'Sidecar Brain'.
@@ -15,17 +39,145 @@ class IntentCheckView(APIView):
         context = request.data.get('context', {})
         if not query:
             return Response({"error": "Query required"}, status=status.HTTP_400_BAD_REQUEST)
-        result = CognitiveEngine.analyze_intent(query, context)
+        with span("intent"):
+            result = CognitiveEngine.analyze_intent(query, context)
         return Response(result, status=status.HTTP_200_OK)
 
+class ContentCatalogView(APIView):
+    """
+    Lesson lookups served from the content catalog (storage/catalog.py), never content/:
+        GET content/                   -> subjects
+        GET content/?subject=<name>    -> the subject's lessons in course order
+        GET content/<slug>/            -> lesson, resolved prerequisites and dependents
+                                          (?sections=true adds the per-section text)
+    """
+    def get(self, request, slug=None):
+        catalog = CognitiveEngine.get_catalog()
+        if not catalog:
+            return Response(
+                {"error": "Content catalog not built (manage.py build_content_catalog)"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        if slug is None:
+            subject = request.query_params.get('subject')
+            if not subject:
+                return Response({"subjects": catalog.subjects()}, status=status.HTTP_200_OK)
+            lessons = [self.summary(doc) for doc in catalog.by_subject(subject)]
+            return Response({"subject": subject, "lessons": lessons}, status=status.HTTP_200_OK)
+
+        doc = catalog.get(slug, request.query_params.get('subject'))
+        if doc is None:
+            return Response({"error": f"No lesson '{slug}'"}, status=status.HTTP_404_NOT_FOUND)
+        body = {
+            **self.summary(doc),
+            "prerequisites": catalog.prerequisites(doc),
+            "dependents": [self.summary(d) for d in catalog.dependents(doc)],
+        }
+        if request.query_params.get('sections') == 'true':
+            body["sections"] = catalog.sections(doc)
+        return Response(body, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def summary(doc):
+        return {key: value for key, value in doc.items() if key != "id"}
+
+MAX_BATCH_QUERIES = 1000
+
+def validate_queries(queries):
+    """Returns an error message for a bad intent batch payload, or None."""
+    if not isinstance(queries, list) or not queries:
+        return "queries must be a non-empty list"
+    if len(queries) > MAX_BATCH_QUERIES:
+        return f"At most {MAX_BATCH_QUERIES} queries per request"
+    if not all(isinstance(q, str) and q for q in queries):
+        return "Every query must be a non-empty string"
+    return None
+
+class IntentBatchView(APIView):
+    """
+    Bulk intent classification: { "queries": ["...", ...] } -> { "results": [...] },
+    one result per query in input order (see CognitiveEngine.analyze_intents).
+    """
+    def post(self, request):
+        queries = request.data.get('queries')
+        error = validate_queries(queries)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+        with span("intent"):
+            results = CognitiveEngine.analyze_intents(queries)
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+def log_interaction(user_id, query, result):
+    """
+    Records the InteractionLog row for a chat turn. Never raises (logging is non-blocking).
+    By default the row is queued for the background bulk writer (storage/log_writer.py)
+    so the response doesn't wait on Postgres; INTERACTION_LOG_MODE=sync writes inline.
+    """
+    with span("log"):
+        writer = get_writer()
+        if writer is not None:
+            writer.log(user_id, query, result)
+            return
+        write_interaction(user_id, query, result)
+
+def write_interaction(user_id, query, result):
+    """Inline InteractionLog write, used when INTERACTION_LOG_MODE=sync."""
+    try:
+        # user_id is the Django username (= Firebase UID)
+        user_profile, _ = UserProfile.objects.get_or_create(user_id=user_id)
+        
+        InteractionLog.objects.create(
+            user=user_profile,
+            query=query,
+            intent=result.get('intent', {}).get('intent', 'unknown'),
+            response=result.get('response', ''),
+            # feedback_score will be updated later via separate endpoint
+        )
+    except Exception as log_error:
+        print(f"⚠️ Logging Failed: {log_error}") # Non-blocking
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 class ChatView(APIView):
     authentication_classes = [FirebaseAuthentication]
     permission_classes = [IsAuthenticated]
 
+    @staticmethod
+    def wants_stream(request):
+        if request.query_params.get('stream') in ('1', 'true'):
+            return True
+        if request.data.get('stream') is True:
+            return True
+        return 'text/event-stream' in request.META.get('HTTP_ACCEPT', '')
+
+    def stream(self, user_id, query):
+        """
+        Server-sent events: `meta` (intent + sources) first, then `token` chunks as Gemini
+        generates them, then `done` with the full result. The InteractionLog row is queued
+        once the stream completes.
+        """
+        def events():
+            try:
+                for event, data in CognitiveEngine.run_rag_flow_stream(query):
+                    yield sse_event(event, data)
+                    if event == 'done':
+                        log_interaction(user_id, query, data)
+            except Exception as e:
+                print(f"Chat Stream Error: {e}")
+                yield sse_event('error', {"error": str(e)})
+
+        response = StreamingHttpResponse(events(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no' # Don't let proxies buffer the stream
+        return response
+
     def post(self, request):
         """
         Full RAG Chat Endpoint.
         Expects: { "messages": [ ... ] }
+        Streams server-sent events with `?stream=1`, `"stream": true` or
+        `Accept: text/event-stream`.
         """
         messages = request.data.get('messages', [])
         if not messages:
@@ -35,24 +187,16 @@ class ChatView(APIView):
         if not last_message:
              return Response({"error": "Content required"}, status=status.HTTP_400_BAD_REQUEST)
 
+        if self.wants_stream(request):
+            return self.stream(request.user.username, last_message)
+
         try:
             # 1. Execute Python-based RAG
             result = CognitiveEngine.run_rag_flow(last_message)
             
             # 2. Log Interaction (Data Pipeline)
-            try:
-                # request.user is the Django User (username=FirebaseUID)
-                user_profile, _ = UserProfile.objects.get_or_create(user_id=request.user.username)
-                
-                InteractionLog.objects.create(
-                    user=user_profile,
-                    query=last_message,
-                    intent=result.get('intent', {}).get('intent', 'unknown'),
-                    response=result.get('response', ''),
-                    # feedback_score will be updated later via separate endpoint
-                )
-            except Exception as log_error:
-                print(f"⚠️ Logging Failed: {log_error}") # Non-blocking
+            # request.user is the Django User (username=FirebaseUID)
+            log_interaction(request.user.username, last_message, result)
 
             return Response(result, status=status.HTTP_200_OK)
         except Exception as e:
@@ -0,0 +1,92 @@
+"""
+Micro-benchmark: compiled keyword matcher (inference/heuristics.py) vs the previous
+chain of `any(w in query_lower for w in [...])` scans, on 10k synthetic queries.
+match_many skips repeated queries, so it is also timed on the de-duplicated list: that
+figure is its real per-query scan cost, the full-list one mostly measures the repetition.
+
+    python -m benchmarks.bench_heuristics [--queries 10000] [--repeat 5]
+"""
+import argparse
+import random
+import time
+
+from inference.heuristics import KeywordIntentMatcher
+from training.generate_data import TEMPLATES, TOPICS
+
+FILLERS = [
+    "", "I don't understand ", "this is confusing, ", "quick one: ", "im lost, ",
+    "for my exam, ", "honestly this is hard. ", "can you help? ",
+]
+
+
+def legacy_heuristic(query: str) -> tuple:
+    """The pre-matcher implementation from CognitiveEngine.analyze_intent, for comparison."""
+    query_lower = query.lower()
+    intent = "exploratory_question"
+    if any(w in query_lower for w in ["define", "what is", "explain"]):
+        intent = "concept_learning"
+    elif any(w in query_lower for w in ["how to", "code for", "implement", "error", "bug"]):
+        intent = "problem_solving"
+    elif any(w in query_lower for w in ["interview", "question", "mock"]):
+        intent = "interview_preparation"
+    elif any(w in query_lower for w in ["summary", "recap", "review"]):
+        intent = "quick_revision"
+    is_confused = any(w in query_lower for w in ["don't understand", "im lost", "confusing", "hard"])
+    return intent, 0.85, is_confused
+
+
+def make_queries(n: int, seed: int = 0) -> list:
+    """[(query, template intent)] from training/generate_data.py templates plus filler prefixes."""
+    rng = random.Random(seed)
+    templates = [(t, intent) for intent, group in TEMPLATES.items() for t in group]
+    samples = []
+    for _ in range(n):
+        template, intent = rng.choice(templates)
+        samples.append((rng.choice(FILLERS) + template.format(topic=rng.choice(TOPICS)), intent))
+    return samples
+
+
+def best_of(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--queries", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    samples = make_queries(args.queries)
+    queries = [query for query, _ in samples]
+    distinct = list(dict.fromkeys(queries))
+    matcher = KeywordIntentMatcher.from_file()
+
+    for label, batch in (("all", queries), ("distinct", distinct)):
+        timings = {
+            "legacy any() scans": best_of(lambda: [legacy_heuristic(q) for q in batch], args.repeat),
+            "matcher.match": best_of(lambda: [matcher.match(q) for q in batch], args.repeat),
+            "matcher.match_many": best_of(lambda: matcher.match_many(batch), args.repeat),
+        }
+        baseline = timings["legacy any() scans"]
+        print(f"{len(batch)} queries ({label}), best of {args.repeat}:")
+        for name, seconds in timings.items():
+            print(f"  {name:<20} {seconds * 1e3:8.2f} ms  {seconds / len(batch) * 1e6:6.2f} us/query  {baseline / seconds:5.2f}x")
+
+    legacy = [legacy_heuristic(q) for q in queries]
+    single = [matcher.match(q) for q in queries]
+    assert single == matcher.match_many(queries), "match and match_many disagree"
+    same_intent = sum(a[0] == b[0] for a, b in zip(legacy, single)) / len(queries)
+    same_confused = sum(a[2] == b[2] for a, b in zip(legacy, single)) / len(queries)
+    print(f"Agreement with legacy rules: intent {same_intent:.1%}, confusion {same_confused:.1%}")
+    for name, results in (("legacy", legacy), ("matcher", single)):
+        accuracy = sum(r[0] == label for r, (_, label) in zip(results, samples)) / len(samples)
+        print(f"  {name} accuracy vs template intents: {accuracy:.1%}")
+
+
+if __name__ == "__main__":
+    main()
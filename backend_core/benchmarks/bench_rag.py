@@ -0,0 +1,223 @@
+"""
+RAG latency/throughput benchmark, run in-process on a plain CPU box without credentials.
+
+Vertex embeddings, Gemini and Firestore are replaced by the deterministic fakes in
+inference/fakes.py with configurable injected latency; the intent model, retrieval
+code, context assembly and DRF views are the real ones. For each scenario and
+concurrency level it reports p50/p95/p99 latency, requests/s and peak RSS, and can
+save the run as JSON and compare it against a saved baseline.
+
+    python -m benchmarks.bench_rag --out results.json
+    python -m benchmarks.bench_rag --baseline results.json --fail-on-regression
+
+Scenarios: intent (CognitiveEngine.analyze_intent), rag (run_rag_flow),
+intent_view (IntentCheckView), chat_view (ChatView, blocking JSON response).
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SCENARIOS = ("intent", "rag", "intent_view", "chat_view")
+
+
+def setup_django(args):
+    # Engine config is read from the environment at import time, so set it first
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "cognitive_core.settings")
+    os.environ["RETRIEVAL_BACKEND"] = "firestore"
+    os.environ.setdefault("RESPONSE_CACHE_BACKEND", "memory" if args.response_cache else "off")
+    os.environ.setdefault("EMBEDDING_CACHE_DIR", "off")
+    os.environ.setdefault("LEXICAL_INDEX_DIR", tempfile.mkdtemp(prefix="bench-no-lexical-"))
+    os.environ.setdefault("TRACING_LOG", "false")
+    import django
+    django.setup()
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 # KB on Linux
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def run_load(fn, queries: list, concurrency: int, total: int) -> dict:
+    """Runs `total` calls of fn(query) from `concurrency` threads; returns latency stats."""
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    counter = iter(range(total))
+
+    def worker():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            try:
+                fn(queries[i % len(queries)])
+            except Exception as e:
+                with lock:
+                    errors[0] += 1
+                    first = errors[0] == 1
+                if first:
+                    print(f"⚠️ First error: {e}")
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors[0],
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+        "rps": round(total / wall, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def build_scenarios():
+    from django.contrib.auth.models import User
+    from rest_framework.test import APIRequestFactory, force_authenticate
+
+    from api.views import ChatView, IntentCheckView
+    from inference.engine import CognitiveEngine
+
+    factory = APIRequestFactory()
+    user = User(username="bench-user")
+    chat_view = ChatView.as_view()
+    intent_view = IntentCheckView.as_view()
+
+    def call_view(view, path, payload, authenticate=False):
+        request = factory.post(path, payload, format="json")
+        if authenticate:
+            force_authenticate(request, user=user)
+        response = view(request)
+        response.render()
+        if response.status_code != 200:
+            raise RuntimeError(f"{path} returned {response.status_code}: {response.content[:200]}")
+        return response
+
+    return {
+        "intent": CognitiveEngine.analyze_intent,
+        "rag": CognitiveEngine.run_rag_flow,
+        "intent_view": lambda q: call_view(intent_view, "/api/v1/intent_check/", {"query": q}),
+        "chat_view": lambda q: call_view(
+            chat_view, "/api/v1/chat/", {"messages": [{"role": "user", "content": q}]}, authenticate=True
+        ),
+    }
+
+
+def compare(results: list, baseline: dict, tolerance: float) -> list:
+    """Prints deltas against the baseline; returns the regressions found."""
+    previous = {(r["scenario"], r["concurrency"]): r for r in baseline.get("results", [])}
+    regressions = []
+    print(f"\nvs baseline ({baseline.get('meta', {}).get('timestamp', '?')}), tolerance {tolerance:.0%}:")
+    for r in results:
+        old = previous.get((r["scenario"], r["concurrency"]))
+        if not old:
+            continue
+        p95 = (r["p95_ms"] - old["p95_ms"]) / old["p95_ms"] if old["p95_ms"] else 0.0
+        rps = (r["rps"] - old["rps"]) / old["rps"] if old["rps"] else 0.0
+        regressed = p95 > tolerance or rps < -tolerance
+        print(f"  {r['scenario']:<12} c={r['concurrency']:<3} p95 {p95:+7.1%}  rps {rps:+7.1%}{'  ❌' if regressed else ''}")
+        if regressed:
+            regressions.append((r["scenario"], r["concurrency"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-process RAG latency/throughput benchmark with local fakes")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario and concurrency level")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="Seconds per fake embedding call")
+    parser.add_argument("--retrieve-latency", type=float, default=0.03, help="Seconds per fake Firestore query")
+    parser.add_argument("--generate-latency", type=float, default=0.3, help="Seconds per fake Gemini call")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Extra seconds per generated word")
+    parser.add_argument("--response-cache", action="store_true", help="Keep the semantic response cache on")
+    parser.add_argument("--out", help="Write results JSON here")
+    parser.add_argument("--baseline", help="Compare against a previous results JSON")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed p95/rps change vs baseline")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    setup_django(args)
+    from benchmarks.bench_heuristics import make_queries
+    from inference.engine import CognitiveEngine
+    from inference.fakes import install_fakes
+    from storage.log_writer import InteractionLogWriter, install_writer
+
+    install_fakes(
+        CognitiveEngine,
+        embed_latency=args.embed_latency,
+        retrieve_latency=args.retrieve_latency,
+        generate_latency=args.generate_latency,
+        token_latency=args.token_latency,
+    )
+    install_writer(InteractionLogWriter(sink=lambda records: None)) # no database needed
+    model = CognitiveEngine.get_model()
+    queries = [query for query, _ in make_queries(max(args.requests, 1000))]
+    scenarios = build_scenarios()
+
+    print(f"🏁 Intent model: {model.model_version if model else 'heuristic (no weights found)'}; "
+          f"baseline RSS {peak_rss_mb():.0f}MB")
+    results = []
+    for name in args.scenarios:
+        fn = scenarios[name]
+        run_load(fn, queries, 1, args.warmup)
+        for concurrency in args.concurrency:
+            stats = run_load(fn, queries, concurrency, args.requests)
+            results.append({"scenario": name, "concurrency": concurrency, **stats})
+            print(
+                f"  {name:<12} c={concurrency:<3} p50 {stats['p50_ms']:8.2f}ms  p95 {stats['p95_ms']:8.2f}ms  "
+                f"p99 {stats['p99_ms']:8.2f}ms  {stats['rps']:8.1f} req/s  peak RSS {stats['peak_rss_mb']:.0f}MB"
+                f"{'  errors=' + str(stats['errors']) if stats['errors'] else ''}"
+            )
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "intent_model": model.model_version if model else "v1-heuristic-python",
+            "config": {k: v for k, v in vars(args).items() if k not in ("out", "baseline")},
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Results saved to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+"""
+ASGI config for cognitive_core project.
+
+Served by uvicorn workers under gunicorn when SERVER_MODE=asgi (see gunicorn.conf.py);
+chat and intent requests then go through the async views in api/async_views.py.
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cognitive_core.settings')
+
+application = get_asgi_application()
+
+# Preload mode: same as wsgi.py, the intent model is loaded once in the gunicorn master.
+if os.getenv("GUNICORN_PRELOAD", "true").lower() == "true":
+    from inference.engine import CognitiveEngine
+    from inference.memory import format_memory
+    print(format_memory("before preload"))
+    CognitiveEngine.preload()
+    print(format_memory("after preload"))
@@ -29,6 +29,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.TracingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -116,3 +117,9 @@ REST_FRAMEWORK = {
 
 CORS_ALLOW_ALL_ORIGINS = True 
 CORS_ALLOW_CREDENTIALS = True
+
+# Firebase ID-token verification (api/token_cache.py): "admin" uses
+# firebase_admin.auth.verify_id_token; "local" (opt-in) verifies in-process
+# against background-refreshed signing certs.
+FIREBASE_TOKEN_VERIFIER = os.getenv("FIREBASE_TOKEN_VERIFIER", "admin")
+FIREBASE_PROJECT_ID = os.getenv("FIREBASE_PROJECT_ID", "student-resource-hub-a758a")
@@ -9,3 +9,15 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cognitive_core.settings')
 
 application = get_wsgi_application()
+
+# Preload mode: load the intent model at import time. Under gunicorn's preload_app
+# this runs once in the master, and workers inherit the weights copy-on-write. Pages
+# only stay shared while nothing writes to them: tensor storage is read-only at
+# inference, and preload()'s gc.freeze() stops the collector writing GC headers of the
+# inherited objects. Refcount updates on objects the workers touch still copy their pages.
+if os.getenv("GUNICORN_PRELOAD", "true").lower() == "true":
+    from inference.engine import CognitiveEngine
+    from inference.memory import format_memory
+    print(format_memory("before preload"))
+    CognitiveEngine.preload()
+    print(format_memory("after preload"))
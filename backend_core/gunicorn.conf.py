@@ -0,0 +1,54 @@
+"""
+Gunicorn config for the Cognitive Core.
+
+With preload_app (GUNICORN_PRELOAD, default on) the master imports the WSGI app,
+which loads DistilBERT once before fork; workers share those pages copy-on-write.
+Workers then cap their torch threads and warm the CognitiveEngine (Vertex AI,
+Firestore) in post_worker_init, i.e. before they accept their first connection,
+so no chat request pays the SDK/model construction cost.
+
+SERVER_MODE=asgi serves cognitive_core.asgi with uvicorn workers instead: each worker
+runs one event loop (`threads` is ignored) and chat/intent go through the async views,
+with BERT inference awaited through the shared intent batcher.
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+timeout = 0
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+
+if os.getenv("SERVER_MODE", "wsgi") == "asgi":
+    wsgi_app = "cognitive_core.asgi:application"
+    worker_class = "uvicorn.workers.UvicornWorker"
+else:
+    wsgi_app = "cognitive_core.wsgi:application"
+
+
+def post_fork(server, worker):
+    from inference.engine import CognitiveEngine
+    num_threads = CognitiveEngine.configure_worker_threads(workers)
+    server.log.info(f"Worker {worker.pid}: torch threads={num_threads}")
+
+
+def post_worker_init(worker):
+    from api.token_cache import prewarm
+    from inference.engine import CognitiveEngine
+    from inference.memory import format_memory
+    prewarm() # FIREBASE_TOKEN_VERIFIER=local only: signing certs, refreshed in the background from here on
+    print(format_memory(f"worker {worker.pid} before warmup"))
+    CognitiveEngine.warmup()
+    print(format_memory(f"worker {worker.pid} after warmup"))
+
+
+def worker_exit(server, worker):
+    from storage.log_writer import shutdown
+    shutdown() # write any queued InteractionLog rows before the worker goes away
+
+
+def child_exit(server, worker):
+    # prometheus_client multi-process mode: drop the dead worker's live gauges
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
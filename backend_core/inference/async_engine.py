@@ -0,0 +1,257 @@
+"""
+Async execution path for the RAG pipeline, used by the ASGI views (api/async_views.py).
+
+Shares all process state (clients, model, caches, indexes) with CognitiveEngine; only
+the orchestration differs:
+    - BERT intent inference awaits the shared MicroBatcher's future, so concurrent requests
+      still batch together; unbatched inference runs on a small dedicated thread pool.
+    - Intent classification, lexical search and the query embedding run concurrently
+      (they're independent); the embedding is discarded when a cache or fast-path hit
+      makes it unnecessary.
+    - SDK clients, the student and the keyword rules are built on a worker thread the
+      first time they're needed; afterwards the registry lookup is a dict read.
+    - Blocking work (embedding-store file I/O, BM25, cache lookups, context assembly,
+      retrieval) runs on worker threads, never on the loop.
+    - Vertex/Gemini calls use the SDK's *_async methods when available, otherwise a thread.
+"""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from inference.engine import CognitiveEngine
+from inference.lexical import BM25Index
+from inference.tracing import span, tag
+
+_SENTINEL = object()
+
+
+class AsyncCognitiveEngine:
+    INTENT_EXECUTOR_THREADS = int(os.getenv("INTENT_EXECUTOR_THREADS", "2"))
+    _executor = None
+
+    @classmethod
+    def get_executor(cls):
+        if cls._executor is None:
+            cls._executor = ThreadPoolExecutor(
+                max_workers=cls.INTENT_EXECUTOR_THREADS, thread_name_prefix="intent-cpu"
+            )
+        return cls._executor
+
+    @staticmethod
+    async def client(name: str, getter):
+        """
+        CognitiveEngine's registered client `name`; builds it via `getter` on a worker
+        thread the first time (SDK imports, file loads), so the loop never blocks on it.
+        """
+        client = CognitiveEngine._clients.get(name)
+        if client is None:
+            client = await asyncio.to_thread(getter)
+        return client
+
+    @classmethod
+    async def analyze_intent(cls, query: str, context: dict = None) -> dict:
+        """Async counterpart of CognitiveEngine.analyze_intent (same tiers and fallbacks)."""
+        await cls.client("heuristics", CognitiveEngine.get_heuristics)
+        await cls.client("intent_student", CognitiveEngine.get_student)
+        # Once loaded, keyword rules and the student are in-process numpy: microseconds, fine on the loop
+        result, heuristic, student_guess = CognitiveEngine._intent_prelude(query)
+        if result:
+            return result
+
+        model = CognitiveEngine._model
+        if model is None:
+            model = await asyncio.to_thread(CognitiveEngine.get_model) # first load reads weights from disk
+        if not (model and CognitiveEngine._tokenizer):
+            return CognitiveEngine._intent_without_model(heuristic, student_guess)
+        tag("intent_tier", "model")
+        try:
+            if CognitiveEngine.INTENT_BATCHING:
+                future = CognitiveEngine.get_intent_batcher().submit(query)
+                try:
+                    intent, confidence = await asyncio.wait_for(
+                        asyncio.wrap_future(future), CognitiveEngine.INTENT_BATCH_TIMEOUT_MS / 1000.0
+                    )
+                except asyncio.TimeoutError:
+                    future.cancel()
+                    return CognitiveEngine._intent_batch_timeout(heuristic)
+            else:
+                loop = asyncio.get_running_loop()
+                predictions = await loop.run_in_executor(cls.get_executor(), CognitiveEngine._predict_batch, [query])
+                intent, confidence = predictions[0]
+        except Exception as e:
+            print(f"Inference Error: {e}")
+            intent = "exploratory_question"
+            confidence = 0.5
+        return CognitiveEngine._intent_result(intent, confidence, heuristic[2], model.model_version)
+
+    @classmethod
+    async def analyze_intents(cls, queries: list) -> list:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(cls.get_executor(), CognitiveEngine.analyze_intents, queries)
+
+    @classmethod
+    async def get_embedding(cls, text: str) -> list:
+        store = await cls.client("embedding_store", CognitiveEngine.get_embedding_store)
+        if store:
+            # flock + memmap reads: off the loop
+            cached = await asyncio.to_thread(store.get, text)
+            if cached is not None:
+                return cached
+        model = await cls.client("embedding", CognitiveEngine.get_embedding_model)
+        if hasattr(model, "get_embeddings_async"):
+            embeddings = await model.get_embeddings_async([text])
+        else:
+            embeddings = await asyncio.to_thread(model.get_embeddings, [text])
+        vector = embeddings[0].values
+        if store:
+            await asyncio.to_thread(store.put, text, vector)
+        return vector
+
+    @classmethod
+    async def generate_response(cls, query: str, context: str, intent: dict) -> str:
+        model = await cls.client("generative", CognitiveEngine.get_generative_model)
+        contents = [CognitiveEngine.build_prompt(context, intent), query]
+        config = {"temperature": 0.2}
+        if hasattr(model, "generate_content_async"):
+            response = await model.generate_content_async(contents, generation_config=config)
+        else:
+            response = await asyncio.to_thread(model.generate_content, contents, generation_config=config)
+        return response.text
+
+    @classmethod
+    async def generate_response_stream(cls, query: str, context: str, intent: dict):
+        model = await cls.client("generative", CognitiveEngine.get_generative_model)
+        contents = [CognitiveEngine.build_prompt(context, intent), query]
+        config = {"temperature": 0.2}
+        if hasattr(model, "generate_content_async"):
+            response = await model.generate_content_async(contents, generation_config=config, stream=True)
+            async for chunk in response:
+                if chunk.text:
+                    yield chunk.text
+            return
+        # Sync SDK / fake: pull each chunk on a worker thread
+        iterator = iter(await asyncio.to_thread(model.generate_content, contents, generation_config=config, stream=True))
+        while True:
+            chunk = await asyncio.to_thread(next, iterator, _SENTINEL)
+            if chunk is _SENTINEL:
+                return
+            if chunk.text:
+                yield chunk.text
+
+    @staticmethod
+    async def _timed(stage: str, awaitable):
+        # Concurrent stages each get their own span (they overlap in Server-Timing)
+        with span(stage):
+            return await awaitable
+
+    @staticmethod
+    def _discard(task):
+        # The result isn't needed; also consume a late exception so asyncio doesn't log it
+        task.cancel()
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    @classmethod
+    async def prepare_rag(cls, query: str) -> dict:
+        """Async counterpart of CognitiveEngine.prepare_rag (same state dict)."""
+        if not CognitiveEngine._initialized:
+            with span("init"):
+                await asyncio.to_thread(CognitiveEngine.initialize)
+
+        # 1. Intent, lexical search and the embedding are independent: run them concurrently.
+        # The embedding is only awaited once the exact cache and the fast path have missed.
+        embedding = asyncio.ensure_future(cls._timed("embed", cls.get_embedding(query)))
+        try:
+            intent_data, lexical_hits = await asyncio.gather(
+                cls._timed("intent", cls.analyze_intent(query)),
+                cls._timed("retrieve", asyncio.to_thread(CognitiveEngine.lexical_search, query)),
+            )
+            intent = intent_data.get("intent")
+            tag("intent", intent)
+            state = {"intent_data": intent_data, "intent": intent, "cached": None, "vector": None, "chunks": []}
+
+            # 1b. Exact cache hit: the embedding is dropped
+            cache = await cls.client("response_cache", CognitiveEngine.get_response_cache)
+            if cache:
+                cached = await asyncio.to_thread(cache.get_exact, query, intent)
+                if cached is not None:
+                    state["cached"] = ("exact", cached)
+                    tag("cached", "exact")
+                    cls._discard(embedding)
+                    return state
+
+            if CognitiveEngine.LEXICAL_FASTPATH and BM25Index.is_confident(
+                lexical_hits, CognitiveEngine.LEXICAL_FASTPATH_MIN_SCORE, CognitiveEngine.LEXICAL_FASTPATH_MARGIN
+            ):
+                # 2a. High-confidence keyword hit: no vector search, embedding dropped
+                state["chunks"] = CognitiveEngine.select_chunks(lexical_hits, CognitiveEngine.CONTEXT_MAX_CHUNKS)
+                tag("lexical_fastpath", True)
+                cls._discard(embedding)
+                return state
+        except BaseException:
+            cls._discard(embedding)
+            raise
+
+        # 2b. Embedding (usually already done by now)
+        vector = await embedding
+        state["vector"] = vector
+
+        # 2c. Near-duplicate cache hit (same intent, cosine >= threshold)
+        if cache:
+            cached = await asyncio.to_thread(cache.get_similar, vector, intent)
+            if cached is not None:
+                state["cached"] = ("semantic", cached)
+                tag("cached", "semantic")
+                return state
+
+        # 3. Retrieval backends are sync (Firestore / Postgres / in-process): run off the loop
+        with span("retrieve"):
+            state["chunks"] = await asyncio.to_thread(
+                CognitiveEngine.retrieve_chunks, vector, CognitiveEngine.CONTEXT_MAX_CHUNKS, query, lexical_hits
+            )
+        return state
+
+    @classmethod
+    async def run_rag_flow(cls, query: str) -> dict:
+        state = await cls.prepare_rag(query)
+        if state["cached"]:
+            kind, cached = state["cached"]
+            return {**cached, "intent": state["intent_data"], "cached": kind}
+
+        context, _, usage = await asyncio.to_thread(CognitiveEngine.assemble_context, query, state)
+        with span("generate"):
+            response = await cls.generate_response(query, context, state["intent_data"])
+        result = {
+            "response": response,
+            "context_used": bool(context)
+        }
+        await asyncio.to_thread(CognitiveEngine._store_result, query, state, result)
+        return {**result, "intent": state["intent_data"], "cached": False, "usage": usage}
+
+    @classmethod
+    async def run_rag_flow_stream(cls, query: str):
+        """Async counterpart of CognitiveEngine.run_rag_flow_stream (same events)."""
+        state = await cls.prepare_rag(query)
+        intent_data = state["intent_data"]
+
+        if state["cached"]:
+            kind, cached = state["cached"]
+            yield "meta", {"intent": intent_data, "sources": [], "cached": kind}
+            yield "token", {"text": cached.get("response", "")}
+            yield "done", {**cached, "intent": intent_data, "cached": kind}
+            return
+
+        context, used, usage = await asyncio.to_thread(CognitiveEngine.assemble_context, query, state)
+        yield "meta", {"intent": intent_data, "sources": CognitiveEngine.sources(used), "cached": False}
+
+        parts = []
+        with span("generate"):
+            async for text in cls.generate_response_stream(query, context, intent_data):
+                parts.append(text)
+                yield "token", {"text": text}
+
+        result = {
+            "response": "".join(parts),
+            "context_used": bool(context)
+        }
+        await asyncio.to_thread(CognitiveEngine._store_result, query, state, result)
+        yield "done", {**result, "intent": intent_data, "cached": False, "usage": usage}
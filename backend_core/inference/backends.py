@@ -0,0 +1,124 @@
+"""
+Pluggable CPU backends for the DistilBERT intent classifier.
+
+Every backend exposes the same contract to CognitiveEngine:
+    backend.load()                    -> loads tokenizer + weights from model_dir
+    backend.predict_proba(queries)    -> numpy array (len(queries), num_labels)
+
+Selected with the INTENT_BACKEND env var:
+    torch  - full precision PyTorch (default, reference implementation)
+    int8   - PyTorch with dynamic int8 quantization of the Linear layers
+    onnx   - ONNX Runtime session over the graph exported by training/train_bert.py
+"""
+import os
+import numpy as np
+import torch
+import torch.nn.functional as F
+from transformers import DistilBertTokenizerFast, DistilBertForSequenceClassification
+
+ONNX_FILE = "model.onnx"
+
+
+class TorchIntentBackend:
+    name = "torch"
+    model_version = "v3-distilbert"
+    # Safe to load in the gunicorn master and inherit across fork
+    fork_safe = True
+    # Fast (Rust) tokenizer: same ids as the slow one, and context assembly
+    # (inference/context.py) relies on its offset mappings
+    tokenizer_class = DistilBertTokenizerFast
+
+    def __init__(self, model_dir: str, max_len: int = 64):
+        self.model_dir = model_dir
+        self.max_len = max_len
+        self.tokenizer = None
+        self.model = None
+
+    def load(self):
+        self.tokenizer = self.tokenizer_class.from_pretrained(self.model_dir)
+        self.model = self._load_weights()
+        return self
+
+    def _load_weights(self):
+        model = DistilBertForSequenceClassification.from_pretrained(self.model_dir)
+        model.eval() # Set to inference mode
+        # Inference only: skips autograd bookkeeping on every forward pass. This does not keep
+        # pages shared after fork; refcount and GC-header writes do the dirtying (see preload's gc.freeze).
+        model.requires_grad_(False)
+        return model
+
+    def tokenize(self, queries: list, return_tensors="pt"):
+        return self.tokenizer(
+            queries,
+            return_tensors=return_tensors,
+            truncation=True,
+            padding=True,
+            max_length=self.max_len
+        )
+
+    def predict_proba(self, queries: list) -> np.ndarray:
+        inputs = self.tokenize(queries)
+        with torch.no_grad():
+            outputs = self.model(**inputs)
+        return F.softmax(outputs.logits, dim=1).numpy()
+
+
+class QuantizedIntentBackend(TorchIntentBackend):
+    """Dynamic int8 quantization: Linear weights stored as int8, activations quantized on the fly."""
+    name = "int8"
+    model_version = "v3-distilbert-int8"
+
+    def _load_weights(self):
+        model = super()._load_weights()
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class OnnxIntentBackend(TorchIntentBackend):
+    name = "onnx"
+    model_version = "v3-distilbert-onnx"
+    # ORT sessions own thread pools that do not survive fork; load per worker instead
+    fork_safe = False
+
+    def __init__(self, model_dir: str, max_len: int = 64, onnx_file: str = None):
+        super().__init__(model_dir, max_len)
+        self.onnx_file = onnx_file or os.getenv("INTENT_ONNX_FILE", ONNX_FILE)
+
+    def _load_weights(self):
+        # Optional dependency (requirements-onnx.txt): only needed when INTENT_BACKEND=onnx
+        import onnxruntime as ort
+
+        path = os.path.join(self.model_dir, self.onnx_file)
+        if not os.path.exists(path):
+            raise FileNotFoundError(
+                f"{path} not found. Run `python -m training.train_bert export-onnx` first."
+            )
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = torch.get_num_threads()
+        return ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+
+    def predict_proba(self, queries: list) -> np.ndarray:
+        inputs = self.tokenize(queries, return_tensors="np")
+        feeds = {
+            "input_ids": inputs["input_ids"].astype(np.int64),
+            "attention_mask": inputs["attention_mask"].astype(np.int64),
+        }
+        logits = self.model.run(["logits"], feeds)[0]
+        logits = logits - logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+
+BACKENDS = {
+    TorchIntentBackend.name: TorchIntentBackend,
+    QuantizedIntentBackend.name: QuantizedIntentBackend,
+    OnnxIntentBackend.name: OnnxIntentBackend,
+}
+
+
+def get_backend(name: str, model_dir: str, max_len: int = 64):
+    try:
+        backend_cls = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown intent backend '{name}'. Choose one of: {', '.join(BACKENDS)}")
+    return backend_cls(model_dir, max_len)
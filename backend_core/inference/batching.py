@@ -0,0 +1,97 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """
+    Dynamic batching queue in front of a batch function.
+
+    Callers submit single items from any request thread; a background thread
+    collects them for up to `max_wait_ms` (or until `max_batch_size` items are
+    waiting), runs `batch_fn` once on the whole batch and hands each caller
+    its own result back.
+
+    `batch_fn(items) -> results` must return one result per item, in order.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=16, max_wait_ms=5.0, name="micro-batcher"):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock() # guards _thread; held while queuing so stop() can't interleave
+
+    def submit(self, item) -> Future:
+        future = Future()
+        with self._lock:
+            self._ensure_started()
+            self._queue.put((item, future))
+        return future
+
+    def __call__(self, item, timeout=None):
+        """Blocking convenience wrapper: submit and wait for the result."""
+        return self.submit(item).result(timeout=timeout)
+
+    def stop(self, timeout=None):
+        """
+        Runs everything submitted so far, then ends the background thread (waiting up to
+        `timeout` seconds for it). A later submit() starts a new one.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is None or not thread.is_alive():
+                return
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def _ensure_started(self):
+        # Threads don't survive fork, so the loop is started lazily in the process that uses it
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def _collect(self):
+        """Returns (batch, stop): stop once the sentinel from stop() has been taken."""
+        first = self._queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                entry = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if entry is None:
+                return batch, True
+            batch.append(entry)
+        return batch, False
+
+    def _run(self):
+        stop = False
+        while not stop:
+            collected, stop = self._collect()
+            # Callers that timed out cancel their future; drop those rather than run them
+            batch = [(item, future) for item, future in collected if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            items = [item for item, _ in batch]
+            try:
+                results = self.batch_fn(items)
+                if len(results) != len(items):
+                    raise RuntimeError(
+                        f"{self.name}: batch_fn returned {len(results)} results for {len(items)} items"
+                    )
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
@@ -0,0 +1,293 @@
+"""
+Semantic response cache for the RAG flow.
+
+Answers repeat questions without touching Vertex/Firestore/Gemini:
+    1. Exact hit  - same normalized query + same intent (checked before embedding).
+    2. Semantic hit - cosine similarity of the query embedding >= threshold,
+                      restricted to entries with the same intent.
+
+Storage is pluggable:
+    InMemoryCacheBackend - per-process LRU with TTL (default)
+    DjangoCacheBackend   - adapter over a Django cache alias (e.g. Redis/Memcached),
+                           shared between workers and instances
+Both keep a per-intent VectorIndex (a pre-normalized numpy matrix) that set() updates,
+so the semantic lookup never rebuilds vectors from stored entries.
+"""
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class VectorIndex:
+    """
+    One intent's cached query vectors as a single pre-normalized float32 matrix, kept in
+    step with the backend on every set/evict, so a semantic lookup is one mat-vec product
+    instead of rebuilding the matrix from stored lists per request.
+    """
+    def __init__(self, max_rows=1024):
+        self.max_rows = max_rows
+        self.keys = []
+        self.matrix = None
+        self.expires = np.zeros(0)
+
+    def add(self, key, vector, expires_at):
+        self.remove(key)
+        row = np.asarray(vector, dtype=np.float32).reshape(1, -1)
+        if self.matrix is None or self.matrix.shape[1] != row.shape[1]:
+            # First row, or the embedding model changed dimension: start over
+            self.keys, self.matrix, self.expires = [], row[:0], np.zeros(0)
+        self.keys.append(key)
+        self.matrix = np.vstack([self.matrix, row])
+        self.expires = np.append(self.expires, expires_at)
+        if len(self.keys) > self.max_rows:
+            excess = len(self.keys) - self.max_rows
+            self.keys = self.keys[excess:]
+            self.matrix = self.matrix[excess:]
+            self.expires = self.expires[excess:]
+
+    def remove(self, key):
+        if key not in self.keys:
+            return
+        i = self.keys.index(key)
+        del self.keys[i]
+        self.matrix = np.delete(self.matrix, i, axis=0)
+        self.expires = np.delete(self.expires, i)
+
+    def nearest(self, query):
+        """(key, cosine) of the closest live row to the unit vector `query`, or None."""
+        if not self.keys:
+            return None
+        scores = self.matrix @ query
+        scores[self.expires < time.time()] = -np.inf
+        best = int(scores.argmax())
+        if not np.isfinite(scores[best]):
+            return None
+        return self.keys[best], float(scores[best])
+
+
+class InMemoryCacheBackend:
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._vectors = {} # intent -> VectorIndex
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry["expires_at"] < time.time():
+                self._drop(key)
+                return None
+            self._data.move_to_end(key) # LRU touch
+            return entry
+
+    def set(self, key, entry, vector=None):
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = entry
+            if vector is not None:
+                index = self._vectors.setdefault(entry["intent"], VectorIndex(self.max_entries))
+                index.add(key, vector, entry["expires_at"])
+            while len(self._data) > self.max_entries:
+                self._drop(next(iter(self._data)))
+
+    def _drop(self, key):
+        entry = self._data.pop(key)
+        index = self._vectors.get(entry["intent"])
+        if index is not None:
+            index.remove(key)
+
+    def nearest(self, intent, query):
+        with self._lock:
+            index = self._vectors.get(intent)
+            return index.nearest(query) if index is not None else None
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._vectors.clear()
+
+
+class DjangoCacheBackend:
+    """
+    Shared-store adapter over django.core.cache. Entries are stored under their own key
+    (TTL enforced by the store); each intent's VectorIndex is stored as one value next to
+    a generation counter, and every worker keeps a local copy it only re-fetches when the
+    generation moves. All keys carry an epoch that clear() bumps, so clearing never
+    touches the alias's other keys.
+    """
+    PREFIX = "rag_cache"
+
+    def __init__(self, alias="default", max_entries=1024):
+        from django.core.cache import caches
+        self.cache = caches[alias]
+        self.max_entries = max_entries
+        self._epoch = None
+        self._local = {} # intent -> (generation, VectorIndex)
+        self._lock = threading.Lock()
+
+    @property
+    def _epoch_key(self):
+        return f"{self.PREFIX}:epoch"
+
+    def _entry_key(self, key, epoch):
+        return f"{self.PREFIX}:{epoch}:{key}"
+
+    def _index_key(self, intent, epoch):
+        return f"{self.PREFIX}:{epoch}:index:{intent}"
+
+    def _gen_key(self, intent, epoch):
+        return f"{self.PREFIX}:{epoch}:gen:{intent}"
+
+    def _current_epoch(self):
+        epoch = self.cache.get(self._epoch_key)
+        if epoch is None:
+            self.cache.add(self._epoch_key, 0, timeout=None)
+            epoch = self.cache.get(self._epoch_key, 0)
+        return epoch
+
+    def _fetch(self, make_key):
+        """
+        Reads `make_key(epoch)` together with the shared epoch in one round trip,
+        re-reading only when another worker has cleared the cache since our last call.
+        """
+        epoch = self._epoch if self._epoch is not None else self._current_epoch()
+        found = self.cache.get_many([self._epoch_key, make_key(epoch)])
+        shared = found.get(self._epoch_key, 0)
+        if shared != epoch:
+            epoch = shared
+            found = {make_key(epoch): self.cache.get(make_key(epoch))}
+        if epoch != self._epoch:
+            with self._lock:
+                self._epoch = epoch
+                self._local.clear()
+        return epoch, found.get(make_key(epoch))
+
+    def get(self, key):
+        _, entry = self._fetch(lambda epoch: self._entry_key(key, epoch))
+        if entry is None or entry["expires_at"] < time.time():
+            return None
+        return entry
+
+    def set(self, key, entry, vector=None):
+        epoch = self._current_epoch()
+        timeout = max(1, int(entry["expires_at"] - time.time()))
+        self.cache.set(self._entry_key(key, epoch), entry, timeout=timeout)
+        if vector is None:
+            return
+        intent = entry["intent"]
+        index = self.cache.get(self._index_key(intent, epoch)) or VectorIndex(self.max_entries)
+        index.add(key, vector, entry["expires_at"])
+        # The index lives as long as its newest entry; LRU-bounded like the in-memory backend
+        self.cache.set(self._index_key(intent, epoch), index, timeout=timeout)
+        gen_key = self._gen_key(intent, epoch)
+        if not self.cache.add(gen_key, 1, timeout=None):
+            try:
+                self.cache.incr(gen_key)
+            except ValueError: # evicted between add and incr
+                self.cache.set(gen_key, 1, timeout=None)
+
+    def nearest(self, intent, query):
+        epoch, generation = self._fetch(lambda epoch: self._gen_key(intent, epoch))
+        if generation is None:
+            return None
+        with self._lock:
+            local = self._local.get(intent)
+        if local is None or local[0] != generation:
+            index = self.cache.get(self._index_key(intent, epoch))
+            if index is None:
+                return None
+            with self._lock:
+                self._local[intent] = local = (generation, index)
+        return local[1].nearest(query)
+
+    def clear(self):
+        """Orphans this cache's keys (the store expires them) instead of flushing the alias."""
+        if not self.cache.add(self._epoch_key, 1, timeout=None):
+            self.cache.incr(self._epoch_key)
+        with self._lock:
+            self._epoch = None
+            self._local.clear()
+
+
+class SemanticResponseCache:
+    def __init__(self, backend, ttl_seconds=3600, similarity_threshold=0.95):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._stats = {"exact_hits": 0, "exact_misses": 0, "semantic_hits": 0, "semantic_misses": 0, "stores": 0}
+        self._stats_lock = threading.Lock()
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        query = re.sub(r"\s+", " ", query.lower()).strip()
+        return query.rstrip("?!. ")
+
+    @staticmethod
+    def unit(vector) -> np.ndarray:
+        vec = np.array(vector, dtype=np.float32)
+        vec /= (np.linalg.norm(vec) or 1.0)
+        return vec
+
+    def _key(self, query: str, intent: str) -> str:
+        raw = f"{intent}|{self.normalize(query)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _count(self, field):
+        with self._stats_lock:
+            self._stats[field] += 1
+
+    def get_exact(self, query: str, intent: str):
+        entry = self.backend.get(self._key(query, intent))
+        if entry is not None:
+            self._count("exact_hits")
+            return entry["response"]
+        self._count("exact_misses")
+        return None
+
+    def get_similar(self, vector, intent: str):
+        # Entries stored without a vector (lexical fast path) only serve exact hits
+        found = self.backend.nearest(intent, self.unit(vector))
+        if found is not None and found[1] >= self.similarity_threshold:
+            entry = self.backend.get(found[0]) # LRU touch; None if it expired meanwhile
+            if entry is not None:
+                self._count("semantic_hits")
+                return entry["response"]
+        self._count("semantic_misses")
+        return None
+
+    def set(self, query: str, intent: str, vector, response: dict):
+        self.backend.set(self._key(query, intent), {
+            "intent": intent,
+            "response": response,
+            "expires_at": time.time() + self.ttl_seconds,
+        }, vector=self.unit(vector) if vector is not None else None)
+        self._count("stores")
+
+    def stats(self) -> dict:
+        """Counters plus hit_rate over all requests (every lookup starts with get_exact)."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats["exact_hits"] + stats["exact_misses"]
+        stats["hit_rate"] = round((stats["exact_hits"] + stats["semantic_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
+
+
+def build_response_cache(backend_name: str, ttl_seconds: int, max_entries: int, similarity_threshold: float):
+    """Factory used by CognitiveEngine. Returns None when caching is disabled."""
+    if backend_name == "off":
+        return None
+    if backend_name == "memory":
+        backend = InMemoryCacheBackend(max_entries=max_entries)
+    elif backend_name == "django":
+        backend = DjangoCacheBackend(max_entries=max_entries)
+    else:
+        raise ValueError(f"Unknown response cache backend '{backend_name}'. Choose memory, django or off.")
+    return SemanticResponseCache(backend, ttl_seconds=ttl_seconds, similarity_threshold=similarity_threshold)
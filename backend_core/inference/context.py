@@ -0,0 +1,141 @@
+"""
+Token-budgeted context assembly for the generation prompt.
+
+Retrieved chunks arrive best first. The assembler drops duplicate passages (same text
+after whitespace/case normalization, or a near-copy such as the overlapping tail of the
+neighbouring chunk), then packs chunks in rank order until the intent's token budget is
+spent; the chunk that crosses the budget is cut at a token boundary if enough room is
+left to be useful, otherwise skipped in favour of smaller, lower-ranked ones.
+
+Tokens are counted with the local intent-model tokenizer (WordPiece), a close stand-in
+for Gemini's count; without it, ~4 characters per token. Fast (Rust) tokenizers give
+character offsets, so a chunk is cut exactly at a token boundary; slow (Python) ones
+don't support offsets, so the cut is found by re-counting a shrinking prefix.
+"""
+import re
+
+SEPARATOR = "\n\n---\n\n"
+SHINGLE_SIZE = 5
+
+
+def parse_budgets(spec: str) -> dict:
+    """'quick_revision=600,concept_learning=2000' -> {intent: tokens}."""
+    budgets = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        intent, _, tokens = part.partition("=")
+        budgets[intent.strip()] = int(tokens)
+    return budgets
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text.lower()).strip()
+
+
+def _shingles(text: str) -> set:
+    words = text.split()
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(max(1, len(words) - SHINGLE_SIZE + 1))}
+
+
+class ContextAssembler:
+    def __init__(self, tokenizer=None, budgets: dict = None, default_budget=1200,
+                 min_chunk_tokens=64, duplicate_threshold=0.8):
+        self.tokenizer = tokenizer
+        self.budgets = budgets or {}
+        self.default_budget = default_budget
+        self.min_chunk_tokens = min_chunk_tokens
+        self.duplicate_threshold = duplicate_threshold
+
+    def budget_for(self, intent: str) -> int:
+        return self.budgets.get(intent, self.default_budget)
+
+    # --- Token counting --------------------------------------------------------
+
+    def count_tokens(self, text: str) -> int:
+        if self.tokenizer is None:
+            return len(text) // 4 + 1
+        return len(self.tokenizer(text, add_special_tokens=False, verbose=False)["input_ids"])
+
+    def _measure(self, texts: list) -> list:
+        """
+        [(token_count, char offset after each token)] for each text, in one tokenizer call.
+        Offsets are None without a fast tokenizer.
+        """
+        if self.tokenizer is None:
+            return [(len(t) // 4 + 1, None) for t in texts]
+        if not getattr(self.tokenizer, "is_fast", False):
+            encoded = self.tokenizer(texts, add_special_tokens=False, verbose=False)
+            return [(len(ids), None) for ids in encoded["input_ids"]]
+        encoded = self.tokenizer(texts, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+        return [
+            (len(ids), [end for _, end in offsets])
+            for ids, offsets in zip(encoded["input_ids"], encoded["offset_mapping"])
+        ]
+
+    def _truncate(self, text: str, ends, tokens: int) -> str:
+        if ends is not None:
+            return text[:ends[tokens - 1]].rstrip() + " ..."
+        if self.tokenizer is None:
+            return text[:tokens * 4].rsplit(" ", 1)[0] + " ..."
+        # Slow tokenizer: shrink a word-aligned prefix until it fits (a few tokenizer calls)
+        cut = len(text)
+        while True:
+            cut = max(1, int(cut * tokens / max(self.count_tokens(text[:cut]), 1) * 0.95))
+            prefix = text[:cut].rsplit(" ", 1)[0] if " " in text[:cut] else text[:cut]
+            if self.count_tokens(prefix) <= tokens or cut <= 1:
+                return prefix.rstrip() + " ..."
+            cut = len(prefix)
+
+    # --- Dedupe ----------------------------------------------------------------
+
+    def dedupe(self, chunks: list) -> list:
+        kept, seen, kept_shingles = [], set(), []
+        for chunk in chunks:
+            normalized = _normalize(chunk["content"])
+            if not normalized or normalized in seen:
+                continue
+            shingles = _shingles(normalized)
+            if any(len(shingles & other) / len(shingles) >= self.duplicate_threshold for other in kept_shingles):
+                continue
+            seen.add(normalized)
+            kept_shingles.append(shingles)
+            kept.append(chunk)
+        return kept
+
+    # --- Packing ---------------------------------------------------------------
+
+    @staticmethod
+    def label(chunk: dict) -> str:
+        source = chunk["source"] if not chunk.get("section") else f"{chunk['source']} § {chunk['section']}"
+        return f"[Source: {source}]\n"
+
+    def assemble(self, chunks: list, intent: str) -> tuple:
+        """
+        Returns (context, chunks_used, usage) where usage is
+        {"context_tokens", "context_budget", "chunks_used", "chunks_dropped"}.
+        """
+        budget = self.budget_for(intent)
+        candidates = self.dedupe(chunks)
+        separator_tokens = self.count_tokens(SEPARATOR)
+        measured = self._measure([self.label(c) + c["content"] for c in candidates])
+
+        parts, used, spent = [], [], 0
+        for chunk, (tokens, ends) in zip(candidates, measured):
+            cost = tokens + (separator_tokens if parts else 0)
+            text = self.label(chunk) + chunk["content"]
+            if spent + cost > budget:
+                room = budget - spent - (separator_tokens if parts else 0)
+                if room < self.min_chunk_tokens:
+                    continue
+                text = self._truncate(text, ends, room)
+                cost = room + (separator_tokens if parts else 0)
+            parts.append(text)
+            used.append(chunk)
+            spent += cost
+
+        usage = {
+            "context_tokens": spent,
+            "context_budget": budget,
+            "chunks_used": len(used),
+            "chunks_dropped": len(chunks) - len(used),
+        }
+        return SEPARATOR.join(parts), used, usage
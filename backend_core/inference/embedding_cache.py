@@ -0,0 +1,126 @@
+"""
+Persistent embedding cache keyed by (model id, sha256 of the text).
+
+Shared by the online path (CognitiveEngine.get_embedding) and the offline
+migration (migrate_vectors.py), so text that was embedded once is never
+sent to Vertex again.
+
+On-disk layout, one directory per model id:
+    <root>/<model_id>/vectors.f32   - row-major float32 matrix, memory-mapped for reads
+    <root>/<model_id>/index.txt     - one hex sha256 per line; line N is row N
+Both files are append-only; appends take an exclusive flock so several gunicorn
+workers (or a worker and the migration job) can share one cache directory.
+"""
+import fcntl
+import hashlib
+import os
+import threading
+
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.getenv(
+    "EMBEDDING_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "embeddings")
+)
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    def __init__(self, root: str, model_id: str, dim: int = 768):
+        self.dir = os.path.join(root, model_id)
+        self.model_id = model_id
+        self.dim = dim
+        self.vectors_path = os.path.join(self.dir, "vectors.f32")
+        self.index_path = os.path.join(self.dir, "index.txt")
+        self.lock_path = os.path.join(self.dir, ".lock")
+        os.makedirs(self.dir, exist_ok=True)
+
+        self._rows = {} # sha256 -> row
+        self._index_offset = 0 # bytes of index.txt already read
+        self._matrix = None
+        self._lock = threading.Lock()
+        self._refresh()
+
+    def count(self) -> int:
+        return len(self._rows)
+
+    def _refresh(self):
+        """Picks up rows appended by other processes since the last read."""
+        if not os.path.exists(self.index_path):
+            return
+        if os.path.getsize(self.index_path) == self._index_offset:
+            return
+        with open(self.index_path, "r") as f:
+            f.seek(self._index_offset)
+            chunk = f.read()
+        # Only consume complete lines; a concurrent writer may be mid-append
+        complete = chunk[:chunk.rfind("\n") + 1]
+        for digest in complete.splitlines():
+            self._rows[digest] = len(self._rows)
+        self._index_offset += len(complete.encode("utf-8"))
+        self._matrix = None
+
+    def _get_matrix(self):
+        if self._matrix is None and self._rows:
+            self._matrix = np.memmap(
+                self.vectors_path, dtype=np.float32, mode="r", shape=(len(self._rows), self.dim)
+            )
+        return self._matrix
+
+    def get_many(self, texts: list) -> list:
+        """Returns one vector (list of floats) per text, or None where not cached."""
+        digests = [text_hash(t) for t in texts]
+        with self._lock:
+            if any(d not in self._rows for d in digests):
+                self._refresh()
+            matrix = self._get_matrix()
+            return [
+                matrix[self._rows[d]].tolist() if d in self._rows else None
+                for d in digests
+            ]
+
+    def get(self, text: str):
+        return self.get_many([text])[0]
+
+    def put_many(self, texts: list, vectors: list):
+        with self._lock, open(self.lock_path, "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                new_digests, new_vectors, seen = [], [], set()
+                for text, vector in zip(texts, vectors):
+                    digest = text_hash(text)
+                    if vector is None or digest in self._rows or digest in seen:
+                        continue
+                    seen.add(digest)
+                    new_digests.append(digest)
+                    new_vectors.append(vector)
+                if not new_digests:
+                    return
+                block = np.asarray(new_vectors, dtype=np.float32).reshape(-1, self.dim)
+                # Drop rows a crashed writer appended without indexing them
+                expected = len(self._rows) * self.dim * 4
+                if os.path.exists(self.vectors_path) and os.path.getsize(self.vectors_path) != expected:
+                    os.truncate(self.vectors_path, expected)
+                # Vectors first, index second: readers only trust rows listed in index.txt
+                with open(self.vectors_path, "ab") as f:
+                    f.write(block.tobytes())
+                with open(self.index_path, "a") as f:
+                    f.write("".join(d + "\n" for d in new_digests))
+                self._refresh()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def put(self, text: str, vector):
+        self.put_many([text], [vector])
+
+
+def get_store(model_id: str, root: str = None):
+    """Returns the cache for `model_id`, or None when EMBEDDING_CACHE_DIR=off."""
+    root = root or DEFAULT_CACHE_DIR
+    if root == "off":
+        return None
+    return EmbeddingStore(root, model_id)
@@ -6,9 +6,21 @@ from google.cloud import aiplatform
 import pickle
 import os
 import json
+import threading
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+import gc
 import torch
-from transformers import DistilBertTokenizer, DistilBertForSequenceClassification
-import torch.nn.functional as F
+from inference.backends import get_backend
+from inference.batching import MicroBatcher
+from inference.cache import build_response_cache
+from inference.embedding_cache import get_store
+from inference.retrieval import build_retriever
+from inference.lexical import BM25Index, reciprocal_rank_fusion
+from inference.heuristics import KeywordIntentMatcher
+from inference.student import HashedNgramStudent
+from inference.context import ContextAssembler, parse_budgets
+from inference.tracing import span, tag
+from storage.catalog import DEFAULT_PATH as CATALOG_PATH, ContentCatalog
 
 class CognitiveEngine:
     """
@@ -20,81 +32,433 @@ class CognitiveEngine:
     LOCATION = "us-central1"
     MODEL_DIR = "inference/models/bert_intent"
     
-    _model = None
+    MAX_SEQ_LEN = 64
+    # torch | int8 | onnx (see inference/backends.py)
+    INTENT_BACKEND = os.getenv("INTENT_BACKEND", "torch")
+    # Dynamic batching for intent inference (concurrent requests share one forward pass)
+    INTENT_BATCHING = os.getenv("INTENT_BATCHING", "true").lower() == "true"
+    INTENT_BATCH_MAX_SIZE = int(os.getenv("INTENT_BATCH_MAX_SIZE", "16"))
+    INTENT_BATCH_MAX_WAIT_MS = float(os.getenv("INTENT_BATCH_MAX_WAIT_MS", "5"))
+    # Longest a request waits on the batcher before answering from the keyword rules
+    INTENT_BATCH_TIMEOUT_MS = float(os.getenv("INTENT_BATCH_TIMEOUT_MS", "2000"))
+    # analyze_intents: queries per forward pass for bulk classification
+    INTENT_CHUNK_SIZE = int(os.getenv("INTENT_CHUNK_SIZE", "64"))
+    # Weighted keyword rules for the heuristic fallback and confusion detector
+    INTENT_RULES_FILE = os.getenv("INTENT_RULES_FILE")
+    # Distilled hashed n-gram student (training/distill.py) answers first; DistilBERT only
+    # sees queries the student is less confident about than INTENT_STUDENT_THRESHOLD
+    INTENT_STUDENT = os.getenv("INTENT_STUDENT", "true").lower() == "true"
+    INTENT_STUDENT_DIR = os.getenv("INTENT_STUDENT_DIR", "inference/models/intent_student")
+    INTENT_STUDENT_THRESHOLD = float(os.getenv("INTENT_STUDENT_THRESHOLD", "0.9"))
+    
+    # Semantic response cache: memory | django | off
+    RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+    RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+    RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.95"))
+    
+    # firestore | local | pgvector (see inference/retrieval.py)
+    RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "firestore")
+    VECTOR_INDEX_DIR = os.getenv(
+        "VECTOR_INDEX_DIR",
+        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "vector_index")
+    )
+    # Hybrid retrieval: BM25 index built by `manage.py build_lexical_index`
+    LEXICAL_INDEX_DIR = os.getenv(
+        "LEXICAL_INDEX_DIR",
+        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "lexical_index")
+    )
+    # Keyword hits this strong skip the embedding call entirely
+    LEXICAL_FASTPATH = os.getenv("LEXICAL_FASTPATH", "true").lower() == "true"
+    LEXICAL_FASTPATH_MIN_SCORE = float(os.getenv("LEXICAL_FASTPATH_MIN_SCORE", "8.0"))
+    LEXICAL_FASTPATH_MARGIN = float(os.getenv("LEXICAL_FASTPATH_MARGIN", "1.5"))
+    # Retrieval returns chunks, at most this many from any one source document
+    MAX_CHUNKS_PER_SOURCE = int(os.getenv("MAX_CHUNKS_PER_SOURCE", "2"))
+    # Prompt context is packed into a per-intent token budget (see inference/context.py);
+    # retrieval hands the assembler up to CONTEXT_MAX_CHUNKS candidates
+    CONTEXT_MAX_CHUNKS = int(os.getenv("CONTEXT_MAX_CHUNKS", "8"))
+    CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))
+    CONTEXT_TOKEN_BUDGETS = parse_budgets(os.getenv(
+        "CONTEXT_TOKEN_BUDGETS",
+        "quick_revision=500,interview_preparation=1000,problem_solving=1500,concept_learning=2000"
+    ))
+    
+    # Lesson metadata compiled by `manage.py build_content_catalog` (storage/catalog.py)
+    CONTENT_CATALOG_PATH = CATALOG_PATH
+    
+    EMBEDDING_MODEL_ID = "text-embedding-004"
+    GENERATIVE_MODEL_ID = "gemini-1.5-pro"
+    
+    _model = None # Active intent backend (inference.backends); False once a load failed
     _tokenizer = None
     _label_map = None
     
+    # Process-level client registry: SDK clients are built once per worker and reused
+    _clients = {}
+    _clients_lock = threading.Lock() # guards the registry dicts only; never held while building
+    _client_locks = {} # name -> Lock, so one slow factory doesn't block the other clients
+    _client_errors = {} # name -> last build error, cleared when a later build succeeds
+    _init_lock = threading.Lock()
+    _model_lock = threading.Lock()
+    _intent_batcher = None
+    _initialized = False
+    _init_error = None
+    
     @classmethod
     def get_model(cls):
+        """
+        Returns the intent backend, loading it on first use. A missing or broken model is
+        remembered as False (like the registry's disabled clients), so callers fall back to
+        the student/heuristics without taking the lock again; reload_model() retries.
+        """
         if cls._model is None:
-            try:
-                if os.path.exists(cls.MODEL_DIR):
-                    print("🧠 Loading Neural Network (DistilBERT)...")
-                    cls._tokenizer = DistilBertTokenizer.from_pretrained(cls.MODEL_DIR)
-                    cls._model = DistilBertForSequenceClassification.from_pretrained(cls.MODEL_DIR)
-                    cls._model.eval() # Set to inference mode
-                    
-                    with open(os.path.join(cls.MODEL_DIR, "label_map.json"), "r") as f:
-                        cls._label_map = {v: k for k, v in json.load(f).items()} # Invert map for lookup
-                        
-                    print("✅ Neural Network Loaded Successfully")
-                else:
-                    print(f"⚠️ Neural Network not found at {cls.MODEL_DIR}")
-            except Exception as e:
-                print(f"⚠️ Error loading Neural Network: {e}")
+            with cls._model_lock:
+                if cls._model is None:
+                    cls._load_model()
         return cls._model
 
+    @classmethod
+    def reload_model(cls):
+        """Retries (or refreshes) the intent model load, e.g. after new weights are deployed."""
+        with cls._model_lock:
+            cls._load_model()
+        return cls._model
+
+    @classmethod
+    def _load_model(cls):
+        loaded = False
+        try:
+            if os.path.exists(cls.MODEL_DIR):
+                print(f"🧠 Loading Neural Network (DistilBERT, backend={cls.INTENT_BACKEND})...")
+                model = get_backend(cls.INTENT_BACKEND, cls.MODEL_DIR, cls.MAX_SEQ_LEN).load()
+                tokenizer = model.tokenizer
+                
+                with open(os.path.join(cls.MODEL_DIR, "label_map.json"), "r") as f:
+                    label_map = {v: k for k, v in json.load(f).items()} # Invert map for lookup
+                
+                # Publish the model last so lock-free readers never see a half-loaded engine
+                cls._tokenizer = tokenizer
+                cls._label_map = label_map
+                cls._model = model
+                loaded = True
+                print("✅ Neural Network Loaded Successfully")
+            else:
+                print(f"⚠️ Neural Network not found at {cls.MODEL_DIR}")
+        except Exception as e:
+            print(f"⚠️ Error loading Neural Network: {e}")
+        if not loaded and not cls._model:
+            cls._model = False # remembered until reload_model(); a previously loaded model is kept
+
+    @classmethod
+    def preload(cls):
+        """
+        Loads tokenizer, weights and label map in the gunicorn master (preload_app) so
+        forked workers share the pages copy-on-write instead of each loading a copy.
+        Only the intent models are preloaded: gRPC-based SDK clients are not fork-safe and are
+        built per worker in warmup().
+        """
+        cls.get_student() # numpy arrays only, always fork-safe
+        backend_cls = get_backend(cls.INTENT_BACKEND, cls.MODEL_DIR).__class__
+        if not backend_cls.fork_safe:
+            print(f"ℹ️ Backend '{cls.INTENT_BACKEND}' is not fork-safe, skipping preload")
+            return
+        cls.get_model()
+        # Move everything allocated so far into the permanent generation; the cyclic GC
+        # then never writes their GC headers, so those pages stay shared after fork
+        # (refcount writes on objects a worker actually touches still copy their pages).
+        gc.collect()
+        gc.freeze()
+
+    @classmethod
+    def configure_worker_threads(cls, workers: int):
+        """
+        Caps torch intra-op threads per worker so N workers don't each spawn one
+        thread per core (oversubscription). TORCH_NUM_THREADS overrides.
+        """
+        default = max(1, (os.cpu_count() or 1) // max(1, workers))
+        num_threads = int(os.getenv("TORCH_NUM_THREADS", default))
+        torch.set_num_threads(num_threads)
+        return num_threads
+
     @classmethod
     def initialize(cls):
-        if not firebase_admin._apps:
-             # In production, use explicit credentials or rely on ADC
-             firebase_admin.initialize_app()
-        vertexai.init(project=cls.PROJECT_ID, location=cls.LOCATION)
-        # Preload model
+        """
+        Warms every process-level dependency exactly once.
+        Safe to call repeatedly (and from many threads); only the first call does work.
+        """
+        if cls._initialized:
+            return
+        with cls._init_lock:
+            if cls._initialized:
+                return
+            try:
+                if not firebase_admin._apps:
+                     # In production, use explicit credentials or rely on ADC
+                     firebase_admin.initialize_app()
+                vertexai.init(project=cls.PROJECT_ID, location=cls.LOCATION)
+                cls._init_error = None
+            except Exception as e:
+                # Leave _initialized False so the next request retries
+                cls._init_error = str(e)
+                raise
+            cls._initialized = True
+        # Preload model (outside the lock; get_model has its own guard)
         cls.get_model()
 
-    @staticmethod
-    def get_embedding(text: str) -> list:
-        # Using Vertex AI 'text-embedding-004'
-        # Note: In real implementation, use the distinct model class
+    @classmethod
+    def warmup(cls):
+        """
+        Called once per gunicorn worker at boot (see gunicorn.conf.py).
+        Builds the SDK clients so the first chat request doesn't pay for them.
+        Each step runs even if an earlier one failed; failures are recorded per client
+        (see get_client) and keep the worker not-ready until a later build succeeds.
+        """
+        print("🔥 Warming Cognitive Engine...")
+        try:
+            cls.initialize()
+        except Exception as e:
+            print(f"⚠️ Warmup incomplete (will retry on first request): {e}")
+            return
+        for getter in (cls.get_embedding_model, cls.get_generative_model, cls.get_firestore,
+                       cls.get_retriever, cls.get_lexical_index):
+            try:
+                getter()
+            except Exception as e:
+                print(f"⚠️ Warmup: {getter.__name__} failed (will retry on first request): {e}")
+        if cls.is_ready():
+            print("✅ Cognitive Engine Warm")
+
+    @classmethod
+    def is_ready(cls) -> bool:
+        """Readiness hook: True once the SDK clients are initialized and none failed to build."""
+        return cls._initialized and not cls._client_errors
+
+    @classmethod
+    def readiness(cls) -> dict:
+        return {
+            "ready": cls.is_ready(),
+            "model_loaded": bool(cls._model),
+            "student_loaded": bool(cls._clients.get("intent_student")),
+            "clients": sorted(cls._clients.keys()),
+            "error": cls._init_error,
+            "failed_clients": dict(cls._client_errors),
+            "response_cache": cls.cache_stats(),
+        }
+
+    @classmethod
+    def get_client(cls, name: str, factory):
+        """
+        Returns the process-wide client registered under `name`, building it with
+        `factory()` on first use. Builds are serialized per name only, so a slow SDK
+        factory never blocks lookups or builds of other clients. A factory that raises
+        is recorded in `_client_errors` (reported by readiness()) and retried next call.
+        """
+        client = cls._clients.get(name)
+        if client is None:
+            with cls._client_lock(name):
+                client = cls._clients.get(name)
+                if client is None:
+                    try:
+                        client = factory()
+                    except Exception as e:
+                        cls._client_errors[name] = str(e)
+                        raise
+                    cls._clients[name] = client
+                    cls._client_errors.pop(name, None)
+        return client
+
+    @classmethod
+    def _client_lock(cls, name: str):
+        with cls._clients_lock:
+            return cls._client_locks.setdefault(name, threading.Lock())
+
+    @classmethod
+    def refresh_client(cls, name: str, factory, stale):
+        """
+        Replaces the `stale` client registered under `name` with a fresh `factory()`.
+        Concurrent callers that saw the same stale client rebuild it only once; the old
+        client is left to the threads still using it and closed when garbage-collected.
+        """
+        with cls._client_lock(name):
+            client = cls._clients.get(name)
+            if client is stale:
+                client = factory()
+                cls._clients[name] = client
+        return client
+
+    @classmethod
+    def get_response_cache(cls):
+        return cls.get_client(
+            "response_cache",
+            lambda: build_response_cache(
+                cls.RESPONSE_CACHE_BACKEND,
+                cls.RESPONSE_CACHE_TTL,
+                cls.RESPONSE_CACHE_MAX_ENTRIES,
+                cls.RESPONSE_CACHE_SIMILARITY,
+            )
+        )
+
+    @classmethod
+    def cache_stats(cls):
+        cache = cls._clients.get("response_cache")
+        return cache.stats() if cache else None
+
+    @classmethod
+    def get_embedding_model(cls):
         from vertexai.language_models import TextEmbeddingModel
-        model = TextEmbeddingModel.from_pretrained("text-embedding-004")
-        embeddings = model.get_embeddings([text])
-        return embeddings[0].values
+        return cls.get_client(
+            "embedding",
+            lambda: TextEmbeddingModel.from_pretrained(cls.EMBEDDING_MODEL_ID)
+        )
 
-    @staticmethod
-    def retrieve_context(query_vector: list, limit=5) -> str:
-        db = firestore.client()
-        coll = db.collection("knowledge_vectors")
-        
-        # Vector Search in Python using Firestore
-        # Requires 'google-cloud-firestore>=2.17.0'
-        # vector_field="embedding"
-        
-        from google.cloud.firestore_v1.vector import Vector
-        
-        # find_nearest is available on the collection reference
-        query = coll.find_nearest(
-            vector_field="embedding",
-            query_vector=Vector(query_vector),
-            distance_measure="COSINE",
-            limit=limit
+    @classmethod
+    def get_generative_model(cls):
+        return cls.get_client(
+            "generative",
+            lambda: GenerativeModel(cls.GENERATIVE_MODEL_ID)
         )
+
+    @classmethod
+    def get_firestore(cls):
+        return cls.get_client("firestore", firestore.client)
+
+    @classmethod
+    def get_embedding_store(cls):
+        # Persistent (model id, sha256(text)) cache shared with migrate_vectors.py
+        return cls.get_client("embedding_store", lambda: get_store(cls.EMBEDDING_MODEL_ID) or False)
+
+    @classmethod
+    def get_embedding(cls, text: str) -> list:
+        store = cls.get_embedding_store()
+        if store:
+            cached = store.get(text)
+            if cached is not None:
+                return cached
         
-        docs = query.get()
+        # Using Vertex AI 'text-embedding-004'
+        model = cls.get_embedding_model()
+        embeddings = model.get_embeddings([text])
+        vector = embeddings[0].values
+        if store:
+            store.put(text, vector)
+        return vector
+
+    @classmethod
+    def get_retriever(cls):
+        return cls.get_client(
+            "retriever",
+            lambda: build_retriever(cls.RETRIEVAL_BACKEND, cls.get_firestore, cls.VECTOR_INDEX_DIR)
+        )
+
+    @classmethod
+    def get_lexical_index(cls):
+        # False (not None) when the index hasn't been built, so the registry doesn't retry per request
+        return cls.get_client("lexical_index", lambda: BM25Index.load(cls.LEXICAL_INDEX_DIR) or False)
+
+    @classmethod
+    def get_student(cls):
+        # False when disabled or not trained, so the registry doesn't retry per request
+        return cls.get_client(
+            "intent_student",
+            lambda: cls.INTENT_STUDENT and HashedNgramStudent.load(cls.INTENT_STUDENT_DIR) or False
+        )
+
+    @classmethod
+    def get_catalog(cls):
+        # False when the catalog hasn't been built, so the registry doesn't reload per request
+        factory = lambda: ContentCatalog.load(cls.CONTENT_CATALOG_PATH) or False
+        catalog = cls.get_client("content_catalog", factory)
+        # Rebuilt in place (build_content_catalog, migrate_vectors) or built since: reload,
+        # so the worker doesn't keep serving the old metadata maps. One os.stat per call.
+        stale = catalog.is_stale() if catalog else os.path.exists(cls.CONTENT_CATALOG_PATH)
+        if stale:
+            catalog = cls.refresh_client("content_catalog", factory, catalog)
+        return catalog
+
+    @classmethod
+    def get_heuristics(cls):
+        return cls.get_client("heuristics", lambda: KeywordIntentMatcher.from_file(cls.INTENT_RULES_FILE))
+
+    @classmethod
+    def lexical_search(cls, query: str, limit=10) -> list:
+        index = cls.get_lexical_index()
+        # Chunk text lives in the content catalog; the index only stores where to find it
+        return index.search(query, limit, cls.get_catalog()) if index else []
+
+    @classmethod
+    def retrieve_chunks(cls, query_vector: list, limit=5, query: str = None, lexical_hits: list = None) -> list:
+        # Over-fetch so dropping duplicate / same-document chunks still leaves `limit`
+        chunks = cls.get_retriever().search(query_vector, limit * 2)
+        if lexical_hits is None and query:
+            lexical_hits = cls.lexical_search(query, limit * 2)
+        if lexical_hits:
+            chunks = reciprocal_rank_fusion([chunks, lexical_hits])
+        return cls.select_chunks(chunks, limit)
+
+    @classmethod
+    def retrieve_context(cls, query_vector: list, limit=5, query: str = None, lexical_hits: list = None) -> str:
+        return cls.format_context(cls.retrieve_chunks(query_vector, limit, query, lexical_hits))
+
+    @classmethod
+    def select_chunks(cls, chunks: list, limit: int) -> list:
+        """
+        Keeps the best-ranked chunks (input is ordered by similarity), dropping exact
+        duplicates and capping chunks per source document so one long lesson can't
+        crowd out everything else.
+        """
+        selected, seen, per_source = [], set(), {}
+        for chunk in chunks:
+            key = chunk["content"].strip()
+            if not key or key in seen:
+                continue
+            if per_source.get(chunk["source"], 0) >= cls.MAX_CHUNKS_PER_SOURCE:
+                continue
+            seen.add(key)
+            per_source[chunk["source"]] = per_source.get(chunk["source"], 0) + 1
+            selected.append(chunk)
+            if len(selected) >= limit:
+                break
+        return selected
+
+    @staticmethod
+    def format_context(chunks: list) -> str:
         context_parts = []
-        for doc in docs:
-            data = doc.to_dict()
-            context_parts.append(f"[Source: {data.get('filePath')}]\n{data.get('content')}")
+        for chunk in chunks:
+            label = chunk["source"] if not chunk.get("section") else f"{chunk['source']} § {chunk['section']}"
+            context_parts.append(f"[Source: {label}]\n{chunk['content']}")
             
         return "\n\n---\n\n".join(context_parts)
 
     @classmethod
-    def generate_response(cls, query: str, context: str, intent: dict) -> str:
-        # Load Model
-        model = GenerativeModel("gemini-1.5-pro")
-        
-        system_instruction = f"""
+    def get_context_assembler(cls):
+        # The intent model's tokenizer counts tokens; get_model() returns None without it
+        return cls.get_client("context_assembler", lambda: ContextAssembler(
+            tokenizer=cls._tokenizer if cls.get_model() else None,
+            budgets=cls.CONTEXT_TOKEN_BUDGETS,
+            default_budget=cls.CONTEXT_TOKEN_BUDGET,
+        ))
+
+    @classmethod
+    def assemble_context(cls, query: str, state: dict) -> tuple:
+        """
+        Packs the retrieved chunks into the intent's token budget.
+        Returns (context, chunks_used, usage); usage includes the prompt's token count.
+        """
+        with span("assemble"):
+            assembler = cls.get_context_assembler()
+            context, used, usage = assembler.assemble(state["chunks"], state["intent"])
+            prompt = cls.build_prompt(context, state["intent_data"])
+            usage["prompt_tokens"] = assembler.count_tokens(prompt) + assembler.count_tokens(query)
+        tag("prompt_tokens", usage["prompt_tokens"])
+        print(
+            f"🧾 Prompt {usage['prompt_tokens']} tokens "
+            f"(context {usage['context_tokens']}/{usage['context_budget']}, {usage['chunks_used']} chunks)"
+        )
+        return context, used, usage
+
+    @staticmethod
+    def build_prompt(context: str, intent: dict) -> str:
+        return f"""
 You are the Student Resource Hub AI.
 Intent: {intent.get('intent')}
 Context:
@@ -102,91 +466,309 @@ Context:
 
 Answer the user query based strictly on context.
 """
+
+    @classmethod
+    def generate_response(cls, query: str, context: str, intent: dict) -> str:
+        # Shared Model (built once per process)
+        model = cls.get_generative_model()
+        
         response = model.generate_content(
-            [system_instruction, query],
+            [cls.build_prompt(context, intent), query],
             generation_config={"temperature": 0.2}
         )
         return response.text
 
     @classmethod
-    def run_rag_flow(cls, query: str):
-        cls.initialize()
+    def generate_response_stream(cls, query: str, context: str, intent: dict):
+        """Yields the answer as text chunks as Gemini produces them."""
+        model = cls.get_generative_model()
+        
+        response = model.generate_content(
+            [cls.build_prompt(context, intent), query],
+            generation_config={"temperature": 0.2},
+            stream=True
+        )
+        for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+    @staticmethod
+    def sources(chunks: list) -> list:
+        return [
+            {"source": c["source"], "section": c.get("section", ""), "score": c.get("score")}
+            for c in chunks
+        ]
+
+    @classmethod
+    def prepare_rag(cls, query: str) -> dict:
+        """
+        Everything before generation: intent, response cache, (lexical fast path or)
+        embedding, and retrieval. Returns a state dict; when "cached" is set, the
+        cached result should be returned as-is.
+        """
+        with span("init"):
+            cls.initialize()
         
         # 1. Intent (Using Heuristics for now)
-        intent_data = cls.analyze_intent(query)
+        with span("intent"):
+            intent_data = cls.analyze_intent(query)
+        intent = intent_data.get("intent")
+        tag("intent", intent)
+        state = {"intent_data": intent_data, "intent": intent, "cached": None, "vector": None, "chunks": []}
         
-        # 2. Embedding
-        vector = cls.get_embedding(query)
+        # 1b. Exact cache hit: skips embedding, retrieval and generation entirely
+        cache = cls.get_response_cache()
+        if cache:
+            cached = cache.get_exact(query, intent)
+            if cached is not None:
+                state["cached"] = ("exact", cached)
+                tag("cached", "exact")
+                return state
         
-        # 3. Retrieval
-        context = cls.retrieve_context(vector)
+        # 2. Lexical retrieval (in-process BM25; empty if the index isn't built)
+        with span("retrieve"):
+            lexical_hits = cls.lexical_search(query)
         
-        # 4. Generation
-        response = cls.generate_response(query, context, intent_data)
+        if cls.LEXICAL_FASTPATH and BM25Index.is_confident(
+            lexical_hits, cls.LEXICAL_FASTPATH_MIN_SCORE, cls.LEXICAL_FASTPATH_MARGIN
+        ):
+            # 2a. High-confidence keyword hit: no embedding call, no vector search
+            state["chunks"] = cls.select_chunks(lexical_hits, cls.CONTEXT_MAX_CHUNKS)
+            tag("lexical_fastpath", True)
+            return state
         
-        return {
+        # 2b. Embedding
+        with span("embed"):
+            vector = cls.get_embedding(query)
+        state["vector"] = vector
+        
+        # 2c. Near-duplicate cache hit (same intent, cosine >= threshold)
+        if cache:
+            cached = cache.get_similar(vector, intent)
+            if cached is not None:
+                state["cached"] = ("semantic", cached)
+                tag("cached", "semantic")
+                return state
+        
+        # 3. Retrieval (vector results fused with BM25 via reciprocal rank fusion)
+        with span("retrieve"):
+            state["chunks"] = cls.retrieve_chunks(vector, cls.CONTEXT_MAX_CHUNKS, query=query, lexical_hits=lexical_hits)
+        return state
+
+    @classmethod
+    def _store_result(cls, query: str, state: dict, result: dict):
+        cache = cls.get_response_cache()
+        if cache:
+            cache.set(query, state["intent"], state["vector"], result)
+
+    @classmethod
+    def run_rag_flow(cls, query: str):
+        state = cls.prepare_rag(query)
+        if state["cached"]:
+            kind, cached = state["cached"]
+            return {**cached, "intent": state["intent_data"], "cached": kind}
+        
+        # 4. Generation (context packed into the intent's token budget)
+        context, _, usage = cls.assemble_context(query, state)
+        with span("generate"):
+            response = cls.generate_response(query, context, state["intent_data"])
+        
+        result = {
             "response": response,
-            "intent": intent_data,
             "context_used": bool(context)
         }
+        cls._store_result(query, state, result)
+        
+        return {**result, "intent": state["intent_data"], "cached": False, "usage": usage}
+
+    @classmethod
+    def run_rag_flow_stream(cls, query: str):
+        """
+        Streaming variant of run_rag_flow. Yields (event, data) tuples:
+            ("meta",  {"intent", "sources", "cached"})   - before generation starts
+            ("token", {"text"})                           - one per generated chunk
+            ("done",  {"response", "context_used", ...})  - full result, same shape as run_rag_flow
+        """
+        state = cls.prepare_rag(query)
+        intent_data = state["intent_data"]
+        
+        if state["cached"]:
+            kind, cached = state["cached"]
+            yield "meta", {"intent": intent_data, "sources": [], "cached": kind}
+            yield "token", {"text": cached.get("response", "")}
+            yield "done", {**cached, "intent": intent_data, "cached": kind}
+            return
+        
+        context, used, usage = cls.assemble_context(query, state)
+        yield "meta", {"intent": intent_data, "sources": cls.sources(used), "cached": False}
+        
+        parts = []
+        with span("generate"): # includes time the client takes to read the stream
+            for text in cls.generate_response_stream(query, context, intent_data):
+                parts.append(text)
+                yield "token", {"text": text}
+        
+        result = {
+            "response": "".join(parts),
+            "context_used": bool(context)
+        }
+        cls._store_result(query, state, result)
+        yield "done", {**result, "intent": intent_data, "cached": False, "usage": usage}
+
+    @classmethod
+    def get_intent_batcher(cls):
+        if cls._intent_batcher is None:
+            with cls._clients_lock:
+                if cls._intent_batcher is None:
+                    cls._intent_batcher = MicroBatcher(
+                        cls._predict_batch,
+                        max_batch_size=cls.INTENT_BATCH_MAX_SIZE,
+                        max_wait_ms=cls.INTENT_BATCH_MAX_WAIT_MS,
+                        name="intent-batcher",
+                    )
+        return cls._intent_batcher
+
+    @classmethod
+    def _predict_batch(cls, queries: list) -> list:
+        """
+        Runs one padded forward pass over `queries`.
+        Returns a list of (intent, confidence) tuples in input order.
+        """
+        probs = cls._model.predict_proba(queries)
+        pred_ids = probs.argmax(axis=1)
+        return [
+            (cls._label_map.get(int(pred_id), "exploratory_question"), float(probs[i, pred_id]))
+            for i, pred_id in enumerate(pred_ids)
+        ]
 
     @classmethod
     def analyze_intent(cls, query: str, context: dict = None):
         """
         Determines the intent of the user.
-        Uses ML Model if available, else Heuristics.
+        Uses the distilled student when it is confident, else the ML Model, else Heuristics.
         """
-        query_lower = query.lower()
+        result, heuristic, student_guess = cls._intent_prelude(query)
+        if result:
+            return result
         
-        # 1. ML Inference
+        # 2. ML Inference
         model = cls.get_model()
-        if model and cls._tokenizer:
-            try:
-                # Tokenize
-                inputs = cls._tokenizer(
-                    query, 
-                    return_tensors="pt", 
-                    truncation=True, 
-                    padding=True, 
-                    max_length=64
-                )
-                
-                # Predict
-                with torch.no_grad():
-                    outputs = model(**inputs)
-                    
-                # Calculate Probabilities
-                probs = F.softmax(outputs.logits, dim=1)
-                confidence, pred_id = torch.max(probs, dim=1)
-                
-                intent = cls._label_map.get(pred_id.item(), "exploratory_question")
-                confidence = float(confidence.item())
-                
-            except Exception as e:
-                print(f"Inference Error: {e}")
-                intent = "exploratory_question"
-                confidence = 0.5
-        else:
-            # 2. Heuristic Fallback
+        if not (model and cls._tokenizer):
+            return cls._intent_without_model(heuristic, student_guess)
+        tag("intent_tier", "model")
+        try:
+            if cls.INTENT_BATCHING:
+                future = cls.get_intent_batcher().submit(query)
+                try:
+                    intent, confidence = future.result(timeout=cls.INTENT_BATCH_TIMEOUT_MS / 1000.0)
+                except FuturesTimeoutError:
+                    future.cancel()
+                    return cls._intent_batch_timeout(heuristic)
+            else:
+                intent, confidence = cls._predict_batch([query])[0]
+        except Exception as e:
+            print(f"Inference Error: {e}")
             intent = "exploratory_question"
-            confidence = 0.85
-            if any(w in query_lower for w in ["define", "what is", "explain"]):
-                intent = "concept_learning"
-            elif any(w in query_lower for w in ["how to", "code for", "implement", "error", "bug"]):
-                intent = "problem_solving"
-            elif any(w in query_lower for w in ["interview", "question", "mock"]):
-                intent = "interview_preparation"
-            elif any(w in query_lower for w in ["summary", "recap", "review"]):
-                intent = "quick_revision"
-            
-        # Detect confusion (Mock LSTM - kept as rule for now)
-        is_confused = False
-        if any(w in query_lower for w in ["don't understand", "im lost", "confusing", "hard"]):
-            is_confused = True
-            
+            confidence = 0.5
+        return cls._intent_result(intent, confidence, heuristic[2], model.model_version)
+
+    @classmethod
+    def _intent_prelude(cls, query: str) -> tuple:
+        """
+        The in-process tiers of analyze_intent, shared with AsyncCognitiveEngine.
+        Returns (result, heuristic, student_guess): `result` is final when the student is
+        confident, else None and DistilBERT decides.
+        """
+        # Keyword rules: the intent fallback and the confusion flag (see inference/heuristics.py)
+        heuristic = cls.get_heuristics().match(query)
+        
+        # 1. Distilled student (microseconds); confident answers skip DistilBERT entirely
+        student = cls.get_student()
+        if not student:
+            return None, heuristic, None
+        intent, confidence = student.predict([query])[0]
+        guess = cls._intent_result(intent, confidence, heuristic[2], student.model_version)
+        if confidence >= cls.INTENT_STUDENT_THRESHOLD:
+            tag("intent_tier", "student")
+            return guess, heuristic, guess
+        return None, heuristic, guess
+
+    @staticmethod
+    def _intent_result(intent, confidence, is_confused, model_version) -> dict:
         return {
             "intent": intent,
             "confidence": confidence,
             "is_confused": is_confused,
-            "model_version": "v3-distilbert" if model else "v1-heuristic-python"
+            "model_version": model_version
         }
+
+    @classmethod
+    def _intent_without_model(cls, heuristic, student_guess) -> dict:
+        if student_guess:
+            # No DistilBERT to defer to: the student's best guess beats the keyword rules
+            tag("intent_tier", "student")
+            return student_guess
+        # 3. Heuristic Fallback
+        intent, confidence, is_confused = heuristic
+        return cls._intent_result(intent, confidence, is_confused, "v1-heuristic-python")
+
+    @classmethod
+    def _intent_batch_timeout(cls, heuristic) -> dict:
+        # Batcher backed up (or its thread died): don't hold the request hostage
+        print(f"⚠️ Intent batcher timed out after {cls.INTENT_BATCH_TIMEOUT_MS:.0f}ms; using heuristics")
+        tag("intent_tier", "heuristic")
+        intent, confidence, is_confused = heuristic
+        return cls._intent_result(intent, confidence, is_confused, "v1-heuristic-python")
+
+    @classmethod
+    def analyze_intents(cls, queries: list, chunk_size: int = None) -> list:
+        """
+        Batch variant of analyze_intent: one result per query, in input order.
+        The student classifies everything first; the queries it is unsure of are sorted
+        by length and sent to DistilBERT `chunk_size` at a time, so each padded forward
+        pass holds similar-length inputs; results are scattered back.
+        """
+        heuristics = cls.get_heuristics().match_many(queries)
+        predictions = [None] * len(queries)
+        versions = [None] * len(queries)
+        pending = list(range(len(queries)))
+        
+        student = cls.get_student()
+        if student and queries:
+            student_predictions = student.predict(queries)
+            pending = []
+            for i, (intent, confidence) in enumerate(student_predictions):
+                if confidence >= cls.INTENT_STUDENT_THRESHOLD:
+                    predictions[i], versions[i] = (intent, confidence), student.model_version
+                else:
+                    pending.append(i)
+        
+        model = cls.get_model()
+        if model and cls._tokenizer:
+            chunk_size = chunk_size or cls.INTENT_CHUNK_SIZE
+            order = sorted(pending, key=lambda i: len(queries[i]))
+            for start in range(0, len(order), chunk_size):
+                indices = order[start:start + chunk_size]
+                try:
+                    chunk = cls._predict_batch([queries[i] for i in indices])
+                except Exception as e:
+                    print(f"Inference Error: {e}")
+                    chunk = [("exploratory_question", 0.5)] * len(indices)
+                for i, prediction in zip(indices, chunk):
+                    predictions[i], versions[i] = prediction, model.model_version
+        elif student:
+            for i in pending:
+                predictions[i], versions[i] = student_predictions[i], student.model_version
+        else:
+            for i in pending:
+                predictions[i], versions[i] = heuristics[i][:2], "v1-heuristic-python"
+        
+        return [
+            {
+                "intent": intent,
+                "confidence": confidence,
+                "is_confused": is_confused,
+                "model_version": model_version
+            }
+            for (intent, confidence), model_version, (_, _, is_confused) in zip(predictions, versions, heuristics)
+        ]
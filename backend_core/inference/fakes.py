@@ -0,0 +1,188 @@
+"""
+Deterministic local stand-ins for Vertex AI and Firestore clients.
+Used to exercise the ingestion pipeline and the RAG flow (benchmarks/bench_rag.py)
+without credentials or network access; every fake takes an injected latency.
+"""
+import hashlib
+import random
+import threading
+import time
+
+import numpy as np
+
+
+class FakeEmbedding:
+    def __init__(self, values):
+        self.values = values
+
+
+class FakeEmbeddingModel:
+    """
+    Mimics vertexai TextEmbeddingModel.get_embeddings().
+    Vectors are unit-normalized and derived from the sha256 of the text, so the same
+    text always gets the same vector. `latency` (seconds) is slept per request and
+    `fail_rate` makes that fraction of requests raise, to exercise retry paths.
+    `max_tokens` rejects requests whose total token count (`chars_per_token` characters
+    each) is over it, with Vertex AI's error message.
+    """
+
+    def __init__(self, dim=768, latency=0.0, fail_rate=0.0, max_batch=250, seed=0,
+                 max_tokens=None, chars_per_token=4.0):
+        self.dim = dim
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.max_batch = max_batch
+        self.max_tokens = max_tokens
+        self.chars_per_token = chars_per_token
+        self.calls = 0
+        self.texts_embedded = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def embed_text(self, text: str) -> list:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vec = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+        return (vec / np.linalg.norm(vec)).tolist()
+
+    def get_embeddings(self, texts: list):
+        with self._lock:
+            self.calls += 1
+            fail = self._rng.random() < self.fail_rate
+        if len(texts) > self.max_batch:
+            raise ValueError(f"FakeEmbeddingModel: {len(texts)} texts exceeds the {self.max_batch} per-request limit")
+        if self.max_tokens:
+            tokens = sum(int(len(t) / self.chars_per_token) + 1 for t in texts)
+            if tokens > self.max_tokens:
+                raise ValueError(
+                    f"Unable to submit request because the input token count is {tokens} "
+                    f"but the model supports up to {self.max_tokens}"
+                )
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            raise RuntimeError("FakeEmbeddingModel: injected failure (429 Resource exhausted)")
+        with self._lock:
+            self.texts_embedded += len(texts)
+        return [FakeEmbedding(self.embed_text(t)) for t in texts]
+
+
+class FakeGenerationChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    """
+    Mimics vertexai GenerativeModel.generate_content(), including stream=True.
+    The answer is built from the query so output is deterministic; `latency` is the
+    time-to-first-token and `token_latency` the delay between streamed chunks.
+    """
+
+    def __init__(self, latency=0.0, token_latency=0.0, words=40):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.words = words
+        self.calls = 0
+
+    def _answer(self, contents) -> list:
+        query = contents[-1] if contents else ""
+        base = f"Here is an explanation of {query}.".split()
+        return [base[i % len(base)] for i in range(self.words)]
+
+    def generate_content(self, contents, generation_config=None, stream=False):
+        self.calls += 1
+        words = self._answer(contents)
+        if not stream:
+            delay = self.latency + self.token_latency * len(words)
+            if delay:
+                time.sleep(delay)
+            return FakeGenerationChunk(" ".join(words))
+        return self._stream(words)
+
+    def _stream(self, words):
+        if self.latency:
+            time.sleep(self.latency)
+        for i, word in enumerate(words):
+            if i and self.token_latency:
+                time.sleep(self.token_latency)
+            yield FakeGenerationChunk(word if i == 0 else " " + word)
+
+
+class FakeSnapshot:
+    def __init__(self, data):
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class FakeVectorQuery:
+    def __init__(self, client, query_vector, limit):
+        self.client = client
+        self.query_vector = query_vector
+        self.limit = limit
+
+    def get(self):
+        if self.client.latency:
+            time.sleep(self.client.latency)
+        docs = self.client.docs
+        if not docs:
+            return []
+        # Deterministic "nearest" set: a window into the corpus chosen by the query vector
+        digest = hashlib.sha256(repr(list(self.query_vector)[:16]).encode("utf-8")).digest()
+        start = int.from_bytes(digest[:4], "little") % len(docs)
+        return [FakeSnapshot(docs[(start + i) % len(docs)]) for i in range(min(self.limit, len(docs)))]
+
+
+class FakeCollection:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def find_nearest(self, vector_field, query_vector, distance_measure, limit):
+        return FakeVectorQuery(self.client, query_vector, limit)
+
+
+class FakeFirestore:
+    """
+    Mimics firestore.Client for the `knowledge_vectors` find_nearest query used by
+    FirestoreRetrievalBackend. `docs` are {"filePath", "heading", "content"} dicts.
+    """
+
+    def __init__(self, docs, latency=0.0):
+        self.docs = list(docs)
+        self.latency = latency
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+
+def sample_docs(count=200, words=120, seed=0) -> list:
+    rng = random.Random(seed)
+    vocabulary = (
+        "array list tree graph node pointer recursion stack queue heap hash map key value "
+        "sort search binary linear time space complexity loop function return index"
+    ).split()
+    return [
+        {
+            "filePath": f"content/bench/lesson-{i // 4}.json",
+            "heading": ["theory", "code", "examples", "summary"][i % 4],
+            "content": " ".join(rng.choice(vocabulary) for _ in range(words)),
+        }
+        for i in range(count)
+    ]
+
+
+def install_fakes(engine, embed_latency=0.0, retrieve_latency=0.0, generate_latency=0.0,
+                  token_latency=0.0, docs=None):
+    """
+    Registers fakes in CognitiveEngine's client registry in place of Vertex embeddings,
+    Gemini and Firestore, and marks the engine initialized so no SDK init runs.
+    """
+    engine._clients.update({
+        "embedding": FakeEmbeddingModel(latency=embed_latency),
+        "generative": FakeGenerativeModel(latency=generate_latency, token_latency=token_latency),
+        "firestore": FakeFirestore(docs if docs is not None else sample_docs(), latency=retrieve_latency),
+    })
+    engine._initialized = True
+    return engine
@@ -0,0 +1,99 @@
+"""
+Rule-based intent fallback and confusion detector.
+
+Rules live in a JSON file (inference/intent_rules.json, or INTENT_RULES_FILE):
+    intents    - ordered [{"intent", "keywords": {keyword: weight}}]; list order breaks ties
+    confusion  - keywords that flag the query as confused
+    strategy   - "priority": the first intent (in list order) with any keyword wins, as
+                 in the original if/elif chain; "weighted" (default): each distinct
+                 keyword adds its weight to its intent and the highest score wins
+    default_intent / confidence
+
+All keywords are compiled into one alternation regex (longest first), so a query is
+scanned once however many rules there are. A keyword counts if it occurs in the
+lowercased query, as with the old `w in query_lower` checks; keywords contained in a
+longer match (e.g. "bug" in "debug mode" if both were rules) are credited with it, but an
+occurrence that only partially overlaps a longer match is not. No match means
+`default_intent`.
+
+The shipped rules are the original keyword lists with strategy "priority", so the
+matcher returns exactly what the old chain of `any(w in query_lower ...)` checks did.
+"""
+import json
+import os
+import re
+
+DEFAULT_RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intent_rules.json")
+CONFUSED = -1 # slot used for confusion keywords
+
+
+class KeywordIntentMatcher:
+    def __init__(self, rules: dict):
+        self.default_intent = rules.get("default_intent", "exploratory_question")
+        self.confidence = float(rules.get("confidence", 0.85))
+        self.intents = [rule["intent"] for rule in rules["intents"]]
+        self.strategy = rules.get("strategy", "weighted")
+        if self.strategy not in ("priority", "weighted"):
+            raise ValueError(f"Unknown intent rule strategy '{self.strategy}'. Choose priority or weighted.")
+
+        table = {} # keyword -> [(slot, weight)]
+        for slot, rule in enumerate(rules["intents"]):
+            for keyword, weight in rule["keywords"].items():
+                table.setdefault(keyword.lower(), []).append((slot, float(weight)))
+        for keyword in rules.get("confusion", []):
+            table.setdefault(keyword.lower(), []).append((CONFUSED, 0.0))
+
+        keywords = sorted(table, key=len, reverse=True)
+        self._regex = re.compile("|".join(re.escape(k) for k in keywords) or "(?!)")
+        self._table = table
+        self._contained = {keyword: [k for k in keywords if k in keyword] for keyword in keywords}
+        # Distinct keyword combinations are few, so decisions are memoized per combination
+        self._decisions = {}
+
+    @classmethod
+    def from_file(cls, path: str = None):
+        with open(path or DEFAULT_RULES_FILE, "r") as f:
+            return cls(json.load(f))
+
+    def _decide(self, matched: frozenset) -> tuple:
+        decision = self._decisions.get(matched)
+        if decision is None:
+            if len(self._decisions) >= 4096:
+                self._decisions.clear()
+            decision = self._decisions[matched] = self._score(matched)
+        return decision
+
+    def _score(self, matched: frozenset) -> tuple:
+        scores = [0.0] * len(self.intents)
+        is_confused = False
+        credited = set()
+        for keyword in matched:
+            credited.update(self._contained[keyword])
+        for keyword in credited:
+            for slot, weight in self._table[keyword]:
+                if slot == CONFUSED:
+                    is_confused = True
+                else:
+                    scores[slot] += weight
+        if self.strategy == "priority":
+            best = next((i for i, score in enumerate(scores) if score > 0), None)
+        else:
+            best = max(range(len(scores)), key=lambda i: (scores[i], -i)) if scores else None
+        intent = self.intents[best] if best is not None and scores[best] > 0 else self.default_intent
+        return intent, self.confidence, is_confused
+
+    def match(self, query: str) -> tuple:
+        """Returns (intent, confidence, is_confused)."""
+        return self._decide(frozenset(self._regex.findall(query.lower())))
+
+    def match_many(self, queries: list) -> list:
+        """Batch variant of match(), in input order; repeated queries are scanned once."""
+        findall, decide = self._regex.findall, self._decide
+        seen = {}
+        results = []
+        for query in queries:
+            result = seen.get(query)
+            if result is None:
+                result = seen[query] = decide(frozenset(findall(query.lower())))
+            results.append(result)
+        return results
@@ -0,0 +1,230 @@
+"""
+BM25 lexical index over knowledge chunks, for hybrid retrieval.
+
+Built offline (`python manage.py build_lexical_index`) from the same section-aware
+chunks that KnowledgeNode stores, and saved as a compact directory of arrays that is
+memory-mapped on load:
+    postings_doc.npy  uint32  chunk ids, grouped by term
+    postings_tf.npy   uint16  term frequency for each posting
+    doc_len.npy       uint32  token count per chunk
+    chunk_source.npy  uint32  lesson of each chunk, as an index into sources.json
+    chunk_index.npy   uint32  position of each chunk in its lesson (storage.chunking)
+    vocab.json        term -> [offset, length] into the postings arrays
+    sources.json      [[source_path, content_hash], ...] for the indexed lessons
+
+Chunk text isn't duplicated here: search() reads the hits' text from the content catalog
+(storage/catalog.py), and drops hits on lessons whose content changed since the build.
+Each save() writes a new build directory under the index dir and then atomically
+replaces the CURRENT pointer file, so a worker never loads half of two builds.
+"""
+import json
+import math
+import os
+import re
+import shutil
+import time
+
+import numpy as np
+
+TOKEN_RE = re.compile(r"[a-z0-9_]+(?:[.:][a-z0-9_]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it me my of on or "
+    "please tell that the this to what when where which who why with you".split()
+)
+
+
+def tokenize(text: str) -> list:
+    """Lowercased word tokens; dotted names (os.path.join, std::vector) are kept whole and split."""
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        if "." in token or ":" in token:
+            tokens.extend(part for part in re.split(r"[.:]+", token) if part and part not in STOPWORDS)
+    return tokens
+
+
+def reciprocal_rank_fusion(result_lists: list, k: int = 60) -> list:
+    """
+    Fuses ranked chunk lists: score(chunk) = sum over lists of 1 / (k + rank).
+    Chunks are identified by their content; the first occurrence's metadata is kept.
+    """
+    fused, scores = {}, {}
+    for results in result_lists:
+        for rank, chunk in enumerate(results, start=1):
+            key = chunk["content"]
+            fused.setdefault(key, chunk)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    order = sorted(scores, key=scores.get, reverse=True)
+    return [{**fused[key], "score": scores[key]} for key in order]
+
+
+class BM25Index:
+    ARRAYS = ("postings_doc", "postings_tf", "doc_len", "chunk_source", "chunk_index")
+    KEEP_BUILDS = 2 # the newest builds stay on disk for workers still loading them
+
+    def __init__(self, postings_doc, postings_tf, doc_len, chunk_source, chunk_index, vocab, sources,
+                 k1=1.2, b=0.75):
+        self.postings_doc = postings_doc
+        self.postings_tf = postings_tf
+        self.doc_len = doc_len
+        self.chunk_source = chunk_source
+        self.chunk_index = chunk_index
+        self.vocab = vocab
+        self.sources = sources
+        self.k1 = k1
+        self.b = b
+        self.num_docs = len(doc_len)
+        self.avg_len = float(doc_len.mean()) if len(doc_len) else 0.0
+        # Per-chunk BM25 length normalization, computed once
+        self._norm = k1 * (1 - b + b * np.asarray(doc_len, dtype=np.float32) / (self.avg_len or 1.0))
+
+    # --- Build / persist -------------------------------------------------------
+
+    @classmethod
+    def build(cls, chunks: list, content_hashes: dict):
+        """
+        `chunks`: [{"source", "chunk_index", "content"}, ...], as chunk_document returns them.
+        `content_hashes`: source -> the lesson's content_hash when the chunks were made.
+        """
+        term_postings = {}
+        doc_len = np.zeros(len(chunks), dtype=np.uint32)
+        for doc_id, chunk in enumerate(chunks):
+            counts = {}
+            for token in tokenize(chunk["content"]):
+                counts[token] = counts.get(token, 0) + 1
+            doc_len[doc_id] = sum(counts.values())
+            for term, tf in counts.items():
+                term_postings.setdefault(term, []).append((doc_id, min(tf, 65535)))
+
+        vocab, docs_out, tfs_out, offset = {}, [], [], 0
+        for term in sorted(term_postings):
+            postings = term_postings[term]
+            vocab[term] = [offset, len(postings)]
+            docs_out.extend(d for d, _ in postings)
+            tfs_out.extend(tf for _, tf in postings)
+            offset += len(postings)
+
+        source_ids = {}
+        for chunk in chunks:
+            source_ids.setdefault(chunk["source"], len(source_ids))
+        return cls(
+            np.asarray(docs_out, dtype=np.uint32),
+            np.asarray(tfs_out, dtype=np.uint16),
+            doc_len,
+            np.asarray([source_ids[c["source"]] for c in chunks], dtype=np.uint32),
+            np.asarray([c["chunk_index"] for c in chunks], dtype=np.uint32),
+            vocab,
+            [[source, content_hashes.get(source)] for source in source_ids],
+        )
+
+    def save(self, index_dir: str):
+        # Private build directory: nothing reads it until CURRENT points at it
+        name = f"build-{time.time_ns()}-{os.getpid()}"
+        build_dir = os.path.join(index_dir, name)
+        os.makedirs(build_dir)
+        for array in self.ARRAYS:
+            np.save(os.path.join(build_dir, f"{array}.npy"), getattr(self, array))
+        with open(os.path.join(build_dir, "vocab.json"), "w") as f:
+            json.dump(self.vocab, f, separators=(",", ":"))
+        with open(os.path.join(build_dir, "sources.json"), "w") as f:
+            json.dump(self.sources, f, separators=(",", ":"))
+
+        tmp = os.path.join(index_dir, f"CURRENT.{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            f.write(name)
+        os.replace(tmp, os.path.join(index_dir, "CURRENT"))
+
+        builds = [n for n in os.listdir(index_dir) if n.startswith("build-")]
+        builds.sort(key=lambda n: int(n.split("-")[1]))
+        for old in builds[:-self.KEEP_BUILDS]:
+            if old != name:
+                shutil.rmtree(os.path.join(index_dir, old), ignore_errors=True)
+
+    @classmethod
+    def load(cls, index_dir: str):
+        """Returns the index, or None if it hasn't been built."""
+        try:
+            with open(os.path.join(index_dir, "CURRENT")) as f:
+                build_dir = os.path.join(index_dir, f.read().strip())
+            arrays = [np.load(os.path.join(build_dir, f"{array}.npy"), mmap_mode="r") for array in cls.ARRAYS]
+            with open(os.path.join(build_dir, "vocab.json")) as f:
+                vocab = json.load(f)
+            with open(os.path.join(build_dir, "sources.json")) as f:
+                sources = json.load(f)
+        except FileNotFoundError:
+            return None
+        return cls(*arrays, vocab, sources)
+
+    # --- Query -----------------------------------------------------------------
+
+    def idf(self, df: int) -> float:
+        return math.log(1 + (self.num_docs - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, limit: int = 10, catalog=None) -> list:
+        """
+        Returns the top chunks by BM25 as [{"source", "section", "content", "score",
+        "coverage"}], where coverage is the fraction of query terms the chunk contains.
+        Text comes from `catalog` (storage.catalog.ContentCatalog); hits on lessons that
+        are gone or changed since the build are left out.
+        """
+        if not catalog:
+            return []
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.num_docs:
+            return []
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        matched = np.zeros(self.num_docs, dtype=np.uint8)
+        norm = self._norm
+        for term in terms:
+            entry = self.vocab.get(term)
+            if entry is None:
+                continue
+            offset, length = entry
+            doc_ids = np.asarray(self.postings_doc[offset:offset + length], dtype=np.int64)
+            tf = np.asarray(self.postings_tf[offset:offset + length], dtype=np.float32)
+            scores[doc_ids] += self.idf(length) * tf * (self.k1 + 1) / (tf + norm[doc_ids])
+            matched[doc_ids] += 1
+
+        hits = np.flatnonzero(scores)
+        if not len(hits):
+            return []
+        k = min(limit, len(hits))
+        top = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        top = top[np.argsort(-scores[top])]
+
+        results, lessons = [], {}
+        for i in top:
+            source, content_hash = self.sources[int(self.chunk_source[i])]
+            if source not in lessons:
+                # One sections read per lesson, however many of its chunks hit
+                doc = catalog.by_path(source)
+                lessons[source] = catalog.chunks(doc) if doc and doc["content_hash"] == content_hash else []
+            position = int(self.chunk_index[i])
+            if position >= len(lessons[source]):
+                continue
+            chunk = lessons[source][position]
+            results.append({
+                "source": source,
+                "section": chunk["section"],
+                "content": chunk["content"],
+                "score": float(scores[i]),
+                "coverage": float(matched[i]) / len(terms),
+            })
+        return results
+
+    @staticmethod
+    def is_confident(results: list, min_score: float, min_margin: float) -> bool:
+        """
+        High-confidence keyword hit: the top chunk contains every query term, scores above
+        `min_score`, and beats the best chunk from any *other* source document by
+        `min_margin`x. Used to skip the embedding call.
+        """
+        if not results:
+            return False
+        top = results[0]
+        if top["coverage"] < 1.0 or top["score"] < min_score:
+            return False
+        runner_up = next((r["score"] for r in results[1:] if r["source"] != top["source"]), 0.0)
+        return runner_up == 0.0 or top["score"] / runner_up >= min_margin
@@ -0,0 +1,30 @@
+import os
+import resource
+
+
+def process_memory() -> dict:
+    """
+    Memory snapshot of the current process in MB.
+    On Linux, Pss/Shared come from /proc/self/smaps_rollup and show how much of the
+    RSS is copy-on-write shared with the gunicorn master.
+    """
+    stats = {"pid": os.getpid()}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                key = parts[0].rstrip(":")
+                if key in ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty"):
+                    stats[key] = int(parts[1]) / 1024
+        stats["Shared"] = stats.pop("Shared_Clean", 0) + stats.pop("Shared_Dirty", 0)
+        stats["Private"] = stats.pop("Private_Clean", 0) + stats.pop("Private_Dirty", 0)
+    except OSError:
+        # Non-Linux fallback: peak RSS only (KB on Linux, bytes on macOS)
+        stats["MaxRss"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return stats
+
+
+def format_memory(label: str) -> str:
+    stats = process_memory()
+    fields = " ".join(f"{k}={v:.1f}MB" for k, v in stats.items() if k != "pid")
+    return f"📊 [{label}] pid={stats['pid']} {fields}"
@@ -0,0 +1,292 @@
+"""
+Retrieval backends for CognitiveEngine.retrieve_context.
+
+A backend returns the nearest knowledge chunks for a query embedding:
+    backend.search(query_vector, limit) -> [{"source", "section", "content", "score"}, ...]
+ordered best first. Selected with the RETRIEVAL_BACKEND env var:
+    firestore - Firestore find_nearest over the `knowledge_vectors` collection (default)
+    local     - in-process index over KnowledgeNode rows, no network on the query path
+    pgvector  - cosine search in Postgres over KnowledgeNode's HNSW index (KnowledgeNode.Meta)
+"""
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+
+class FirestoreRetrievalBackend:
+    name = "firestore"
+
+    def __init__(self, client_factory):
+        self.client_factory = client_factory
+
+    def search(self, query_vector: list, limit: int) -> list:
+        # Requires 'google-cloud-firestore>=2.17.0'
+        from google.cloud.firestore_v1.vector import Vector
+
+        coll = self.client_factory().collection("knowledge_vectors")
+        query = coll.find_nearest(
+            vector_field="embedding",
+            query_vector=Vector(query_vector),
+            distance_measure="COSINE",
+            limit=limit
+        )
+        results = []
+        for doc in query.get():
+            data = doc.to_dict()
+            results.append({
+                "source": data.get("filePath"),
+                "section": data.get("heading", ""),
+                "content": data.get("content", ""),
+                "score": None,
+            })
+        return results
+
+
+class PgVectorRetrievalBackend:
+    """
+    Cosine-distance search over KnowledgeNode.embedding using the HNSW index declared
+    in KnowledgeNode.Meta. The recall/speed knob is set per query inside the transaction
+    (SET LOCAL), so it never leaks to other queries on a pooled connection:
+        hnsw.ef_search  - candidate list size; must be >= limit (default PGVECTOR_EF_SEARCH)
+    """
+    name = "pgvector"
+
+    def __init__(self, ef_search=40):
+        self.ef_search = ef_search
+
+    def search(self, query_vector: list, limit: int, ef_search: int = None) -> list:
+        from django.db import connection, transaction
+        from pgvector.django import CosineDistance
+        from storage.models import KnowledgeNode
+
+        ef_search = max(ef_search or self.ef_search, limit)
+        with transaction.atomic():
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL hnsw.ef_search = %s", [ef_search])
+            rows = list(
+                KnowledgeNode.objects
+                .annotate(distance=CosineDistance("embedding", query_vector))
+                .order_by("distance")
+                .values_list("source_path", "section", "content", "distance")[:limit]
+            )
+        return [
+            {"source": source, "section": section, "content": content, "score": 1.0 - float(distance)}
+            for source, section, content, distance in rows
+        ]
+
+
+class LocalVectorIndex:
+    """
+    In-process cosine index over KnowledgeNode embeddings.
+
+    Vectors are unit-normalized into one float32 matrix and memory-mapped on load, so
+    every gunicorn worker shares the page cache. Each build is written to its own
+    directory under `index_dir` (vectors.f32 + meta.json [+ hnsw.bin]) and published by
+    atomically replacing the CURRENT pointer file, so a worker always loads a matching
+    set of files. Search is a brute-force matrix-vector product with argpartition
+    top-k (a few ms for 10k x 768 on one core); above `hnsw_min_items` an HNSW graph (hnswlib, optional)
+    is built instead.
+
+    The index is stamped with a signature of the table (row count, max id); every
+    `refresh_seconds` a search checks the stamp and, if the table changed, rebuilds in a
+    background thread while the old index keeps serving.
+    """
+    name = "local"
+    KEEP_BUILDS = 2 # the newest builds stay on disk for workers still loading them
+
+    def __init__(self, index_dir: str, dim=768, refresh_seconds=60, hnsw_min_items=50000):
+        self.index_dir = index_dir
+        self.dim = dim
+        self.refresh_seconds = refresh_seconds
+        self.hnsw_min_items = hnsw_min_items
+        self.current_path = os.path.join(index_dir, "CURRENT")
+
+        # (matrix, rows, hnsw, signature), swapped as one reference so readers never mix versions
+        self._state = (None, [], None, None)
+        self._last_check = 0.0
+        self._rebuilding = threading.Lock()
+
+    # --- Loading -------------------------------------------------------------
+
+    @staticmethod
+    def table_signature():
+        from django.db.models import Count, Max
+        from storage.models import KnowledgeNode
+        agg = KnowledgeNode.objects.aggregate(n=Count("id"), max_id=Max("id"))
+        return [agg["n"], agg["max_id"] or 0]
+
+    def load(self):
+        """Memory-maps the on-disk index if it matches the table, otherwise rebuilds it."""
+        signature = self.table_signature()
+        if not self._load_from_disk(signature):
+            self.build(signature)
+        self._last_check = time.monotonic()
+        return self
+
+    def _current_build(self):
+        try:
+            with open(self.current_path, "r") as f:
+                return os.path.join(self.index_dir, f.read().strip())
+        except FileNotFoundError:
+            return None
+
+    def _load_from_disk(self, signature) -> bool:
+        build_dir = self._current_build()
+        if build_dir is None:
+            return False
+        try:
+            with open(os.path.join(build_dir, "meta.json"), "r") as f:
+                meta = json.load(f)
+            if meta.get("signature") != signature or meta.get("dim") != self.dim:
+                return False
+            rows = meta["rows"]
+            matrix = np.memmap(
+                os.path.join(build_dir, "vectors.f32"), dtype=np.float32, mode="r", shape=(len(rows), self.dim)
+            ) if rows else None
+        except FileNotFoundError:
+            return False # pruned by a newer build between reading CURRENT and opening it
+        self._publish(matrix, rows, self._load_hnsw(build_dir, len(rows)), signature)
+        print(f"📚 Local vector index mapped from disk ({len(rows)} chunks)")
+        return True
+
+    def build(self, signature=None):
+        """Streams KnowledgeNode rows into a normalized matrix, persists it and swaps it in."""
+        from storage.models import KnowledgeNode
+
+        signature = signature or self.table_signature()
+        start = time.perf_counter()
+        vectors, rows = [], []
+        queryset = KnowledgeNode.objects.order_by("id").values_list(
+            "id", "source_path", "section", "content", "embedding"
+        )
+        for node_id, source_path, section, content, embedding in queryset.iterator(chunk_size=500):
+            vectors.append(np.asarray(embedding, dtype=np.float32))
+            rows.append({"id": node_id, "source": source_path, "section": section, "content": content})
+
+        # Private build directory: nothing reads it until CURRENT points at it
+        name = f"build-{time.time_ns()}-{os.getpid()}"
+        build_dir = os.path.join(self.index_dir, name)
+        os.makedirs(build_dir)
+        matrix = None
+        if vectors:
+            matrix = np.vstack(vectors)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix /= np.where(norms == 0, 1.0, norms)
+            vectors_path = os.path.join(build_dir, "vectors.f32")
+            matrix.tofile(vectors_path)
+            matrix = np.memmap(vectors_path, dtype=np.float32, mode="r", shape=matrix.shape)
+        hnsw = self._build_hnsw(matrix, build_dir) if matrix is not None and len(rows) >= self.hnsw_min_items else None
+        with open(os.path.join(build_dir, "meta.json"), "w") as f:
+            json.dump({"signature": signature, "dim": self.dim, "rows": rows}, f)
+
+        # Publish: one rename swaps vectors, metadata and graph together
+        tmp = self.current_path + f".{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(name)
+        os.replace(tmp, self.current_path)
+        self._prune(name)
+
+        self._publish(matrix, rows, hnsw, signature)
+        print(f"📚 Local vector index built: {len(rows)} chunks in {time.perf_counter() - start:.2f}s")
+
+    def _publish(self, matrix, rows, hnsw, signature):
+        self._state = (matrix, rows, hnsw, signature)
+
+    def _prune(self, current):
+        # Workers that mapped an older build keep their mapping after the files are unlinked
+        builds = [n for n in os.listdir(self.index_dir) if n.startswith("build-")]
+        builds.sort(key=lambda n: int(n.split("-")[1]))
+        for name in builds[:-self.KEEP_BUILDS]:
+            if name != current:
+                shutil.rmtree(os.path.join(self.index_dir, name), ignore_errors=True)
+
+    # --- Optional HNSW ---------------------------------------------------------
+
+    def _build_hnsw(self, matrix, build_dir):
+        try:
+            import hnswlib
+        except ImportError:
+            print("ℹ️ hnswlib not installed; using brute-force search")
+            return None
+        index = hnswlib.Index(space="ip", dim=self.dim)
+        index.init_index(max_elements=len(matrix), ef_construction=200, M=16)
+        index.add_items(np.asarray(matrix), np.arange(len(matrix)))
+        index.set_ef(64)
+        index.save_index(os.path.join(build_dir, "hnsw.bin"))
+        return index
+
+    def _load_hnsw(self, build_dir, count):
+        hnsw_path = os.path.join(build_dir, "hnsw.bin")
+        if count < self.hnsw_min_items or not os.path.exists(hnsw_path):
+            return None
+        try:
+            import hnswlib
+        except ImportError:
+            return None
+        index = hnswlib.Index(space="ip", dim=self.dim)
+        index.load_index(hnsw_path, max_elements=count)
+        index.set_ef(64)
+        return index
+
+    # --- Refresh ---------------------------------------------------------------
+
+    def maybe_refresh(self):
+        now = time.monotonic()
+        if now - self._last_check < self.refresh_seconds:
+            return
+        self._last_check = now
+        if not self._rebuilding.acquire(blocking=False):
+            return
+        threading.Thread(target=self._refresh, name="vector-index-refresh", daemon=True).start()
+
+    def _refresh(self):
+        try:
+            signature = self.table_signature()
+            if signature != self._state[3] and not self._load_from_disk(signature):
+                self.build(signature)
+        except Exception as e:
+            print(f"⚠️ Vector index refresh failed: {e}")
+        finally:
+            from django.db import connection
+            connection.close()
+            self._rebuilding.release()
+
+    # --- Query -----------------------------------------------------------------
+
+    def search(self, query_vector: list, limit: int) -> list:
+        self.maybe_refresh()
+        matrix, rows, hnsw, _ = self._state
+        if matrix is None or not rows:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        query /= (np.linalg.norm(query) or 1.0)
+        k = min(limit, len(rows))
+
+        if hnsw is not None:
+            labels, distances = hnsw.knn_query(query, k=k)
+            top, scores = labels[0], 1.0 - distances[0]
+        else:
+            scores_all = matrix @ query
+            top = np.argpartition(-scores_all, k - 1)[:k]
+            top = top[np.argsort(-scores_all[top])]
+            scores = scores_all[top]
+
+        return [
+            {**rows[int(i)], "score": float(score)}
+            for i, score in zip(top, scores)
+        ]
+
+
+def build_retriever(name: str, firestore_factory, index_dir: str):
+    if name == "firestore":
+        return FirestoreRetrievalBackend(firestore_factory)
+    if name == "local":
+        return LocalVectorIndex(index_dir).load()
+    if name == "pgvector":
+        return PgVectorRetrievalBackend(ef_search=int(os.getenv("PGVECTOR_EF_SEARCH", "40")))
+    raise ValueError(f"Unknown retrieval backend '{name}'. Choose firestore, local or pgvector.")
@@ -0,0 +1,157 @@
+"""
+Distilled intent student: a hashed n-gram softmax classifier for the hot path.
+
+Trained by `python -m training.distill` on DistilBERT's temperature-softened outputs, it
+answers most queries in tens of microseconds with numpy alone; CognitiveEngine falls
+back to DistilBERT when the student's top probability is under INTENT_STUDENT_THRESHOLD.
+
+Features are word unigrams, word bigrams and character trigrams of each word, hashed
+(crc32, stable across processes) into NUM_BUCKETS rows of a weight matrix and scaled by
+1/sqrt(n). Saved as a directory, memory-mapped on load so forked workers share it:
+    weights.npy  float32 (buckets, labels)
+    bias.npy     float32 (labels,)
+    meta.json    labels, buckets, model_version, training report
+"""
+import json
+import os
+import re
+import zlib
+
+import numpy as np
+
+NUM_BUCKETS = 1 << 18
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return shifted / shifted.sum(axis=1, keepdims=True)
+
+
+class HashedNgramStudent:
+    name = "student"
+    model_version = "v4-student-hashed-ngram"
+
+    def __init__(self, labels: list, weights=None, bias=None, num_buckets=NUM_BUCKETS, meta=None):
+        self.labels = list(labels)
+        self.num_buckets = num_buckets
+        self.weights = weights if weights is not None else np.zeros((num_buckets, len(labels)), dtype=np.float32)
+        self.bias = bias if bias is not None else np.zeros(len(labels), dtype=np.float32)
+        self.meta = meta or {}
+
+    # --- Features --------------------------------------------------------------
+
+    def features(self, text: str) -> np.ndarray:
+        words = TOKEN_RE.findall(text.lower())
+        grams = ["<s>"] # never empty, so every query has at least one row
+        grams.extend("w:" + w for w in words)
+        grams.extend(f"b:{a} {b}" for a, b in zip(words, words[1:]))
+        for w in words:
+            padded = f"<{w}>"
+            grams.extend("c:" + padded[i:i + 3] for i in range(len(padded) - 2))
+        buckets = self.num_buckets
+        return np.fromiter((zlib.crc32(g.encode()) % buckets for g in grams), dtype=np.int64, count=len(grams))
+
+    def _encode(self, texts: list) -> tuple:
+        """(flat bucket ids, segment starts, per-row scale) for a batch."""
+        rows = [self.features(t) for t in texts]
+        lengths = np.fromiter((len(r) for r in rows), dtype=np.int64, count=len(rows))
+        starts = np.zeros(len(rows), dtype=np.int64)
+        np.cumsum(lengths[:-1], out=starts[1:])
+        return np.concatenate(rows), starts, lengths
+
+    def _logits(self, ids, starts, lengths) -> np.ndarray:
+        summed = np.add.reduceat(self.weights[ids], starts, axis=0)
+        return summed / np.sqrt(lengths)[:, None] + self.bias
+
+    # --- Inference -------------------------------------------------------------
+
+    def predict_proba(self, queries: list) -> np.ndarray:
+        if not queries:
+            return np.zeros((0, len(self.labels)), dtype=np.float32)
+        return softmax(self._logits(*self._encode(queries)))
+
+    def predict(self, queries: list) -> list:
+        """[(intent, confidence)] in input order."""
+        probs = self.predict_proba(queries)
+        best = probs.argmax(axis=1)
+        return [(self.labels[int(i)], float(probs[row, i])) for row, i in enumerate(best)]
+
+    # --- Training --------------------------------------------------------------
+
+    def fit(self, texts: list, targets: np.ndarray, sample_weight=None, hard_targets=None,
+            temperature=2.0, alpha=0.0, epochs=8, batch_size=256, lr=0.5, l2=1e-6, seed=0, log=print):
+        """
+        Minimizes T^2 * CE(softmax(z/T), targets) (+ alpha * CE(softmax(z), hard_targets))
+        with AdaGrad over minibatches. `targets` are the teacher's probabilities already
+        softened at `temperature`; `hard_targets` are one-hot gold labels (optional).
+        """
+        encoded = [self.features(t) for t in texts]
+        weights = np.ones(len(texts)) if sample_weight is None else np.asarray(sample_weight, dtype=np.float64)
+        weights = weights / weights.mean()
+        self.weights = np.array(self.weights, dtype=np.float32) # writable even if loaded mmapped
+        self.bias = np.array(self.bias, dtype=np.float32)
+        grad_sq = np.full(self.weights.shape, 1e-8, dtype=np.float32)
+        bias_sq = np.full(self.bias.shape, 1e-8, dtype=np.float32)
+        rng = np.random.default_rng(seed)
+
+        for epoch in range(epochs):
+            order = rng.permutation(len(texts))
+            total = 0.0
+            for start in range(0, len(order), batch_size):
+                batch = order[start:start + batch_size]
+                rows = [encoded[i] for i in batch]
+                lengths = np.fromiter((len(r) for r in rows), dtype=np.int64, count=len(rows))
+                starts = np.zeros(len(rows), dtype=np.int64)
+                np.cumsum(lengths[:-1], out=starts[1:])
+                ids = np.concatenate(rows)
+                logits = self._logits(ids, starts, lengths)
+                w = weights[batch][:, None]
+
+                soft = softmax(logits / temperature)
+                grad = temperature * (soft - targets[batch]) * w # d(T^2 * CE)/dz
+                total += float(-(targets[batch] * np.log(soft + 1e-12) * w).sum()) * temperature ** 2
+                if hard_targets is not None and alpha:
+                    grad += alpha * (softmax(logits) - hard_targets[batch]) * w
+                grad /= len(batch)
+
+                scale = (1.0 / np.sqrt(lengths))[:, None]
+                row_grad = np.repeat(grad * scale, lengths, axis=0)
+                unique, inverse = np.unique(ids, return_inverse=True)
+                g = np.zeros((len(unique), self.weights.shape[1]), dtype=np.float32)
+                np.add.at(g, inverse, row_grad)
+                g += l2 * self.weights[unique]
+                grad_sq[unique] += g * g
+                self.weights[unique] -= lr * g / np.sqrt(grad_sq[unique])
+
+                g_bias = grad.sum(axis=0).astype(np.float32)
+                bias_sq += g_bias * g_bias
+                self.bias -= lr * g_bias / np.sqrt(bias_sq)
+            if log:
+                log(f"   epoch {epoch + 1}/{epochs}: distillation loss {total / len(texts):.4f}")
+        return self
+
+    # --- Persist ---------------------------------------------------------------
+
+    def save(self, model_dir: str, **report):
+        os.makedirs(model_dir, exist_ok=True)
+        np.save(os.path.join(model_dir, "weights.npy"), np.asarray(self.weights, dtype=np.float32))
+        np.save(os.path.join(model_dir, "bias.npy"), np.asarray(self.bias, dtype=np.float32))
+        meta = {"labels": self.labels, "num_buckets": self.num_buckets, "model_version": self.model_version, **report}
+        with open(os.path.join(model_dir, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+
+    @classmethod
+    def load(cls, model_dir: str):
+        """Returns the student, or None if it hasn't been trained."""
+        if not os.path.exists(os.path.join(model_dir, "meta.json")):
+            return None
+        with open(os.path.join(model_dir, "meta.json")) as f:
+            meta = json.load(f)
+        return cls(
+            meta["labels"],
+            weights=np.load(os.path.join(model_dir, "weights.npy"), mmap_mode="r"),
+            bias=np.load(os.path.join(model_dir, "bias.npy")),
+            num_buckets=meta["num_buckets"],
+            meta=meta,
+        )
@@ -0,0 +1,171 @@
+"""
+Per-request stage timing for the RAG pipeline.
+
+A Trace is opened per API request by api.middleware.TracingMiddleware and held in a
+context variable, so engine code records stages without passing anything around:
+
+    with span("embed"):
+        vector = cls.get_embedding(query)
+
+Stages used: init, intent, embed, retrieve, assemble, generate, log. A stage that runs
+more than once in a request accumulates. On finish the trace becomes a Server-Timing
+header, one JSON log line and observations on the Prometheus histograms behind
+/metrics (prometheus_client, optional; multi-process when PROMETHEUS_MULTIPROC_DIR is set).
+
+With TRACING=false, span() returns a shared no-op context manager and the middleware
+passes requests straight through.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+ENABLED = os.getenv("TRACING", "true").lower() == "true"
+LOG_TRACES = os.getenv("TRACING_LOG", "true").lower() == "true"
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_current = contextvars.ContextVar("rag_trace", default=None)
+_NULL_SPAN = nullcontext()
+
+
+class _Span:
+    __slots__ = ("trace", "name", "start")
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Trace:
+    def __init__(self, name: str):
+        self.name = name
+        self.start = time.perf_counter()
+        self.spans = {} # stage -> seconds
+        self.tags = {}
+        self.finished = False
+        # Spans also arrive from the intent batcher and asyncio.to_thread workers
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self.spans[stage] = self.spans.get(stage, 0.0) + seconds
+
+    def tag(self, key: str, value):
+        with self._lock:
+            self.tags[key] = value
+
+    def snapshot(self) -> tuple:
+        with self._lock:
+            return dict(self.spans), dict(self.tags)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def server_timing(self) -> str:
+        spans, _ = self.snapshot()
+        parts = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in spans.items()]
+        parts.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(parts)
+
+    def finish(self, status: int = None):
+        """Records the trace once: histograms and (unless TRACING_LOG=false) a JSON log line."""
+        with self._lock:
+            if self.finished:
+                return
+            self.finished = True
+        total = self.elapsed()
+        spans, tags = self.snapshot()
+        metrics = get_metrics()
+        if metrics:
+            stage_hist, request_hist = metrics
+            for stage, seconds in spans.items():
+                stage_hist.labels(stage=stage).observe(seconds)
+            request_hist.labels(endpoint=self.name, cached=str(tags.get("cached", False))).observe(total)
+        if LOG_TRACES:
+            print(json.dumps({
+                "event": "rag_trace",
+                "endpoint": self.name,
+                "status": status,
+                "total_ms": round(total * 1000, 1),
+                "spans_ms": {stage: round(seconds * 1000, 1) for stage, seconds in spans.items()},
+                **tags,
+            }))
+
+
+# --- Context ------------------------------------------------------------------
+
+def start(name: str):
+    """Opens a trace and makes it current. Returns (trace, token) for deactivate()."""
+    trace = Trace(name)
+    return trace, _current.set(trace)
+
+
+def activate(trace):
+    return _current.set(trace)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+def span(stage: str):
+    trace = _current.get() if ENABLED else None
+    if trace is None:
+        return _NULL_SPAN
+    return _Span(trace, stage)
+
+
+def tag(key: str, value):
+    trace = _current.get() if ENABLED else None
+    if trace is not None:
+        trace.tag(key, value)
+
+
+# --- Prometheus -----------------------------------------------------------------
+
+_metrics = None
+
+
+def get_metrics():
+    """(stage histogram, request histogram), built once per process; False without prometheus_client."""
+    global _metrics
+    if _metrics is None:
+        try:
+            from prometheus_client import Histogram
+        except ImportError:
+            print("ℹ️ prometheus_client not installed; /metrics disabled")
+            _metrics = False
+            return _metrics
+        _metrics = (
+            Histogram("rag_stage_seconds", "Time spent in each RAG pipeline stage", ["stage"], buckets=BUCKETS),
+            Histogram("rag_request_seconds", "End-to-end API request time", ["endpoint", "cached"], buckets=BUCKETS),
+        )
+    return _metrics
+
+
+def render_metrics():
+    """Returns (body, content_type) in the Prometheus text format, or None if unavailable."""
+    if not get_metrics():
+        return None
+    from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -1,8 +1,7 @@
 import os
 import sys
 import django
-import json
-import glob
+import argparse
 from pathlib import Path
 
 # Setup Django Environment
@@ -12,7 +11,11 @@ sys.path.append(str(PROJECT_ROOT))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cognitive_core.settings')
 django.setup()
 
-from storage.models import KnowledgeNode
+from storage.models import KnowledgeNode, KnowledgeDocument
+from storage.catalog import ContentCatalog, DEFAULT_PATH as CATALOG_PATH, build_catalog
+from storage.chunking import chunk_document
+from inference.embedding_cache import get_store, text_hash
+from storage.ingestion import IngestionPipeline
 import vertexai
 from vertexai.language_models import TextEmbeddingModel
 from django.db import connection, transaction
@@ -22,33 +25,15 @@ CONTENT_DIR = PROJECT_ROOT.parent / "content"
 PROJECT_ID = "student-resource-hub-a758a"
 LOCATION = "us-central1"
 MODEL_ID = "text-embedding-004"
+# Incremental sync commits after this many changed files; each commit is a resume point
+CHECKPOINT_EVERY = 50
+# Concurrent embedding requests in flight
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
 
 def init_vertex():
     print(f"🔌 Initializing Vertex AI ({PROJECT_ID} @ {LOCATION})...")
     vertexai.init(project=PROJECT_ID, location=LOCATION)
 
-def get_embeddings(texts, model):
-    """
-    Generates embeddings for a list of texts.
-    Vertex AI limit is often 5 texts per request for some models, or 250 tokens?
-    Actually text-embedding-004 supports batching up to 5/request usually in code samples,
-    but we can do one by one for safety or small batches.
-    """
-    embeddings = []
-    # Simple batching can be added if needed, doing 1-by-1 for robust progress logging
-    for i, text in enumerate(texts):
-        try:
-            # Vertex AI expects a list
-            result = model.get_embeddings([text])
-            embeddings.append(result[0].values)
-            sys.stdout.write(".")
-            sys.stdout.flush()
-        except Exception as e:
-            print(f"\n⚠️ Error embedding text {i}: {e}")
-            embeddings.append(None)
-    print("")
-    return embeddings
-
 def enable_pgvector():
     """Attempts to enable pgvector extension if on Postgres."""
     if connection.vendor == 'postgresql':
@@ -61,22 +46,162 @@ def enable_pgvector():
     else:
         print(f"ℹ️ Database is {connection.vendor}, skipping pgvector extension creation.")
 
-def process_file(file_path):
-    with open(file_path, 'r') as f:
-        data = json.load(f)
+def process_file(source_path, catalog):
+    """Loads one lesson from the content catalog into (document fields, list of section-aware chunks)."""
+    entry = catalog.by_path(source_path)
+    data = catalog.data(entry)
     
-    # Construct Content Blob
-    title = data.get('title', 'Untitled')
-    blob = f"Title: {title}\n"
-    blob += f"Subject: {data.get('subject', '')} - {data.get('category', '')}\n"
-    blob += f"Summary: {data.get('summary', '')}\n\n"
-    blob += f"Theory: {data.get('theory', '')}\n\n"
-    blob += f"Syntax: {data.get('syntax', '')}"
+    document = {
+        "source_path": source_path,
+        "title": data.get('title', 'Untitled'),
+        "subject": data.get('subject', ''),
+        "category": data.get('category', ''),
+        "content_hash": entry["content_hash"],
+    }
+    return document, chunk_document(data)
+
+def build_records(source_path, catalog):
+    """One record per chunk; each carries its parent document so the writer can regroup them."""
+    document, chunks = process_file(source_path, catalog)
+    return [
+        {**chunk, "document": document, "chunk_count": len(chunks), "content_hash": text_hash(chunk["content"])}
+        for chunk in chunks
+    ]
+
+def make_node(record, document):
+    return KnowledgeNode(
+        document=document,
+        title=record["document"]["title"],
+        content=record["content"],
+        embedding=record["embedding"],
+        source_path=record["document"]["source_path"],
+        content_hash=record["content_hash"],
+        section=record["section"],
+        chunk_index=record["chunk_index"]
+    )
+
+def make_pipeline(embedding_model, store):
+    return IngestionPipeline(
+        embedding_model,
+        store=store,
+        concurrency=EMBED_CONCURRENCY,
+        write_chunk=CHECKPOINT_EVERY
+    )
+
+class DocumentWriter:
+    """
+    Pipeline write_fn. Chunks arrive in any order, so they are buffered per document and
+    a document is written only once all of its chunks are embedded: its old chunks are
+    replaced and its content_hash updated in one transaction. A document with a failed
+    chunk is never written, keeps its old hash, and is retried on the next run.
+    """
+
+    def __init__(self, sink=None):
+        self.pending = {}
+        self.documents_written = 0
+        # Optional list that collects complete documents instead of writing them
+        self.sink = sink
+
+    def __call__(self, records):
+        complete = []
+        for record in records:
+            path = record["document"]["source_path"]
+            chunks = self.pending.setdefault(path, [])
+            chunks.append(record)
+            if len(chunks) == record["chunk_count"]:
+                complete.append(self.pending.pop(path))
+        if complete and self.sink is not None:
+            self.sink.extend(complete)
+        elif complete:
+            self.write(complete)
+
+    def write(self, documents):
+        with transaction.atomic():
+            for chunks in documents:
+                fields = dict(chunks[0]["document"])
+                source_path = fields.pop("source_path")
+                document, _ = KnowledgeDocument.objects.update_or_create(
+                    source_path=source_path, defaults=fields
+                )
+                document.chunks.all().delete()
+                # Legacy one-vector-per-file rows for this path
+                KnowledgeNode.objects.filter(source_path=source_path, document__isnull=True).delete()
+                KnowledgeNode.objects.bulk_create(
+                    [make_node(r, document) for r in sorted(chunks, key=lambda r: r["chunk_index"])]
+                )
+        self.documents_written += len(documents)
+        print(f"\n   ✔ checkpoint: {self.documents_written} documents written")
+
+    def close(self):
+        # Called on the pipeline's writer thread when it exits; Django opened a
+        # connection for that thread, which would otherwise leak once per run.
+        connection.close()
+
+def full_rebuild(sources, catalog, embedding_model, store):
+    """Re-embed everything, then swap the whole table in one transaction."""
+    documents = []
     
-    # Truncate if insanely huge (optional, Vertex handles large context)
-    return title, blob
+    print("🧠 Generating Embeddings...")
+    writer = DocumentWriter(sink=documents)
+    pipeline = make_pipeline(embedding_model, store)
+    stats = pipeline.run(sources, lambda source: build_records(source, catalog), writer)
+
+    # Bulk Insert
+    print(f"\n💾 Saving {len(documents)} documents to Database...")
+    try:
+        count_before = KnowledgeNode.objects.count()
+        with transaction.atomic():
+            if count_before > 0:
+                print(f"   (Cleaning up {count_before} existing nodes...)")
+                KnowledgeNode.objects.all().delete()
+                KnowledgeDocument.objects.all().delete()
+            for chunks in documents:
+                fields = dict(chunks[0]["document"])
+                document = KnowledgeDocument.objects.create(**fields)
+                KnowledgeNode.objects.bulk_create([make_node(r, document) for r in chunks])
+        print(f"✅ SUCCESSFULLY MIGRATED {sum(len(c) for c in documents)} CHUNK VECTORS!")
+    except Exception as e:
+        print(f"❌ Database Save Failed: {e}")
+        if connection.vendor == 'sqlite':
+            print("💡 NOTE: Schema migration to Postgres is required for VectorField support.")
+    return stats
+
+def sync(sources, catalog, embedding_model, store):
+    """
+    Incremental sync: re-chunks and re-embeds only documents whose content hash differs
+    from the stored KnowledgeDocument.content_hash, replaces their chunks, and deletes
+    documents whose source file is gone. Documents are committed every CHECKPOINT_EVERY
+    chunks, so the committed hashes act as the checkpoint: an interrupted run resumes by
+    skipping everything already written.
+    """
+    stored = dict(KnowledgeDocument.objects.values_list("source_path", "content_hash"))
+    print(f"🔄 Incremental sync against {len(stored)} existing documents...")
 
-def run():
+    def parse_changed(source_path):
+        # The catalog holds each lesson's content hash, so unchanged ones are never chunked
+        if stored.get(source_path) == catalog.by_path(source_path)["content_hash"]:
+            return None # Unchanged
+        return build_records(source_path, catalog) or None
+
+    writer = DocumentWriter()
+    pipeline = make_pipeline(embedding_model, store)
+    stats = pipeline.run(sources, parse_changed, writer)
+
+    # Only prune after a full pass, so a crash never deletes live nodes. Files the catalog
+    # skipped (unreadable right now) still exist, so their documents are kept.
+    seen = set(sources) | set(catalog.skipped)
+    stale = set(stored) - seen
+    if stale:
+        deleted, _ = KnowledgeDocument.objects.filter(source_path__in=stale).delete()
+        print(f"🗑️  Removed {len(stale)} documents whose source file disappeared ({deleted} rows).")
+
+    print(
+        f"\n✅ SYNC COMPLETE: {writer.documents_written} documents re-indexed, {stats['skipped']} unchanged, "
+        f"{len(stale)} removed, {stats['parse_errors']} unreadable, {stats['embed_failures']} chunks failed to embed."
+    )
+    return stats
+
+def run(full=False):
     print("🚀 Starting Vector Migration...")
     
     # 0. Check Content Dir
@@ -96,50 +221,30 @@ def run():
         print("💡 Ensure you are authenticated (gcloud auth login) and API is enabled.")
         return
 
+    store = get_store(MODEL_ID)
+    if store:
+        print(f"🗄️  Embedding cache: {store.count()} cached vectors at {store.dir}")
+
     # 3. Find Files
-    # Recursive search for .json files
-    json_files = glob.glob(str(CONTENT_DIR / "**/*.json"), recursive=True)
-    print(f"📂 Found {len(json_files)} Content Files.")
+    # The content catalog (storage/catalog.py) re-reads only files changed since its last build
+    build_catalog(str(CONTENT_DIR), CATALOG_PATH)
+    catalog = ContentCatalog(CATALOG_PATH)
+    sources = catalog.source_paths()
+    print(f"📂 Found {len(sources)} Content Files ({len(catalog.skipped)} other JSON files skipped).")
     
     # 4. Processing
-    nodes_to_create = []
-    
-    print("🧠 Generating Embeddings...")
-    for file_path in json_files:
-        try:
-            title, content_blob = process_file(file_path)
-            
-            # Embed
-            # We do it immediately here to handle errors per file
-            embeddings = get_embeddings([content_blob], embedding_model)
-            
-            if embeddings[0]:
-                node = KnowledgeNode(
-                    title=title,
-                    content=content_blob,
-                    embedding=embeddings[0],
-                    source_path=os.path.relpath(file_path, PROJECT_ROOT.parent)
-                )
-                nodes_to_create.append(node)
-        except Exception as e:
-            print(f"Skipping {file_path}: {e}")
+    if full:
+        stats = full_rebuild(sources, catalog, embedding_model, store)
+    else:
+        stats = sync(sources, catalog, embedding_model, store)
 
-    # 5. Bulk Insert
-    print(f"\n💾 Saving {len(nodes_to_create)} nodes to Database...")
-    try:
-        # We delete old embeddings to avoid duplicates for this migration script
-        # In production incremental, we'd check existence.
-        count_before = KnowledgeNode.objects.count()
-        if count_before > 0:
-            print(f"   (Cleaning up {count_before} existing nodes...)")
-            KnowledgeNode.objects.all().delete()
-            
-        KnowledgeNode.objects.bulk_create(nodes_to_create)
-        print(f"✅ SUCCESSFULLY MIGRATED {len(nodes_to_create)} VECTORS!")
-    except Exception as e:
-        print(f"❌ Database Save Failed: {e}")
-        if connection.vendor == 'sqlite':
-            print("💡 NOTE: Schema migration to Postgres is required for VectorField support.")
+    print(
+        f"📡 Embedding API calls: {stats['api_calls']} (cache hits: {stats['cache_hits']}) | "
+        f"⏱️  {stats['seconds']}s, {stats['files_per_sec']} files/s"
+    )
 
 if __name__ == "__main__":
-    run()
+    parser = argparse.ArgumentParser(description="Sync content/ into KnowledgeNode vectors")
+    parser.add_argument("--full", action="store_true", help="Delete all nodes and re-embed everything")
+    args = parser.parse_args()
+    run(full=args.full)
@@ -0,0 +1,341 @@
+"""
+Content catalog: content/**/*.json compiled into a single SQLite file.
+
+Built by `python manage.py build_content_catalog` (and refreshed by migrate_vectors.py
+before every sync). A rebuild only re-reads files whose mtime or size changed and only
+rewrites those whose content hash (storage.chunking.document_hash, the same hash
+KnowledgeDocument.content_hash holds) changed; deleted files are dropped. Tables:
+    documents      one row per lesson: metadata, content_hash, the lesson JSON
+    sections       rendered text per section (storage.chunking.section_texts)
+    prerequisites  prerequisite titles as written in each lesson
+    skipped        non-lesson JSON files, remembered so they aren't re-read
+
+ContentCatalog opens the file read-only (memory-mapped by SQLite) and keeps the small
+metadata maps in memory, so lookups by source path, slug, subject or prerequisite are
+dict hits; lesson JSON and section text are fetched by primary key on demand. Every
+rebuild commits to the file, so `is_stale()` (one os.stat) tells long-lived holders
+such as CognitiveEngine.get_catalog when to load it again.
+"""
+import glob
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from storage.chunking import CHUNKER_VERSION, chunk_sections, document_hash, section_texts
+
+CATALOG_VERSION = "1"
+DEFAULT_PATH = os.getenv(
+    "CONTENT_CATALOG_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "content_catalog.sqlite3")
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    source_path TEXT NOT NULL UNIQUE,
+    slug TEXT NOT NULL,
+    title TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    category TEXT NOT NULL,
+    level TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    sort_order INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_slug ON documents (slug);
+CREATE INDEX IF NOT EXISTS documents_subject ON documents (subject);
+CREATE TABLE IF NOT EXISTS sections (
+    document_id INTEGER NOT NULL REFERENCES documents (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    section TEXT NOT NULL,
+    heading TEXT NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (document_id, position)
+);
+CREATE TABLE IF NOT EXISTS prerequisites (
+    document_id INTEGER NOT NULL REFERENCES documents (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    PRIMARY KEY (document_id, position)
+);
+CREATE TABLE IF NOT EXISTS skipped (
+    source_path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    reason TEXT NOT NULL
+);
+"""
+TABLES = ("prerequisites", "sections", "documents", "skipped", "meta")
+
+
+def _version() -> str:
+    # content_hash embeds the chunker version, so a chunker bump rebuilds the catalog too
+    return f"{CATALOG_VERSION}.{CHUNKER_VERSION}"
+
+
+def build_catalog(content_dir: str, path: str = DEFAULT_PATH, full=False, log=print) -> dict:
+    """
+    Brings the catalog at `path` up to date with `content_dir`. Source paths are stored
+    relative to the content dir's parent (e.g. content/algorithms/binary-search.json),
+    as in KnowledgeDocument.source_path. Returns build stats.
+    """
+    start = time.perf_counter()
+    root = os.path.dirname(os.path.abspath(content_dir))
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    stats = {"files": 0, "read": 0, "updated": 0, "touched": 0, "removed": 0, "skipped": 0}
+    try:
+        with conn:
+            conn.executescript(SCHEMA)
+            row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+            if full or not row or row[0] != _version():
+                for table in TABLES:
+                    conn.execute(f"DELETE FROM {table}")
+
+            known = {
+                source: (doc_id, mtime_ns, size, content_hash)
+                for doc_id, source, mtime_ns, size, content_hash in conn.execute(
+                    "SELECT id, source_path, mtime_ns, size, content_hash FROM documents"
+                )
+            }
+            known_skipped = {
+                source: (mtime_ns, size)
+                for source, mtime_ns, size in conn.execute("SELECT source_path, mtime_ns, size FROM skipped")
+            }
+
+            seen = set()
+            for file_path in sorted(glob.glob(os.path.join(content_dir, "**", "*.json"), recursive=True)):
+                source = os.path.relpath(file_path, root)
+                seen.add(source)
+                stats["files"] += 1
+                st = os.stat(file_path)
+                previous = known.get(source)
+                if previous and previous[1:3] == (st.st_mtime_ns, st.st_size):
+                    continue
+                if known_skipped.get(source) == (st.st_mtime_ns, st.st_size):
+                    stats["skipped"] += 1
+                    continue
+
+                stats["read"] += 1
+                try:
+                    with open(file_path, "r") as f:
+                        data = json.load(f)
+                    reason = None if isinstance(data, dict) and data.get("title") else "not a lesson"
+                except (OSError, ValueError) as e:
+                    reason = f"unreadable: {e}"
+                if reason:
+                    if previous:
+                        conn.execute("DELETE FROM documents WHERE id = ?", (previous[0],))
+                    conn.execute(
+                        "INSERT OR REPLACE INTO skipped VALUES (?, ?, ?, ?)",
+                        (source, st.st_mtime_ns, st.st_size, reason),
+                    )
+                    stats["skipped"] += 1
+                    continue
+                conn.execute("DELETE FROM skipped WHERE source_path = ?", (source,))
+
+                content_hash = document_hash(data)
+                if previous and previous[3] == content_hash:
+                    # Re-saved or touched without a content change: just remember the new stat
+                    conn.execute(
+                        "UPDATE documents SET mtime_ns = ?, size = ? WHERE id = ?",
+                        (st.st_mtime_ns, st.st_size, previous[0]),
+                    )
+                    stats["touched"] += 1
+                    continue
+                if previous:
+                    conn.execute("DELETE FROM documents WHERE id = ?", (previous[0],))
+                _insert(conn, source, data, content_hash, st)
+                stats["updated"] += 1
+
+            removed = [known[source][0] for source in set(known) - seen]
+            conn.executemany("DELETE FROM documents WHERE id = ?", [(doc_id,) for doc_id in removed])
+            conn.executemany(
+                "DELETE FROM skipped WHERE source_path = ?", [(s,) for s in set(known_skipped) - seen]
+            )
+            stats["removed"] = len(removed)
+            conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", [
+                ("version", _version()),
+                ("content_dir", os.path.abspath(content_dir)),
+                ("built_at", time.strftime("%Y-%m-%dT%H:%M:%S")),
+            ])
+    finally:
+        conn.close()
+
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    if log:
+        log(
+            f"📚 Content catalog: {stats['files']} files, {stats['updated']} (re)indexed, "
+            f"{stats['touched']} touched, {stats['removed']} removed, {stats['skipped']} skipped "
+            f"in {stats['seconds']}s -> {path}"
+        )
+    return stats
+
+
+def _insert(conn, source, data, content_hash, st):
+    cursor = conn.execute(
+        "INSERT INTO documents (source_path, slug, title, subject, category, level, summary, sort_order, "
+        "content_hash, mtime_ns, size, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            source,
+            str(data.get("slug") or os.path.splitext(os.path.basename(source))[0]),
+            str(data["title"]),
+            str(data.get("subject") or ""),
+            str(data.get("category") or ""),
+            str(data.get("level") or ""),
+            str(data.get("summary") or ""),
+            int(data["order"]) if isinstance(data.get("order"), int) else 0,
+            content_hash,
+            st.st_mtime_ns,
+            st.st_size,
+            json.dumps(data, ensure_ascii=False, separators=(",", ":")),
+        ),
+    )
+    doc_id = cursor.lastrowid
+    conn.executemany(
+        "INSERT INTO sections VALUES (?, ?, ?, ?, ?)",
+        [(doc_id, i, section, heading, text) for i, (section, heading, text) in enumerate(section_texts(data))],
+    )
+    conn.executemany(
+        "INSERT INTO prerequisites VALUES (?, ?, ?)",
+        [(doc_id, i, str(title)) for i, title in enumerate(data.get("prerequisites") or [])],
+    )
+
+
+class ContentCatalog:
+    FIELDS = ("id", "source_path", "slug", "title", "subject", "category", "level", "summary", "order", "content_hash")
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        self.signature = self.file_signature(path)
+        # One read-only connection shared by the worker's threads; queries are primary-key hits
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._conn.execute("PRAGMA mmap_size = 268435456")
+        self._lock = threading.Lock()
+
+        # One read transaction, so a rebuild committing meanwhile can't mix two versions
+        self._conn.execute("BEGIN")
+        documents = [
+            dict(zip(self.FIELDS, row))
+            for row in self._conn.execute(
+                "SELECT id, source_path, slug, title, subject, category, level, summary, sort_order, content_hash "
+                "FROM documents ORDER BY subject = '', subject, sort_order, id" # lessons without a subject last
+            )
+        ]
+        self._by_id = {doc["id"]: doc for doc in documents}
+        self._by_path = {doc["source_path"]: doc for doc in documents}
+        self._by_slug, self._by_subject, self._by_title = {}, {}, {}
+        for doc in documents:
+            self._by_slug.setdefault(doc["slug"], []).append(doc)
+            self._by_subject.setdefault(doc["subject"].lower(), []).append(doc)
+            self._by_title.setdefault(doc["title"].lower(), doc)
+
+        self._prerequisites, self._dependents = {}, {}
+        for doc_id, title in self._conn.execute(
+            "SELECT document_id, title FROM prerequisites ORDER BY document_id, position"
+        ):
+            self._prerequisites.setdefault(doc_id, []).append(title)
+            self._dependents.setdefault(title.lower(), []).append(self._by_id[doc_id])
+        self.meta = dict(self._conn.execute("SELECT key, value FROM meta"))
+        # Files under content/ that aren't lessons (or didn't parse): source_path -> reason
+        self.skipped = dict(self._conn.execute("SELECT source_path, reason FROM skipped"))
+        self._conn.execute("COMMIT")
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_PATH):
+        """Returns the catalog, or None if it hasn't been built."""
+        if not os.path.exists(path):
+            return None
+        return cls(path)
+
+    def close(self):
+        self._conn.close()
+
+    @staticmethod
+    def file_signature(path: str) -> tuple:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def is_stale(self) -> bool:
+        """
+        True once the file has changed since this catalog was loaded: rebuilt in place
+        (new built_at, new mtime) or replaced. A deleted file keeps the loaded catalog.
+        """
+        try:
+            return self.file_signature(self.path) != self.signature
+        except OSError:
+            return False
+
+    # --- Metadata lookups (in memory) --------------------------------------------
+
+    def count(self) -> int:
+        return len(self._by_id)
+
+    def source_paths(self) -> list:
+        return sorted(self._by_path)
+
+    def by_path(self, source_path: str):
+        return self._by_path.get(source_path)
+
+    def get(self, slug: str, subject: str = None):
+        """The lesson with this slug (a few slugs repeat across subjects; `subject` picks one)."""
+        matches = self._by_slug.get(slug, [])
+        if subject:
+            matches = [doc for doc in matches if doc["subject"].lower() == subject.lower()]
+        return matches[0] if matches else None
+
+    def subjects(self) -> list:
+        return sorted({doc["subject"] for doc in self._by_id.values() if doc["subject"]})
+
+    def by_subject(self, subject: str) -> list:
+        """Lessons of a subject in their course order."""
+        return list(self._by_subject.get(subject.lower(), []))
+
+    def prerequisites(self, doc: dict) -> list:
+        """[{"title", "slug", "source_path"}]; slug/source_path are None when no lesson has that title."""
+        resolved = []
+        for title in self._prerequisites.get(doc["id"], []):
+            target = self._by_title.get(title.lower())
+            resolved.append({
+                "title": title,
+                "slug": target["slug"] if target else None,
+                "source_path": target["source_path"] if target else None,
+            })
+        return resolved
+
+    def dependents(self, doc: dict) -> list:
+        """Lessons that list `doc` as a prerequisite."""
+        return list(self._dependents.get(doc["title"].lower(), []))
+
+    # --- Stored content (SQLite, by primary key) ---------------------------------
+
+    def data(self, doc: dict) -> dict:
+        """
+        The lesson JSON as it was when the catalog was built. Raises KeyError if the lesson
+        is no longer in the file (it was rebuilt after `doc` was looked up).
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM documents WHERE id = ?", (doc["id"],)).fetchone()
+        if row is None:
+            raise KeyError(f"{doc['source_path']} is no longer in the content catalog (rebuilt since lookup?)")
+        return json.loads(row[0])
+
+    def sections(self, doc: dict) -> list:
+        """[{"section", "heading", "text"}] in reading order."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT section, heading, text FROM sections WHERE document_id = ? ORDER BY position", (doc["id"],)
+            ).fetchall()
+        return [{"section": section, "heading": heading, "text": text} for section, heading, text in rows]
+
+    def chunks(self, doc: dict) -> list:
+        """The lesson's chunks, as storage.chunking.chunk_document returns them, from its section text."""
+        sections = self.sections(doc)
+        return chunk_sections(doc["title"], [(s["section"], s["heading"], s["text"]) for s in sections])
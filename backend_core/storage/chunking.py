@@ -0,0 +1,115 @@
+"""
+Section-aware chunker for content/**/*.json lessons.
+
+Every section of a lesson (theory, syntax, examples, common_mistakes, interview_questions,
+practice_problems, ...) is rendered to text and split into size-bounded chunks with
+overlap. Each chunk carries a short header (title + section) so it still makes sense
+when it is retrieved on its own.
+"""
+import hashlib
+import json
+
+# Bump when the chunking rules change so incremental sync re-indexes every document
+CHUNKER_VERSION = "1"
+MAX_CHUNK_CHARS = 1500
+CHUNK_OVERLAP = 200
+
+# (json key, heading) in reading order
+SECTIONS = [
+    ("theory", "Theory"),
+    ("syntax", "Syntax"),
+    ("examples", "Examples"),
+    ("common_mistakes", "Common Mistakes"),
+    ("interview_questions", "Interview Questions"),
+    ("practice_problems", "Practice Problems"),
+    ("real_world_use_cases", "Real World Use Cases"),
+    ("exam_notes", "Exam Notes"),
+]
+
+
+def render_item(item) -> str:
+    """Renders a list entry ({"question": ..., "answer": ...} or a plain string) as text."""
+    if isinstance(item, dict):
+        return "\n".join(f"{k.replace('_', ' ').title()}: {v}" for k, v in item.items() if v not in (None, "", "N/A"))
+    return str(item)
+
+
+def split_text(text: str, max_chars=MAX_CHUNK_CHARS, overlap=CHUNK_OVERLAP) -> list:
+    """
+    Splits on paragraph boundaries into pieces of at most `max_chars`. Paragraphs longer
+    than that are cut into windows; consecutive pieces share `overlap` trailing characters.
+    """
+    text = text.strip()
+    overlap = min(overlap, max_chars // 2)
+    if len(text) <= max_chars:
+        return [text] if text else []
+
+    pieces, current = [], ""
+    for para in text.split("\n\n"):
+        para = para.strip()
+        if not para:
+            continue
+        candidate = f"{current}\n\n{para}" if current else para
+        if len(candidate) <= max_chars:
+            current = candidate
+            continue
+        if current:
+            pieces.append(current)
+        # Carry the tail of the previous piece forward as overlap
+        tail = current[-overlap:] if current and overlap else ""
+        current = f"{tail}\n\n{para}" if tail else para
+        while len(current) > max_chars:
+            pieces.append(current[:max_chars])
+            current = current[max_chars - overlap:]
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def document_hash(data: dict) -> str:
+    raw = CHUNKER_VERSION + json.dumps(data, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def section_texts(data: dict) -> list:
+    """
+    [(section, heading, text), ...] for one lesson in reading order, starting with the
+    overview (subject, summary, prerequisites, objectives); empty sections are left out.
+    """
+    overview = f"Subject: {data.get('subject', '')} - {data.get('category', '')}\n"
+    overview += f"Summary: {data.get('summary', '')}"
+    if data.get("prerequisites"):
+        overview += "\nPrerequisites: " + ", ".join(map(str, data["prerequisites"]))
+    if data.get("learning_objectives"):
+        overview += "\nLearning Objectives: " + "; ".join(map(str, data["learning_objectives"]))
+    sections = [("overview", "Overview", overview)]
+
+    for key, heading in SECTIONS:
+        value = data.get(key)
+        if not value:
+            continue
+        if isinstance(value, list):
+            # Keep list entries whole where possible: one entry per paragraph
+            body = "\n\n".join(render_item(item) for item in value)
+        else:
+            body = str(value)
+        sections.append((key, heading, body))
+    return sections
+
+
+def chunk_document(data: dict, max_chars=MAX_CHUNK_CHARS, overlap=CHUNK_OVERLAP) -> list:
+    """
+    Returns [{"section": ..., "chunk_index": n, "content": ...}, ...] for one lesson.
+    The first chunk is always the overview (title, subject, summary, objectives).
+    """
+    return chunk_sections(data.get("title", "Untitled"), section_texts(data), max_chars, overlap)
+
+
+def chunk_sections(title, sections, max_chars=MAX_CHUNK_CHARS, overlap=CHUNK_OVERLAP) -> list:
+    """chunk_document from already-rendered (section, heading, body) triples (ContentCatalog.chunks)."""
+    chunks = []
+    for section, heading, body in sections:
+        header = f"Title: {title}\nSection: {heading}\n\n"
+        for piece in split_text(body, max_chars - len(header), overlap):
+            chunks.append({"section": section, "chunk_index": len(chunks), "content": header + piece})
+    return chunks
@@ -0,0 +1,220 @@
+"""
+Pipelined ingestion for migrate_vectors.py.
+
+    producer (parse files) -> batcher (pack per-request limits)
+        -> bounded pool of concurrent embedding calls (retry + backoff)
+        -> DB writer (flushes in chunks)
+
+Each stage runs on its own thread(s) joined by bounded queues, so parsing, network
+calls and database writes overlap. The pipeline itself is Django-free: it is handed
+a `parse_fn`, an embedding model and a `write_fn`, which makes it runnable against
+inference.fakes.FakeEmbeddingModel and an in-memory writer.
+
+A record is a dict with at least a "content" key; the pipeline adds "embedding".
+Records may arrive at the writer in any order.
+"""
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# text-embedding-004 per-request limits (Vertex AI): 250 inputs, 20k tokens in total,
+# inputs past 2048 tokens are truncated server-side so they count as 2048.
+MAX_TEXTS_PER_REQUEST = 250
+MAX_TOKENS_PER_REQUEST = 20000
+MAX_TOKENS_PER_TEXT = 2048
+
+_DONE = object()
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token is the English-prose average; code, symbols and non-English
+    # text run closer to 2, so budget for that. A batch that still overflows is split (below).
+    return min(MAX_TOKENS_PER_TEXT, len(text) // 2 + 1)
+
+
+def is_token_limit_error(error: Exception) -> bool:
+    # Vertex AI: "Unable to submit request because the input token count is N but the
+    # model supports up to 20000". Retrying the same payload can't succeed.
+    return "token count" in str(error).lower()
+
+
+def pack_batches(records, max_texts=MAX_TEXTS_PER_REQUEST, max_tokens=MAX_TOKENS_PER_REQUEST):
+    """Greedily packs records into batches that respect both per-request limits."""
+    batch, tokens = [], 0
+    for record in records:
+        cost = estimate_tokens(record["content"])
+        if batch and (len(batch) >= max_texts or tokens + cost > max_tokens):
+            yield batch
+            batch, tokens = [], 0
+        batch.append(record)
+        tokens += cost
+    if batch:
+        yield batch
+
+
+def embed_with_retry(model, texts, max_retries=5, base_delay=1.0, max_delay=30.0):
+    """
+    Calls model.get_embeddings with exponential backoff + jitter. Raises after max_retries,
+    or straight away on a token-limit error (the caller splits the batch instead).
+    """
+    attempt = 0
+    while True:
+        try:
+            return [e.values for e in model.get_embeddings(texts)]
+        except Exception as e:
+            attempt += 1
+            if attempt > max_retries or is_token_limit_error(e):
+                raise
+            delay = min(max_delay, base_delay * 2 ** (attempt - 1)) * (0.5 + random.random() / 2)
+            print(f"\n⚠️ Embedding batch failed ({e}); retry {attempt}/{max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+
+class IngestionPipeline:
+    def __init__(self, model, store=None, concurrency=4, write_chunk=100,
+                 max_texts=MAX_TEXTS_PER_REQUEST, max_tokens=MAX_TOKENS_PER_REQUEST,
+                 max_retries=5, base_delay=1.0, queue_size=256):
+        self.model = model
+        self.store = store # Optional inference.embedding_cache.EmbeddingStore
+        self.concurrency = concurrency
+        self.write_chunk = write_chunk
+        self.max_texts = max_texts
+        self.max_tokens = max_tokens
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.queue_size = queue_size
+        self.stats = {}
+
+    def run(self, sources, parse_fn, write_fn):
+        """
+        `parse_fn(source)` returns a record, a list of records (e.g. chunks of one
+        document), or None to skip the source.
+        `write_fn(records)` persists a chunk of embedded records. If it has a `close()`
+        method, that is called on the writer thread once writing ends (e.g. to close
+        that thread's DB connection).
+        Returns the stats dict (files/s, API calls, failures...).
+        """
+        self.stats = {
+            "sources": 0, "skipped": 0, "parse_errors": 0, "cache_hits": 0,
+            "api_calls": 0, "embedded": 0, "embed_failures": 0, "written": 0,
+        }
+        self._stats_lock = threading.Lock()
+        parsed = queue.Queue(maxsize=self.queue_size)
+        embedded = queue.Queue(maxsize=self.queue_size)
+        errors = []
+        start = time.perf_counter()
+
+        def producer():
+            try:
+                for source in sources:
+                    self._count("sources")
+                    try:
+                        record = parse_fn(source)
+                    except Exception as e:
+                        print(f"Skipping {source}: {e}")
+                        self._count("parse_errors")
+                        continue
+                    if record is None:
+                        self._count("skipped")
+                        continue
+                    for r in (record if isinstance(record, list) else [record]):
+                        parsed.put(r)
+            finally:
+                parsed.put(_DONE)
+
+        def writer():
+            try:
+                chunk = []
+                while True:
+                    record = embedded.get()
+                    if record is _DONE:
+                        break
+                    chunk.append(record)
+                    if len(chunk) >= self.write_chunk:
+                        self._write(write_fn, chunk, errors)
+                        chunk = []
+                if chunk:
+                    self._write(write_fn, chunk, errors)
+            finally:
+                close = getattr(write_fn, "close", None)
+                if close is not None:
+                    close()
+
+        threads = [
+            threading.Thread(target=producer, name="ingest-producer", daemon=True),
+            threading.Thread(target=writer, name="ingest-writer", daemon=True),
+        ]
+        for t in threads:
+            t.start()
+
+        # Batcher runs on this thread; the semaphore bounds in-flight requests so the
+        # parsed queue (and therefore memory) provides back-pressure to the producer.
+        in_flight = threading.BoundedSemaphore(self.concurrency * 2)
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="ingest-embed") as pool:
+            for batch in pack_batches(self._drain(parsed, embedded), self.max_texts, self.max_tokens):
+                in_flight.acquire()
+                future = pool.submit(self._embed_batch, batch, embedded)
+                future.add_done_callback(lambda _: in_flight.release())
+        embedded.put(_DONE)
+        for t in threads:
+            t.join()
+        if errors:
+            raise errors[0]
+
+        elapsed = time.perf_counter() - start
+        self.stats["seconds"] = round(elapsed, 2)
+        self.stats["files_per_sec"] = round(self.stats["sources"] / elapsed, 2) if elapsed else 0.0
+        return self.stats
+
+    def _count(self, field, n=1):
+        with self._stats_lock:
+            self.stats[field] += n
+
+    def _drain(self, parsed, embedded):
+        """Yields parsed records that still need an API call; cache hits skip straight to the writer."""
+        while True:
+            record = parsed.get()
+            if record is _DONE:
+                return
+            if self.store:
+                cached = self.store.get(record["content"])
+                if cached is not None:
+                    record["embedding"] = cached
+                    self._count("cache_hits")
+                    embedded.put(record)
+                    continue
+            yield record
+
+    def _embed_batch(self, batch, embedded):
+        texts = [r["content"] for r in batch]
+        try:
+            self._count("api_calls")
+            vectors = embed_with_retry(self.model, texts, self.max_retries, self.base_delay)
+        except Exception as e:
+            if is_token_limit_error(e) and len(batch) > 1:
+                # Our estimate undershot for this text: send each half on its own
+                half = len(batch) // 2
+                print(f"\n⚠️ Batch of {len(batch)} over the token limit; splitting")
+                self._embed_batch(batch[:half], embedded)
+                self._embed_batch(batch[half:], embedded)
+                return
+            # Records are dropped, not written; the next (incremental) run picks them up
+            print(f"\n❌ Giving up on batch of {len(batch)}: {e}")
+            self._count("embed_failures", len(batch))
+            return
+        if self.store:
+            self.store.put_many(texts, vectors)
+        self._count("embedded", len(batch))
+        for record, vector in zip(batch, vectors):
+            record["embedding"] = vector
+            embedded.put(record)
+
+    def _write(self, write_fn, chunk, errors):
+        try:
+            write_fn(chunk)
+            self._count("written", len(chunk))
+        except Exception as e:
+            print(f"\n❌ Write failed for chunk of {len(chunk)}: {e}")
+            errors.append(e)
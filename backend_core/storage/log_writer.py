@@ -0,0 +1,202 @@
+"""
+Background writer for InteractionLog rows.
+
+Chat views enqueue one record per turn and return immediately; a daemon thread drains
+the queue and writes the rows with one bulk_create per batch, flushing when
+`batch_size` records are waiting or `flush_seconds` after the first one arrived.
+UserProfile ids are resolved through a bounded uid -> pk cache, so a steady stream of
+chats from known users costs one INSERT per batch and no lookups.
+
+Rows are timestamped at flush time (InteractionLog.timestamp is auto_now_add), at most
+`flush_seconds` after the request. Pending records are flushed on shutdown via atexit
+and gunicorn's worker_exit hook.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+
+class InteractionLogWriter:
+    def __init__(self, batch_size=100, flush_seconds=1.0, max_pending=10000, user_cache_size=4096, sink=None):
+        # sink(records) replaces the database write (benchmarks, dry runs)
+        self.sink = sink
+        self.batch_size = max(1, int(batch_size))
+        self.flush_seconds = max(0.0, float(flush_seconds))
+        self.user_cache_size = user_cache_size
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._user_ids = OrderedDict() # uid -> UserProfile pk (LRU)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stopped = False
+        self._stats = {"enqueued": 0, "written": 0, "batches": 0, "dropped": 0, "errors": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, field, n=1):
+        with self._stats_lock:
+            self._stats[field] += n
+
+    # --- Producer side -------------------------------------------------------
+
+    def log(self, user_id, query, result):
+        """Queues the InteractionLog row for a chat turn. Never blocks or raises."""
+        record = {
+            "user_id": user_id,
+            "query": query,
+            "intent": result.get('intent', {}).get('intent', 'unknown'),
+            "response": result.get('response', ''),
+        }
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(record)
+            self._count("enqueued")
+        except queue.Full:
+            # Postgres is down or far behind; shed logs rather than memory or latency
+            self._count("dropped")
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {**self._stats, "pending": self._queue.qsize()}
+
+    # --- Lifecycle -----------------------------------------------------------
+
+    def _ensure_started(self):
+        # Threads don't survive fork, so the loop is started lazily in the worker that logs
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopped = False
+                self._thread = threading.Thread(target=self._run, name="interaction-log-writer", daemon=True)
+                self._thread.start()
+
+    def close(self, timeout=10.0):
+        """Stops the background thread and writes whatever is still queued."""
+        self._stopped = True
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout)
+        self.flush()
+
+    # --- Consumer side -------------------------------------------------------
+
+    def _collect(self):
+        try:
+            first = self._queue.get(timeout=0.5)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.flush_seconds
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        from django.db import connection
+        try:
+            while not self._stopped:
+                batch = self._collect()
+                if batch:
+                    self._write(batch)
+        finally:
+            connection.close()
+
+    def flush(self):
+        """Synchronously writes everything currently queued (used on shutdown)."""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        for start in range(0, len(batch), self.batch_size):
+            self._write(batch[start:start + self.batch_size])
+
+    def _write(self, batch):
+        if self.sink is not None:
+            self.sink(batch)
+            self._count("written", len(batch))
+            self._count("batches")
+            return
+        from storage.models import InteractionLog
+        with self._flush_lock:
+            try:
+                profile_ids = self._resolve_profiles({r["user_id"] for r in batch})
+                InteractionLog.objects.bulk_create([
+                    InteractionLog(
+                        user_id=profile_ids[r["user_id"]],
+                        query=r["query"],
+                        intent=r["intent"],
+                        response=r["response"],
+                    )
+                    for r in batch
+                ])
+                self._count("written", len(batch))
+                self._count("batches")
+            except Exception as e:
+                self._count("errors")
+                self._count("dropped", len(batch))
+                print(f"⚠️ Interaction log flush failed ({len(batch)} rows dropped): {e}")
+
+    def _resolve_profiles(self, uids) -> dict:
+        """uid -> UserProfile pk, creating missing profiles in bulk."""
+        from storage.models import UserProfile
+        found = {}
+        for uid in uids:
+            if uid in self._user_ids:
+                self._user_ids.move_to_end(uid)
+                found[uid] = self._user_ids[uid]
+        missing = [uid for uid in uids if uid not in found]
+        if missing:
+            UserProfile.objects.bulk_create(
+                [UserProfile(user_id=uid) for uid in missing], ignore_conflicts=True
+            )
+            found.update(UserProfile.objects.filter(user_id__in=missing).values_list("user_id", "id"))
+            for uid in missing:
+                self._user_ids[uid] = found[uid]
+            while len(self._user_ids) > self.user_cache_size:
+                self._user_ids.popitem(last=False)
+        return found
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """Process-wide writer, configured from INTERACTION_LOG_* env vars. None when INTERACTION_LOG_MODE=sync."""
+    global _writer
+    if os.getenv("INTERACTION_LOG_MODE", "async") == "sync":
+        return None
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = InteractionLogWriter(
+                    batch_size=int(os.getenv("INTERACTION_LOG_BATCH_SIZE", "100")),
+                    flush_seconds=float(os.getenv("INTERACTION_LOG_FLUSH_SECONDS", "1.0")),
+                    max_pending=int(os.getenv("INTERACTION_LOG_MAX_PENDING", "10000")),
+                )
+                atexit.register(_writer.close)
+    return _writer
+
+
+def install_writer(writer):
+    """Replaces the process-wide writer (e.g. one with a sink); returns the previous one."""
+    global _writer
+    with _writer_lock:
+        previous, _writer = _writer, writer
+    return previous
+
+
+def shutdown():
+    """Flushes pending rows; called from gunicorn's worker_exit hook."""
+    if _writer is not None:
+        _writer.close()
@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inference.engine import CognitiveEngine
+from storage.models import InteractionLog
+
+
+class Command(BaseCommand):
+    help = 'Re-classifies InteractionLog.intent with the current intent model, in streaming chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows read, classified and updated per round')
+        parser.add_argument('--all', action='store_true', help="Re-classify every row, not just intent='unknown'")
+        parser.add_argument('--since-id', type=int, default=0, help='Resume after this InteractionLog id')
+        parser.add_argument('--dry-run', action='store_true', help='Classify and report, but write nothing')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        queryset = InteractionLog.objects.all()
+        if not options['all']:
+            queryset = queryset.filter(intent__in=['unknown', ''])
+
+        model = CognitiveEngine.get_model()
+        self.stdout.write(
+            f"🧠 Back-filling intents with {model.model_version if model else 'v1-heuristic-python'}"
+            f"{' (dry run)' if options['dry_run'] else ''}..."
+        )
+
+        # Keyset pagination on id: constant memory, and safe to resume with --since-id
+        last_id, seen, changed = options['since_id'], 0, 0
+        start = time.perf_counter()
+        while True:
+            rows = list(
+                queryset.filter(id__gt=last_id).order_by('id').values_list('id', 'query', 'intent')[:chunk_size]
+            )
+            if not rows:
+                break
+            results = CognitiveEngine.analyze_intents([query for _, query, _ in rows])
+            updates = [
+                InteractionLog(id=row_id, intent=result['intent'])
+                for (row_id, _, intent), result in zip(rows, results)
+                if result['intent'] != intent
+            ]
+            if updates and not options['dry_run']:
+                InteractionLog.objects.bulk_update(updates, ['intent'], batch_size=chunk_size)
+
+            last_id = rows[-1][0]
+            seen += len(rows)
+            changed += len(updates)
+            rate = seen / (time.perf_counter() - start)
+            self.stdout.write(f"  ...{seen} rows ({changed} changed), up to id {last_id}, {rate:.0f} rows/s")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Classified {seen} rows, {'would update' if options['dry_run'] else 'updated'} {changed}"
+        ))
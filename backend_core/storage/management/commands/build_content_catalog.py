@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from storage.catalog import DEFAULT_PATH, build_catalog
+
+
+class Command(BaseCommand):
+    help = 'Compiles content/**/*.json into the content catalog (only changed files are re-read)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--content-dir', default=str(settings.BASE_DIR.parent / 'content'))
+        parser.add_argument('--out', default=DEFAULT_PATH)
+        parser.add_argument('--full', action='store_true', help='Discard the existing catalog and rebuild it')
+
+    def handle(self, *args, **options):
+        stats = build_catalog(options['content_dir'], options['out'], full=options['full'], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Catalog up to date: {stats['files'] - stats['skipped']} lessons, {stats['read']} files read"
+        ))
@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from inference.engine import CognitiveEngine
+from inference.lexical import BM25Index
+from storage.catalog import DEFAULT_PATH as CATALOG_PATH, ContentCatalog, build_catalog
+from storage.chunking import chunk_document
+from storage.models import KnowledgeNode
+
+
+class Command(BaseCommand):
+    help = 'Builds the BM25 lexical index used for hybrid retrieval'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source', choices=['auto', 'content', 'db'], default='auto',
+            help='content: chunk content/**/*.json directly; db: KnowledgeNode rows; auto: db if populated'
+        )
+        parser.add_argument('--content-dir', default=str(settings.BASE_DIR.parent / 'content'))
+        parser.add_argument('--out', default=CognitiveEngine.LEXICAL_INDEX_DIR)
+        parser.add_argument('--catalog', default=CATALOG_PATH, help='Content catalog, refreshed from --content-dir')
+
+    def handle(self, *args, **options):
+        source = options['source']
+        if source == 'auto':
+            source = 'db' if KnowledgeNode.objects.filter(document__isnull=False).exists() else 'content'
+
+        self.stdout.write(f"📖 Building lexical index from {source}...")
+        # Search reads chunk text back from the catalog, so it is refreshed either way.
+        # The catalog re-reads only files changed since its last build.
+        build_catalog(options['content_dir'], options['catalog'], log=self.stdout.write)
+        if source == 'db':
+            chunks, content_hashes = [], {}
+            nodes = KnowledgeNode.objects.filter(document__isnull=False).order_by('id').values_list(
+                'source_path', 'chunk_index', 'content', 'document__content_hash'
+            )
+            for source_path, chunk_index, content, content_hash in nodes.iterator(chunk_size=1000):
+                chunks.append({"source": source_path, "chunk_index": chunk_index, "content": content})
+                content_hashes[source_path] = content_hash
+        else:
+            chunks, content_hashes = self.chunks_from_catalog(options['catalog'])
+
+        index = BM25Index.build(chunks, content_hashes)
+        index.save(options['out'])
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Indexed {len(chunks)} chunks, {len(index.vocab)} terms -> {options['out']}"
+        ))
+
+    def chunks_from_catalog(self, catalog_path):
+        catalog = ContentCatalog(catalog_path)
+        chunks, content_hashes = [], {}
+        for source_path in catalog.source_paths():
+            doc = catalog.by_path(source_path)
+            for chunk in chunk_document(catalog.data(doc)):
+                chunks.append({**chunk, "source": source_path})
+            content_hashes[source_path] = doc["content_hash"]
+        catalog.close()
+        return chunks, content_hashes
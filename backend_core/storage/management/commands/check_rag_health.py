@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from storage.models import KnowledgeNode
-from pgvector.django import L2Distance
+from django.db import connection
+from pgvector.django import CosineDistance
 import numpy as np
 
 class Command(BaseCommand):
@@ -31,8 +32,9 @@ class Command(BaseCommand):
         try:
             # We just take the first node's embedding and find itself
             # If database supports pgvector operator, this query works:
+            # Cosine distance matches the vector_cosine_ops HNSW index on KnowledgeNode
             results = KnowledgeNode.objects.alias(
-                distance=L2Distance('embedding', first_node.embedding)
+                distance=CosineDistance('embedding', first_node.embedding)
             ).order_by('distance')[:1]
             
             top_match = results[0]
@@ -41,6 +43,14 @@ class Command(BaseCommand):
             else:
                 self.stdout.write(self.style.WARNING(f"⚠️ Vector Search returned different node ID: {top_match.id}"))
                 
+            # 4. Confirm the planner uses the ANN index instead of a sequential scan
+            if connection.vendor == 'postgresql':
+                plan = results.explain()
+                if 'storage_knowledgenode_embedding_ann' in plan:
+                    self.stdout.write(self.style.SUCCESS("✅ Query uses the ANN index"))
+                else:
+                    self.stdout.write(self.style.WARNING("⚠️ Query is not using the ANN index (sequential scan):"))
+                    self.stdout.write(plan)
         except Exception as e:
             self.stdout.write(self.style.ERROR(f"❌ Vector Search Failed: {e}"))
             self.stdout.write("   (This is expected if running on SQLite)")
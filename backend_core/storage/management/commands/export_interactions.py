@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from storage.models import InteractionLog
+from training.generate_data import TEMPLATES
+from training.shards import ShardWriter
+
+
+class Command(BaseCommand):
+    help = 'Exports logged queries as sharded JSONL training data ({"text", "label"}) for train_bert'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--out', required=True, help='Output shard directory')
+        parser.add_argument('--shard-size', type=int, default=100_000)
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows read per round')
+        parser.add_argument('--since-id', type=int, default=0, help='Only export rows after this InteractionLog id')
+        parser.add_argument('--min-feedback', type=float, default=None,
+                            help='Only export rows with at least this feedback_score')
+        parser.add_argument('--no-compress', action='store_true')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        # Only the intents the classifier is trained on; 'unknown' and heuristic extras are skipped
+        queryset = InteractionLog.objects.filter(intent__in=list(TEMPLATES))
+        if options['min_feedback'] is not None:
+            queryset = queryset.filter(feedback_score__gte=options['min_feedback'])
+
+        self.stdout.write(f"📤 Exporting interactions to {options['out']}...")
+        last_id = options['since_id']
+        start = time.perf_counter()
+        # Keyset pagination on id: constant memory however many rows there are
+        with ShardWriter(options['out'], shard_size=options['shard_size'],
+                         compress=not options['no_compress'], prefix='interactions') as writer:
+            while True:
+                rows = list(
+                    queryset.filter(id__gt=last_id).order_by('id').values_list('id', 'query', 'intent')[:chunk_size]
+                )
+                if not rows:
+                    break
+                for _, query, intent in rows:
+                    if query.strip():
+                        writer.write({"text": query, "label": intent})
+                last_id = rows[-1][0]
+                rate = writer.total / (time.perf_counter() - start)
+                self.stdout.write(f"  ...{writer.total} samples, up to id {last_id}, {rate:.0f} rows/s")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Exported {writer.total} samples in {len(writer.shards)} shards; "
+            f"export newer rows later with --since-id {last_id} into a new --out"
+        ))
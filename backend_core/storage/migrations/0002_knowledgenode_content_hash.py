@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storage', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='knowledgenode',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='knowledgenode',
+            name='source_path',
+            field=models.CharField(blank=True, db_index=True, max_length=512),
+        ),
+    ]
@@ -0,0 +1,39 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storage', '0002_knowledgenode_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KnowledgeDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_path', models.CharField(max_length=512, unique=True)),
+                ('title', models.CharField(max_length=255)),
+                ('subject', models.CharField(blank=True, max_length=100)),
+                ('category', models.CharField(blank=True, max_length=100)),
+                ('content_hash', models.CharField(blank=True, default='', max_length=64)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='knowledgenode',
+            name='document',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='storage.knowledgedocument'),
+        ),
+        migrations.AddField(
+            model_name='knowledgenode',
+            name='section',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='knowledgenode',
+            name='chunk_index',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
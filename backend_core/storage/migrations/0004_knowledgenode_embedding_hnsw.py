@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:05
+"""
+HNSW index on KnowledgeNode.embedding for cosine search, declared in KnowledgeNode.Meta.
+Search-time ef_search is set per query by inference.retrieval.PgVectorRetrievalBackend.
+
+The index only exists on Postgres: the schema change is skipped on other databases
+(local SQLite dev), while the migration state still records it.
+"""
+import pgvector.django.indexes
+from django.db import migrations
+
+
+class PostgresAddIndex(migrations.AddIndex):
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storage', '0003_knowledgedocument_chunks'),
+    ]
+
+    operations = [
+        PostgresAddIndex(
+            model_name='knowledgenode',
+            index=pgvector.django.indexes.HnswIndex(ef_construction=64, fields=['embedding'], m=16, name='knowledgenode_embedding_hnsw', opclasses=['vector_cosine_ops']),
+        ),
+    ]
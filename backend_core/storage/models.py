@@ -1,5 +1,5 @@
 from django.db import models
-from pgvector.django import VectorField
+from pgvector.django import HnswIndex, VectorField
 
 class UserProfile(models.Model):
     user_id = models.CharField(max_length=255, unique=True)
@@ -7,13 +7,44 @@ class UserProfile(models.Model):
     # Store aggregated signals, e.g. {"mastery": 0.5}
     stats = models.JSONField(default=dict)
 
+class KnowledgeDocument(models.Model):
+    """One content/**/*.json lesson. Its chunks are the KnowledgeNode rows that get embedded."""
+    source_path = models.CharField(max_length=512, unique=True)
+    title = models.CharField(max_length=255)
+    subject = models.CharField(max_length=100, blank=True)
+    category = models.CharField(max_length=100, blank=True)
+    # sha256 of the source JSON + chunker version; incremental sync skips unchanged documents
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+
 class KnowledgeNode(models.Model):
     title = models.CharField(max_length=255)
     content = models.TextField()
     # 768 dimensions for text-embedding-004
     embedding = VectorField(dimensions=768) 
     created_at = models.DateTimeField(auto_now_add=True)
-    source_path = models.CharField(max_length=512, blank=True)
+    source_path = models.CharField(max_length=512, blank=True, db_index=True)
+    # sha256 of the embedded content
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+    # Chunk-level indexing: each node is one section-aware chunk of a parent document
+    document = models.ForeignKey(
+        KnowledgeDocument, null=True, blank=True, on_delete=models.CASCADE, related_name='chunks'
+    )
+    section = models.CharField(max_length=50, blank=True)
+    chunk_index = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # ANN index for cosine search (inference.retrieval.PgVectorRetrievalBackend); Postgres only,
+            # see migration 0004. ef_search is set per query.
+            HnswIndex(
+                name='knowledgenode_embedding_hnsw',
+                fields=['embedding'],
+                m=16,
+                ef_construction=64,
+                opclasses=['vector_cosine_ops'],
+            ),
+        ]
 
 class InteractionLog(models.Model):
     user = models.ForeignKey(UserProfile, on_delete=models.CASCADE)
@@ -0,0 +1,136 @@
+"""
+Checks the chat and intent API views (api/views.py) end to end through DRF, with the
+Vertex/Gemini clients replaced by inference.fakes and an in-memory SQLite database:
+ChatView's server-sent event stream (meta, then tokens, then done; logged only once
+`done` has been sent) and IntentBatchView's validation (MAX_BATCH_QUERIES cap, 400s for
+malformed batches).
+
+    python test_api_views.py
+"""
+import json
+import os
+import tempfile
+
+# Engine config is read from the environment at import time
+os.environ.setdefault("RESPONSE_CACHE_BACKEND", "off")
+os.environ.setdefault("EMBEDDING_CACHE_DIR", "off")
+os.environ.setdefault("LEXICAL_INDEX_DIR", tempfile.mkdtemp(prefix="test-no-lexical-"))
+os.environ.setdefault("TRACING_LOG", "false")
+os.environ["INTERACTION_LOG_MODE"] = "sync" # inline writes, so the test sees exactly when the row lands
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+settings.configure(
+    INSTALLED_APPS=["django.contrib.auth", "django.contrib.contenttypes", "rest_framework", "storage"],
+    DATABASES={"default": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"}},
+    USE_TZ=True,
+)
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from rest_framework.test import APIRequestFactory, force_authenticate  # noqa: E402
+
+from api.views import MAX_BATCH_QUERIES, ChatView, IntentBatchView  # noqa: E402
+from inference.engine import CognitiveEngine  # noqa: E402
+from inference.fakes import FakeGenerativeModel, install_fakes  # noqa: E402
+from storage.models import InteractionLog, UserProfile  # noqa: E402
+
+
+class FakeRetriever:
+    def search(self, query_vector, limit):
+        return [
+            {"source": f"content/lesson-{i}.json", "section": "theory", "content": f"chunk {i}", "score": 1.0}
+            for i in range(limit)
+        ]
+
+
+def setup_engine():
+    call_command("migrate", "auth", verbosity=0)
+    with connection.schema_editor() as editor: # storage's migrations need Postgres (pgvector)
+        editor.create_model(UserProfile)
+        editor.create_model(InteractionLog)
+    install_fakes(CognitiveEngine)
+    CognitiveEngine._clients.update({
+        "generative": FakeGenerativeModel(words=5),
+        "retriever": FakeRetriever(),
+        "intent_student": False,
+    })
+    CognitiveEngine._model = False # no DistilBERT weights: heuristic intents
+
+
+def parse_events(chunk: str) -> list:
+    events = []
+    for block in chunk.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_chat_stream():
+    print("\n--- Testing ChatView SSE stream ---")
+    request = APIRequestFactory().post(
+        "/api/v1/chat/?stream=1", {"messages": [{"role": "user", "content": "Explain binary search"}]}, format="json"
+    )
+    force_authenticate(request, user=User.objects.create(username="stream-user"))
+    response = ChatView.as_view()(request)
+    assert response.status_code == 200 and response.streaming
+    assert response["Content-Type"] == "text/event-stream"
+    assert response["Cache-Control"] == "no-cache"
+
+    events, logged_before_done = [], None
+    for chunk in response.streaming_content:
+        events += parse_events(chunk.decode() if isinstance(chunk, bytes) else chunk)
+        if events[-1][0] == "done":
+            logged_before_done = InteractionLog.objects.count()
+
+    names = [name for name, _ in events]
+    assert names[0] == "meta" and names[-1] == "done", names
+    assert set(names[1:-1]) == {"token"} and len(names) == 7, names
+    meta, done = events[0][1], events[-1][1]
+    assert meta["cached"] is False and meta["intent"]["intent"] and meta["sources"]
+    assert done["response"] == "".join(data["text"] for name, data in events if name == "token")
+    assert logged_before_done == 0, "interaction logged before the done event was sent"
+    row = InteractionLog.objects.get()
+    assert row.user.user_id == "stream-user" and row.response == done["response"]
+    print(f"✅ ChatView stream: {' '.join(names[:2])} ... {names[-1]}, logged after done")
+
+
+def test_intent_batch():
+    print("\n--- Testing IntentBatchView ---")
+    view = IntentBatchView.as_view()
+
+    def post(payload):
+        return view(APIRequestFactory().post("/api/v1/intent_check/batch/", payload, format="json"))
+
+    queries = ["Explain binary search", "I'm stuck on recursion", "What is a linked list?"]
+    response = post({"queries": queries})
+    assert response.status_code == 200, response.data
+    assert len(response.data["results"]) == len(queries)
+    expected = [CognitiveEngine.analyze_intents([query])[0]["intent"] for query in queries]
+    assert [result["intent"] for result in response.data["results"]] == expected
+
+    # The cap itself is accepted; one more query is not
+    response = post({"queries": ["What is a stack?"] * MAX_BATCH_QUERIES})
+    assert response.status_code == 200 and len(response.data["results"]) == MAX_BATCH_QUERIES
+
+    bad = {
+        "missing": {},
+        "not a list": {"queries": "Explain binary search"},
+        "empty": {"queries": []},
+        "over the cap": {"queries": ["What is a stack?"] * (MAX_BATCH_QUERIES + 1)},
+        "non-string entry": {"queries": ["Explain binary search", 42]},
+        "empty entry": {"queries": ["Explain binary search", ""]},
+    }
+    for label, payload in bad.items():
+        response = post(payload)
+        assert response.status_code == 400 and response.data["error"], f"{label}: {response.status_code}"
+    print(f"✅ IntentBatchView: {len(queries)} results in order, cap {MAX_BATCH_QUERIES}, {len(bad)} bad batches -> 400")
+
+
+if __name__ == "__main__":
+    setup_engine()
+    test_chat_stream()
+    test_intent_batch()
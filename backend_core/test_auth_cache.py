@@ -0,0 +1,269 @@
+"""
+Checks Firebase token authentication (api/authentication.py, api/token_cache.py) with
+locally minted tokens and a stub key set (no network, no Firebase project needed):
+the opt-in local verifier's header and claim checks, key rotation, cert prewarm (local
+only), and FirebaseAuthentication.authenticate end to end (verified-token cache, uid ->
+User LRU and its TTL, AuthenticationFailed). Django runs against an in-memory SQLite database.
+
+    python test_auth_cache.py
+"""
+import base64
+import hashlib
+import hmac
+import json
+import time
+from types import SimpleNamespace
+
+import django
+from django.conf import settings
+
+settings.configure(
+    INSTALLED_APPS=["django.contrib.auth", "django.contrib.contenttypes"],
+    DATABASES={"default": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"}},
+    USE_TZ=True,
+)
+django.setup()
+
+from cryptography.hazmat.primitives import serialization  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import rsa  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import CaptureQueriesContext, override_settings  # noqa: E402
+from google.auth import crypt, jwt  # noqa: E402
+from rest_framework import exceptions  # noqa: E402
+
+from api import token_cache  # noqa: E402
+from api.authentication import FirebaseAuthentication  # noqa: E402
+from api.token_cache import PublicKeySet, TokenVerifier  # noqa: E402
+
+PROJECT_ID = "test-project"
+
+
+def make_key(kid):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    public_pem = key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode()
+    return crypt.RSASigner.from_string(private_pem, key_id=kid), public_pem
+
+
+def claims(uid="user-1", lifetime=3600, **overrides):
+    now = int(time.time())
+    payload = {
+        "iss": f"https://securetoken.google.com/{PROJECT_ID}",
+        "aud": PROJECT_ID,
+        "auth_time": now,
+        "sub": uid,
+        "iat": now,
+        "exp": now + lifetime,
+        **overrides,
+    }
+    return {k: v for k, v in payload.items() if v is not None} # None drops the claim
+
+
+def mint(signer, uid="user-1", lifetime=3600, **overrides):
+    return jwt.encode(signer, claims(uid, lifetime, **overrides)).decode()
+
+
+def b64(data: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b"=").decode()
+
+
+def forge(header: dict, payload: dict, secret=b"") -> str:
+    """Unsigned ('none') or HMAC-signed tokens, which google-auth can't mint."""
+    signing_input = f"{b64(header)}.{b64(payload)}"
+    signature = b""
+    if header.get("alg") == "HS256":
+        signature = hmac.new(secret, signing_input.encode(), hashlib.sha256).digest()
+    return signing_input + "." + base64.urlsafe_b64encode(signature).rstrip(b"=").decode()
+
+
+class StubKeys:
+    """Stands in for Google's x509 endpoint; counts fetches."""
+
+    def __init__(self, keys):
+        self.keys = dict(keys)
+        self.fetches = 0
+
+    def __call__(self):
+        self.fetches += 1
+        return dict(self.keys), 3600
+
+
+def rejected(verifier, token) -> bool:
+    try:
+        verifier.verify(token)
+    except ValueError:
+        return True
+    return False
+
+
+def test_verify():
+    print("\n--- Testing Local Verification ---")
+    signer, public_pem = make_key("k1")
+    verifier = TokenVerifier(PROJECT_ID, PublicKeySet(fetch=StubKeys({"k1": public_pem}), retry_seconds=0))
+    assert verifier.verify(mint(signer))["uid"] == "user-1"
+
+    now = int(time.time())
+    unkeyed, _ = make_key(None)
+    other_signer, _ = make_key("k1")
+    cases = [
+        ("alg none", forge({"alg": "none", "kid": "k1"}, claims())),
+        ("alg HS256 keyed with the public cert", forge({"alg": "HS256", "kid": "k1"}, claims(), public_pem.encode())),
+        ("alg ES256", forge({"alg": "ES256", "kid": "k1"}, claims())),
+        ("no kid", mint(unkeyed)),
+        ("unknown kid", mint(make_key("k9")[0])),
+        ("signed by another key under a known kid", mint(other_signer)),
+        ("malformed", "not-a-jwt"),
+        ("wrong audience", mint(signer, aud="other-project")),
+        ("wrong issuer", mint(signer, iss="https://securetoken.google.com/other-project")),
+        ("expired", mint(signer, iat=now - 7200, exp=now - 3600)),
+        ("no exp", mint(signer, exp=None)),
+        ("no iat", mint(signer, iat=None)),
+        ("iat in the future", mint(signer, iat=now + 600, exp=now + 4200)),
+        ("empty subject", mint(signer, uid="")),
+        ("overlong subject", mint(signer, uid="u" * 129)),
+        ("auth_time in the future", mint(signer, auth_time=now + 600)),
+    ]
+    accepted = [label for label, token in cases if not rejected(verifier, token)]
+    assert not accepted, f"accepted invalid tokens: {accepted}"
+    print(f"✅ Local Verification Passed ({len(cases)} invalid tokens rejected)")
+
+
+def test_key_rotation():
+    print("\n--- Testing Key Rotation ---")
+    signer1, pem1 = make_key("k1")
+    signer2, pem2 = make_key("k2")
+    stub = StubKeys({"k1": pem1})
+    key_set = PublicKeySet(fetch=stub, retry_seconds=0)
+    verifier = TokenVerifier(PROJECT_ID, key_set)
+    verifier.verify(mint(signer1))
+
+    stub.keys["k2"] = pem2 # Google publishes a new key before our refresh runs
+    fetches = stub.fetches
+    assert verifier.verify(mint(signer2))["uid"] == "user-1"
+    assert stub.fetches == fetches + 1, "unknown kid should force exactly one refresh"
+    print("✅ Key Rotation Passed")
+
+
+def test_verifier_is_opt_in():
+    print("\n--- Testing Verifier Selection ---")
+    from firebase_admin import auth
+    try:
+        token_cache._verifier = None
+        assert token_cache.get_verifier() is auth.verify_id_token, "default must stay firebase_admin"
+        token_cache._verifier = None
+        with override_settings(FIREBASE_TOKEN_VERIFIER="local", FIREBASE_PROJECT_ID=PROJECT_ID):
+            verifier = token_cache.get_verifier()
+        assert isinstance(verifier.__self__, TokenVerifier) and verifier.__self__.project_id == PROJECT_ID
+    finally:
+        token_cache._verifier = None
+    print("✅ Verifier Selection Passed (admin by default, local opt-in)")
+
+
+def test_prewarm():
+    print("\n--- Testing Cert Prewarm ---")
+    _, public_pem = make_key("k1")
+    stub = StubKeys({"k1": public_pem})
+    try:
+        # admin: firebase_admin caches certs internally, so there is nothing to warm
+        token_cache._verifier = lambda token: {}
+        assert token_cache.prewarm() is False
+
+        key_set = PublicKeySet(fetch=stub)
+        token_cache._verifier = TokenVerifier(PROJECT_ID, key_set).verify
+        assert token_cache.prewarm() is True
+        assert stub.fetches == 1 and key_set._thread.is_alive(), "local prewarm should fetch and start refreshing"
+        key_set.get()
+        assert stub.fetches == 1, "prewarmed certs should serve requests without a fetch"
+    finally:
+        token_cache._verifier = None
+    print("✅ Cert Prewarm Passed (local fetches and refreshes; admin is a no-op)")
+
+
+def test_authenticate():
+    print("\n--- Testing FirebaseAuthentication ---")
+    call_command("migrate", verbosity=0)
+    signer, public_pem = make_key("k1")
+    local = TokenVerifier(PROJECT_ID, PublicKeySet(fetch=StubKeys({"k1": public_pem})), clock_skew=0)
+    calls = {"n": 0}
+
+    def counting_verify(token):
+        calls["n"] += 1
+        return local.verify(token)
+
+    def request(token):
+        return SimpleNamespace(META={"HTTP_AUTHORIZATION": f"Bearer {token}"})
+
+    auth = FirebaseAuthentication()
+    auth.token_cache._cache.clear()
+    auth.user_cache.clear()
+    token_cache._verifier = counting_verify
+    try:
+        assert auth.authenticate(SimpleNamespace(META={})) is None
+
+        token = mint(signer)
+        start = time.perf_counter()
+        user, _ = auth.authenticate(request(token))
+        first = time.perf_counter() - start
+        assert user.username == "user-1" and calls["n"] == 1
+
+        # Cache hit: no re-verification and, via the user LRU, no database query
+        start = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(1000):
+                assert auth.authenticate(request(token))[0].pk == user.pk
+        repeat = (time.perf_counter() - start) / 1000
+        assert calls["n"] == 1, "repeat requests should not re-verify"
+        assert len(queries) == 0, f"user LRU missed: {len(queries)} queries"
+        print(f"first authenticate {first * 1e3:.2f}ms, cached {repeat * 1e6:.1f}us")
+
+        # A refreshed token for the same uid is verified once, but the user comes from the LRU
+        with CaptureQueriesContext(connection) as queries:
+            assert auth.authenticate(request(mint(signer, iat=int(time.time()) - 1)))[0].pk == user.pk
+        assert calls["n"] == 2 and len(queries) == 0
+
+        # Verification failures of any kind surface as AuthenticationFailed
+        for bad in (mint(signer, aud="other-project"), "garbage", forge({"alg": "none", "kid": "k1"}, claims())):
+            try:
+                auth.authenticate(request(bad))
+                raise AssertionError("invalid token authenticated")
+            except exceptions.AuthenticationFailed:
+                pass
+
+        # Cached claims expire with the token's exp claim
+        short = mint(signer, lifetime=1)
+        auth.authenticate(request(short))
+        time.sleep(1.1)
+        assert auth.token_cache.get(short) is None
+        try:
+            auth.authenticate(request(short))
+            raise AssertionError("expired token authenticated")
+        except exceptions.AuthenticationFailed:
+            pass
+
+        # Cached users expire, so a deactivated user is rejected once the TTL runs out
+        user.is_active = False
+        user.save()
+        assert auth.authenticate(request(token))[0].pk == user.pk # still cached
+        auth.user_cache.set("user-1", user, expires_at=time.time()) # TTL elapsed
+        try:
+            auth.authenticate(request(token))
+            raise AssertionError("deactivated user authenticated")
+        except exceptions.AuthenticationFailed:
+            pass
+        assert auth.user_cache.get("user-1") is None, "inactive users must not be cached"
+    finally:
+        token_cache._verifier = None
+    print("✅ FirebaseAuthentication Passed")
+
+
+if __name__ == "__main__":
+    test_verify()
+    test_key_rotation()
+    test_verifier_is_opt_in()
+    test_prewarm()
+    test_authenticate()
@@ -0,0 +1,130 @@
+"""
+Checks the intent micro-batcher (inference/batching.py): a full batch runs without waiting
+out max_wait_ms, a partial batch runs once max_wait_ms has passed, a failing batch_fn
+fails every caller in that batch (and only that batch), cancelled callers are skipped,
+and stop() drains what was already submitted before ending the thread.
+
+    python test_batching.py
+"""
+import threading
+import time
+from concurrent.futures import CancelledError
+
+from inference.batching import MicroBatcher
+
+
+class Recorder:
+    """batch_fn that doubles its inputs and records the batches it was handed."""
+
+    def __init__(self, delay=0.0, fail=None):
+        self.batches = []
+        self.delay = delay
+        self.fail = fail
+        self.started = threading.Event()
+
+    def __call__(self, items):
+        self.started.set()
+        self.batches.append(list(items))
+        if self.delay:
+            time.sleep(self.delay)
+        if self.fail:
+            raise self.fail
+        return [item * 2 for item in items]
+
+
+def test_full_batch_runs_immediately():
+    fn = Recorder()
+    batcher = MicroBatcher(fn, max_batch_size=4, max_wait_ms=5000, name="test-batcher")
+    start = time.perf_counter()
+    futures = [batcher.submit(i) for i in range(8)]
+    assert [f.result(timeout=2) for f in futures] == [i * 2 for i in range(8)]
+    elapsed = time.perf_counter() - start
+    assert fn.batches == [[0, 1, 2, 3], [4, 5, 6, 7]], fn.batches
+    assert elapsed < 1.0, f"full batches waited for max_wait_ms ({elapsed:.2f}s)"
+    batcher.stop()
+    print(f"✅ max size: 8 items -> 2 batches of 4 in {elapsed * 1e3:.1f}ms")
+
+
+def test_partial_batch_runs_after_wait():
+    fn = Recorder()
+    batcher = MicroBatcher(fn, max_batch_size=100, max_wait_ms=50)
+    start = time.perf_counter()
+    futures = [batcher.submit(i) for i in range(3)]
+    assert [f.result(timeout=2) for f in futures] == [0, 2, 4]
+    elapsed = time.perf_counter() - start
+    assert fn.batches == [[0, 1, 2]], fn.batches
+    assert 0.04 <= elapsed < 1.0, f"partial batch ran after {elapsed * 1e3:.1f}ms, expected ~50ms"
+    batcher.stop()
+    print(f"✅ timeout: partial batch of 3 ran after {elapsed * 1e3:.1f}ms")
+
+
+def test_errors_reach_every_caller():
+    fn = Recorder(fail=ValueError("boom"))
+    batcher = MicroBatcher(fn, max_batch_size=3, max_wait_ms=1000)
+    futures = [batcher.submit(i) for i in range(3)]
+    for future in futures:
+        try:
+            future.result(timeout=2)
+            raise AssertionError("batch_fn error was not propagated")
+        except ValueError as e:
+            assert str(e) == "boom"
+
+    # A batch_fn that returns the wrong number of results fails the batch too
+    short = MicroBatcher(lambda items: items[:-1], max_batch_size=2, max_wait_ms=1000)
+    for future in [short.submit(i) for i in range(2)]:
+        try:
+            future.result(timeout=2)
+            raise AssertionError("short result list was not rejected")
+        except RuntimeError:
+            pass
+
+    # The thread survives a failed batch
+    fn.fail = None
+    assert batcher(21, timeout=2) == 42
+    batcher.stop()
+    short.stop()
+    print("✅ errors: every caller in a failed batch gets the exception; later batches still run")
+
+
+def test_cancelled_callers_are_skipped():
+    fn = Recorder(delay=0.1)
+    batcher = MicroBatcher(fn, max_batch_size=1, max_wait_ms=0)
+    first = batcher.submit(1)
+    fn.started.wait(2) # the thread is busy with the first item
+    cancelled = batcher.submit(2)
+    assert cancelled.cancel()
+    kept = batcher.submit(3)
+    assert first.result(timeout=2) == 2 and kept.result(timeout=2) == 6
+    try:
+        cancelled.result(timeout=0)
+        raise AssertionError("cancelled future produced a result")
+    except CancelledError:
+        pass
+    assert fn.batches == [[1], [3]], fn.batches
+    batcher.stop()
+    print("✅ cancel: a caller that gave up is never run")
+
+
+def test_stop_drains_then_restarts():
+    fn = Recorder(delay=0.05)
+    batcher = MicroBatcher(fn, max_batch_size=2, max_wait_ms=1000)
+    futures = [batcher.submit(i) for i in range(5)]
+    thread = batcher._thread
+    batcher.stop(timeout=2)
+    assert not thread.is_alive(), "stop() left the batcher thread running"
+    assert all(f.done() for f in futures), "stop() dropped items submitted before it"
+    assert [f.result() for f in futures] == [0, 2, 4, 6, 8]
+    batcher.stop() # already stopped: no-op
+
+    # submit() after stop() starts a fresh thread
+    assert batcher(5, timeout=2) == 10 and batcher._thread is not thread
+    batcher.stop()
+    print(f"✅ stop: {len(fn.batches) - 1} queued batches drained before the thread ended; restart works")
+
+
+if __name__ == "__main__":
+    test_full_batch_runs_immediately()
+    test_partial_batch_runs_after_wait()
+    test_errors_reach_every_caller()
+    test_cancelled_callers_are_skipped()
+    test_stop_drains_then_restarts()
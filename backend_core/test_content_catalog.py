@@ -0,0 +1,57 @@
+"""
+Checks that a loaded content catalog (storage/catalog.py) notices an in-place rebuild:
+`is_stale()` turns True once build_catalog commits new content (and only then), a fresh
+load serves the new metadata, and `data()` on a lesson the rebuild removed raises
+KeyError instead of failing on a missing row.
+
+    python test_content_catalog.py
+"""
+import json
+import os
+import tempfile
+
+from storage.catalog import ContentCatalog, build_catalog
+
+
+def write_lesson(content_dir, slug, title):
+    with open(os.path.join(content_dir, f"{slug}.json"), "w") as f:
+        json.dump({"title": title, "slug": slug, "subject": "algorithms", "theory": f"{title} theory"}, f)
+
+
+def test_rebuild_is_noticed():
+    with tempfile.TemporaryDirectory() as root:
+        content_dir = os.path.join(root, "content")
+        os.makedirs(content_dir)
+        path = os.path.join(root, "catalog.sqlite3")
+        write_lesson(content_dir, "binary-search", "Binary Search")
+        write_lesson(content_dir, "heaps", "Heaps")
+        build_catalog(content_dir, path, log=None)
+
+        catalog = ContentCatalog.load(path)
+        heaps = catalog.get("heaps")
+        assert not catalog.is_stale()
+        build_catalog(content_dir, path, log=None) # nothing changed on disk
+        assert catalog.get("binary-search")["title"] == "Binary Search"
+
+        write_lesson(content_dir, "binary-search", "Binary Search, Revisited")
+        os.remove(os.path.join(content_dir, "heaps.json"))
+        build_catalog(content_dir, path, log=None)
+        assert catalog.is_stale(), "in-place rebuild not detected"
+        assert catalog.get("binary-search")["title"] == "Binary Search", "old maps until reloaded"
+        try:
+            catalog.data(heaps)
+            raise AssertionError("data() returned a lesson the rebuild removed")
+        except KeyError:
+            pass
+
+        fresh = ContentCatalog.load(path)
+        assert not fresh.is_stale()
+        assert fresh.get("binary-search")["title"] == "Binary Search, Revisited"
+        assert fresh.get("heaps") is None and fresh.meta["built_at"]
+        catalog.close()
+        fresh.close()
+    print("✅ rebuilt catalog is reported stale and reloads with the new lessons")
+
+
+if __name__ == "__main__":
+    test_rebuild_is_noticed()
@@ -0,0 +1,63 @@
+"""
+Checks context assembly (inference/context.py) with the real intent-model tokenizer,
+both the fast (Rust) one the backends load and the slow (Python) one, which has no
+offset mappings. Needs transformers; the backend check also needs torch.
+
+    python test_context_tokenizer.py
+"""
+from transformers import DistilBertTokenizer, DistilBertTokenizerFast
+
+from inference.context import ContextAssembler
+
+MODEL_DIR = "inference/models/bert_intent"
+
+PARAGRAPH = (
+    "Binary search halves a sorted array each step, comparing the middle element with the "
+    "target and discarding the half that cannot contain it. It runs in O(log n) time. "
+)
+
+
+def chunks():
+    return [
+        {"source": "content/algorithms/binary-search.json", "section": "theory", "content": PARAGRAPH * 12},
+        {"source": "content/algorithms/sorting.json", "section": "", "content": "Sorting puts items in order. " * 40},
+        {"source": "content/algorithms/recursion.json", "section": "examples", "content": "def f(n): return f(n - 1) " * 30},
+    ]
+
+
+def check(tokenizer, budget=300):
+    assembler = ContextAssembler(tokenizer, default_budget=budget, min_chunk_tokens=32)
+    context, used, usage = assembler.assemble(chunks(), "concept_learning")
+    assert used, "nothing packed"
+    assert usage["context_tokens"] <= budget, usage
+    assert assembler.count_tokens(context) <= budget + 8, assembler.count_tokens(context) # separators/ellipsis
+    assert context.rstrip().endswith("..."), "the crossing chunk should be truncated"
+    return usage
+
+
+def test_fast_tokenizer():
+    tokenizer = DistilBertTokenizerFast.from_pretrained(MODEL_DIR)
+    assert tokenizer.is_fast
+    print(f"✅ fast tokenizer: {check(tokenizer)}")
+
+
+def test_slow_tokenizer():
+    tokenizer = DistilBertTokenizer.from_pretrained(MODEL_DIR)
+    print(f"✅ {'fast' if tokenizer.is_fast else 'slow'} DistilBertTokenizer: {check(tokenizer)}")
+
+
+def test_backend_loads_fast_tokenizer():
+    try:
+        from inference.backends import BACKENDS
+    except ImportError as e:
+        print(f"⚠️ Skipping backend check ({e})")
+        return
+    for name, backend_cls in BACKENDS.items():
+        assert backend_cls.tokenizer_class.from_pretrained(MODEL_DIR).is_fast, name
+    print("✅ every intent backend loads a fast tokenizer")
+
+
+if __name__ == "__main__":
+    test_fast_tokenizer()
+    test_slow_tokenizer()
+    test_backend_loads_fast_tokenizer()
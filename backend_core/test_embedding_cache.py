@@ -0,0 +1,49 @@
+"""
+Checks the on-disk embedding cache (inference/embedding_cache.py) starting from an
+empty directory: an empty store must still count as a store (the engine keeps it with
+`get_store(...) or False` and writes through `if store:`), and the first put must be
+visible to a fresh store and to other open stores on the same directory.
+
+    python test_embedding_cache.py
+"""
+import tempfile
+
+from inference.embedding_cache import EmbeddingStore, get_store
+
+DIM = 8
+
+
+def vector(seed):
+    return [float(seed + i) for i in range(DIM)]
+
+
+def test_empty_store_is_kept():
+    with tempfile.TemporaryDirectory() as root:
+        store = get_store("test-model", root) or False
+        assert store is not False, "an empty store was treated as disabled"
+        assert bool(store) and store.count() == 0
+    print("✅ empty store is kept by `get_store(...) or False`")
+
+
+def test_first_put_persists():
+    with tempfile.TemporaryDirectory() as root:
+        store = EmbeddingStore(root, "test-model", dim=DIM)
+        other = EmbeddingStore(root, "test-model", dim=DIM) # another worker, opened before the write
+        assert store.get("what is recursion") is None
+
+        store.put("what is recursion", vector(1))
+        assert store.count() == 1
+        assert store.get("what is recursion") == vector(1)
+
+        reopened = EmbeddingStore(root, "test-model", dim=DIM)
+        assert reopened.get("what is recursion") == vector(1), "first put was not written to disk"
+        assert other.get("what is recursion") == vector(1), "open stores don't see appended rows"
+
+        store.put_many(["a", "b", "a"], [vector(2), vector(3), vector(4)])
+        assert EmbeddingStore(root, "test-model", dim=DIM).get_many(["a", "b", "c"]) == [vector(2), vector(3), None]
+    print("✅ first put persists and is shared across stores")
+
+
+if __name__ == "__main__":
+    test_empty_store_is_kept()
+    test_first_put_persists()
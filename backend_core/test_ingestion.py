@@ -0,0 +1,126 @@
+"""
+Runs the ingestion pipeline (storage/ingestion.py) end to end against FakeEmbeddingModel:
+requests respect the per-request limits, injected failures are retried, records that
+arrive out of order still carry their own text's vector, exhausted retries drop records
+instead of writing them, batches over the token limit are split rather than dropped, and
+the embedding cache serves a second run without API calls.
+
+    python test_ingestion.py
+"""
+import math
+import tempfile
+import threading
+
+from inference.embedding_cache import EmbeddingStore
+from inference.fakes import FakeEmbeddingModel
+from storage.ingestion import IngestionPipeline, pack_batches
+
+DIM = 8
+
+
+def documents(count=12, chunks=5):
+    """parse_fn input: one source per document, each parsed into `chunks` records."""
+    sources = [f"lesson-{i}" for i in range(count)]
+
+    def parse(source):
+        if source == "lesson-3":
+            return None # unchanged, skipped
+        return [{"source": source, "chunk_index": c, "content": f"{source} chunk {c} " + "word " * (c * 7)}
+                for c in range(chunks)]
+    return sources, parse
+
+
+class Collector:
+    def __init__(self):
+        self.chunks = []
+        self.closed_on = None
+
+    def __call__(self, records):
+        self.chunks.append(list(records))
+
+    def close(self):
+        self.closed_on = threading.current_thread().name
+
+    @property
+    def records(self):
+        return [r for chunk in self.chunks for r in chunk]
+
+
+def test_batching_and_ordering():
+    model = FakeEmbeddingModel(dim=DIM, latency=0.002, max_batch=4)
+    pipeline = IngestionPipeline(model, concurrency=4, write_chunk=7, max_texts=4, base_delay=0)
+    sources, parse = documents()
+    writer = Collector()
+    stats = pipeline.run(sources, parse, writer)
+
+    records = writer.records
+    assert stats["sources"] == 12 and stats["skipped"] == 1
+    assert len(records) == stats["written"] == stats["embedded"] == 55
+    assert stats["api_calls"] == model.calls == math.ceil(55 / 4), "requests were not packed up to max_texts"
+    assert all(len(chunk) <= 7 for chunk in writer.chunks)
+    assert sorted((r["source"], r["chunk_index"]) for r in records) == sorted(
+        (s, c) for s in sources if s != "lesson-3" for c in range(5)
+    ), "records lost or duplicated"
+    for r in records:
+        assert r["embedding"] == model.embed_text(r["content"]), "vector written against the wrong record"
+    assert writer.closed_on == "ingest-writer", "write_fn.close() should run on the writer thread"
+    print(f"✅ batching/ordering: {stats['api_calls']} requests for 55 records, every vector matched")
+
+
+def test_retry():
+    model = FakeEmbeddingModel(dim=DIM, fail_rate=0.4, max_batch=4, seed=1)
+    pipeline = IngestionPipeline(model, concurrency=2, max_texts=4, max_retries=20, base_delay=0)
+    sources, parse = documents()
+    stats = pipeline.run(sources, parse, Collector())
+    assert stats["embed_failures"] == 0 and stats["written"] == 55
+    assert model.calls > stats["api_calls"], "no failure was injected, retry path not exercised"
+    print(f"✅ retry: {model.calls - stats['api_calls']} failed requests retried, nothing lost")
+
+
+def test_give_up():
+    model = FakeEmbeddingModel(dim=DIM, fail_rate=1.0)
+    pipeline = IngestionPipeline(model, max_retries=1, base_delay=0)
+    sources, parse = documents(count=2)
+    writer = Collector()
+    stats = pipeline.run(sources, parse, writer)
+    assert stats["embed_failures"] == 10 and stats["written"] == 0 and not writer.records
+    assert writer.closed_on == "ingest-writer"
+    print("✅ give up: failed batches are dropped, not written")
+
+
+def test_token_limit_split():
+    # Dense text: 1 character per token, so the packing estimate undershoots
+    model = FakeEmbeddingModel(dim=DIM, max_tokens=200, chars_per_token=1.0)
+    pipeline = IngestionPipeline(model, max_tokens=200, max_retries=5, base_delay=0)
+    sources, parse = documents(count=2)
+    writer = Collector()
+    stats = pipeline.run(sources, parse, writer)
+    assert stats["embed_failures"] == 0 and stats["written"] == len(writer.records) == 10
+    packed = len(list(pack_batches(writer.records, max_tokens=200)))
+    assert stats["api_calls"] > packed, "over-limit batches were not split"
+    for r in writer.records:
+        assert r["embedding"] == model.embed_text(r["content"])
+    print(f"✅ token limit: over-limit batches split, {stats['api_calls']} requests, nothing dropped")
+
+
+def test_cache():
+    with tempfile.TemporaryDirectory() as root:
+        store = EmbeddingStore(root, "fake", dim=DIM)
+        sources, parse = documents()
+        first = IngestionPipeline(FakeEmbeddingModel(dim=DIM), store=store, base_delay=0).run(sources, parse, Collector())
+        model = FakeEmbeddingModel(dim=DIM)
+        writer = Collector()
+        second = IngestionPipeline(model, store=store, base_delay=0).run(sources, parse, writer)
+        assert first["api_calls"] > 0 and second["api_calls"] == 0 and model.calls == 0
+        assert second["cache_hits"] == second["written"] == 55
+        for r in writer.records:
+            assert list(r["embedding"]) == model.embed_text(r["content"])
+    print("✅ cache: second run served entirely from the embedding store")
+
+
+if __name__ == "__main__":
+    test_batching_and_ordering()
+    test_retry()
+    test_give_up()
+    test_token_limit_split()
+    test_cache()
@@ -0,0 +1,69 @@
+"""
+Checks the BM25 lexical index (inference/lexical.py) against a content catalog: hits
+carry the same text chunk_document produces, save() publishes a new build through the
+CURRENT pointer without touching the one already loaded, and hits on a lesson edited
+after the build are dropped instead of serving stale text.
+
+    python test_lexical_index.py
+"""
+import json
+import os
+import tempfile
+
+from inference.lexical import BM25Index
+from storage.catalog import ContentCatalog, build_catalog
+from storage.chunking import chunk_document
+
+
+def write_lesson(content_dir, slug, title, theory):
+    with open(os.path.join(content_dir, f"{slug}.json"), "w") as f:
+        json.dump({"title": title, "slug": slug, "subject": "algorithms", "theory": theory}, f)
+
+
+def index_catalog(catalog):
+    chunks, hashes = [], {}
+    for source in catalog.source_paths():
+        doc = catalog.by_path(source)
+        chunks += [{**chunk, "source": source} for chunk in chunk_document(catalog.data(doc))]
+        hashes[source] = doc["content_hash"]
+    return BM25Index.build(chunks, hashes)
+
+
+def test_search_reads_text_from_catalog():
+    with tempfile.TemporaryDirectory() as root:
+        content_dir = os.path.join(root, "content")
+        os.makedirs(content_dir)
+        catalog_path = os.path.join(root, "catalog.sqlite3")
+        index_dir = os.path.join(root, "lexical")
+        write_lesson(content_dir, "heaps", "Heaps", "A binary heap keeps the smallest key at the root.")
+        write_lesson(content_dir, "tries", "Tries", "A trie stores strings by shared prefixes.")
+        build_catalog(content_dir, catalog_path, log=None)
+        catalog = ContentCatalog.load(catalog_path)
+
+        assert BM25Index.load(index_dir) is None
+        index_catalog(catalog).save(index_dir)
+        index = BM25Index.load(index_dir)
+        hits = index.search("binary heap root", 3, catalog)
+        assert hits and hits[0]["source"] == "content/heaps.json" and hits[0]["coverage"] == 1.0
+        expected = {c["content"] for c in chunk_document(catalog.data(catalog.by_path("content/heaps.json")))}
+        assert hits[0]["content"] in expected and hits[0]["section"] == "theory"
+        assert index.search("binary heap", 3, None) == [], "no catalog, no text"
+
+        # A second save publishes a new build; the loaded index keeps serving the old one
+        first_build = open(os.path.join(index_dir, "CURRENT")).read()
+        index_catalog(catalog).save(index_dir)
+        assert open(os.path.join(index_dir, "CURRENT")).read() != first_build
+        assert index.search("trie prefixes", 3, catalog)[0]["source"] == "content/tries.json"
+
+        # Edited after the build: its hits are dropped until the index is rebuilt
+        write_lesson(content_dir, "heaps", "Heaps", "Heaps were rewritten.")
+        build_catalog(content_dir, catalog_path, log=None)
+        fresh = ContentCatalog.load(catalog_path)
+        assert index.search("binary heap root", 3, fresh) == []
+        catalog.close()
+        fresh.close()
+    print("✅ lexical index: text from the catalog, atomic saves, stale lessons dropped")
+
+
+if __name__ == "__main__":
+    test_search_reads_text_from_catalog()
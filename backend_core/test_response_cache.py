@@ -0,0 +1,97 @@
+"""
+Checks the semantic response cache (inference/cache.py) on both backends: exact and
+near-duplicate hits, the per-intent vector index following evictions, stats counting
+exact-match misses, and a Django-backed clear() that leaves the alias's other keys alone.
+The Django half runs against a local-memory cache and is skipped without Django.
+
+    python test_response_cache.py
+"""
+import numpy as np
+
+from inference.cache import InMemoryCacheBackend, SemanticResponseCache
+
+DIM = 16
+
+
+def vector(seed, noise=0.0):
+    rng = np.random.default_rng(seed)
+    base = rng.normal(size=DIM)
+    return (base + noise * np.random.default_rng(seed + 1000).normal(size=DIM)).tolist()
+
+
+def check_hits(cache):
+    assert cache.get_exact("What is recursion?", "concept_learning") is None
+    cache.set("What is recursion?", "concept_learning", vector(1), {"answer": "recursion"})
+    cache.set("Explain BFS", "concept_learning", None, {"answer": "bfs"}) # lexical fast path
+
+    assert cache.get_exact("  what is RECURSION ", "concept_learning") == {"answer": "recursion"}
+    assert cache.get_exact("Explain BFS", "concept_learning") == {"answer": "bfs"}
+    assert cache.get_similar(vector(1, noise=0.01), "concept_learning") == {"answer": "recursion"}
+    assert cache.get_similar(vector(1, noise=0.01), "problem_solving") is None, "matched across intents"
+    assert cache.get_similar(vector(2), "concept_learning") is None
+
+    stats = cache.stats()
+    assert stats["exact_misses"] == 1 and stats["exact_hits"] == 2
+    assert stats["semantic_hits"] == 1 and stats["semantic_misses"] == 2
+    assert stats["hit_rate"] == 1.0, "hit rate should be hits over every exact lookup"
+    cache.get_exact("never asked", "concept_learning")
+    assert cache.stats()["hit_rate"] == 0.75
+
+
+def test_memory_backend():
+    check_hits(SemanticResponseCache(InMemoryCacheBackend(max_entries=8)))
+    print("✅ memory backend: exact, semantic and stats")
+
+
+def test_memory_eviction_updates_index():
+    backend = InMemoryCacheBackend(max_entries=2)
+    cache = SemanticResponseCache(backend)
+    for i in range(3):
+        cache.set(f"query {i}", "concept_learning", vector(i), {"answer": i})
+    index = backend._vectors["concept_learning"]
+    assert index.keys == [cache._key("query 1", "concept_learning"), cache._key("query 2", "concept_learning")]
+    assert index.matrix.shape == (2, DIM)
+    assert np.allclose(np.linalg.norm(index.matrix, axis=1), 1.0), "rows should be stored unit-normalized"
+    assert cache.get_similar(vector(0), "concept_learning") is None, "evicted entry still matched"
+    assert cache.get_similar(vector(2), "concept_learning") == {"answer": 2}
+    cache.set("query 2", "concept_learning", vector(2), {"answer": "again"}) # same key: row replaced
+    assert len(index.keys) == 2 and cache.get_similar(vector(2), "concept_learning") == {"answer": "again"}
+    print("✅ memory backend: index follows LRU eviction and overwrites")
+
+
+def test_django_backend():
+    try:
+        from django.conf import settings
+    except ImportError:
+        print("⏭️  django not installed, skipping the Django backend")
+        return
+    import django
+    if not settings.configured:
+        settings.configure(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+        django.setup()
+    from django.core.cache import caches
+    from inference.cache import DjangoCacheBackend
+
+    caches["default"].set("unrelated", "keep me")
+    worker_a = SemanticResponseCache(DjangoCacheBackend())
+    worker_b = SemanticResponseCache(DjangoCacheBackend())
+    check_hits(worker_a)
+    # Another worker sees entries it didn't store, and picks up new ones after its first lookup
+    assert worker_b.get_similar(vector(1, noise=0.01), "concept_learning") == {"answer": "recursion"}
+    worker_a.set("What is a heap?", "concept_learning", vector(3), {"answer": "heap"})
+    assert worker_b.get_similar(vector(3), "concept_learning") == {"answer": "heap"}
+
+    worker_a.backend.clear()
+    assert caches["default"].get("unrelated") == "keep me", "clear() flushed the whole alias"
+    assert worker_a.get_exact("What is recursion?", "concept_learning") is None
+    assert worker_b.get_exact("What is recursion?", "concept_learning") is None, "other worker missed the clear"
+    assert worker_b.get_similar(vector(3), "concept_learning") is None
+    worker_b.set("What is a trie?", "concept_learning", vector(4), {"answer": "trie"})
+    assert worker_a.get_similar(vector(4), "concept_learning") == {"answer": "trie"}
+    print("✅ django backend: shared index, generation refresh, scoped clear()")
+
+
+if __name__ == "__main__":
+    test_memory_backend()
+    test_memory_eviction_updates_index()
+    test_django_backend()
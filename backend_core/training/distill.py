@@ -0,0 +1,212 @@
+"""
+Knowledge distillation: DistilBERT (teacher) -> hashed n-gram student (inference/student.py).
+
+Reads a JSONL file or a shard directory (generate_data --shard-size, export_interactions),
+collapses duplicate queries into weighted samples, labels them once with the teacher's
+temperature-softened probabilities and trains the student on those soft labels. A
+deterministic 10% holdout (by text hash) reports, per tier: accuracy against the data's
+labels, agreement with the teacher and single-query latency, plus the student-first
+cascade (coverage / accuracy / mean latency) at several confidence thresholds.
+
+    python -m training.distill
+    python -m training.distill --data training/data
+    python -m training.distill --no-teacher      # gold labels only, when no DistilBERT weights exist
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import zlib
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(BASE_DIR)
+sys.path.insert(0, PROJECT_ROOT)
+
+from inference.student import HashedNgramStudent, softmax  # noqa: E402
+from training.generate_data import TEMPLATES  # noqa: E402
+from training.shards import list_shards, read_records  # noqa: E402
+
+DATA_PATH = os.path.join(PROJECT_ROOT, "training", "synthetic_data.jsonl")
+TEACHER_DIR = os.path.join(PROJECT_ROOT, "inference", "models", "bert_intent")
+STUDENT_DIR = os.path.join(PROJECT_ROOT, "inference", "models", "intent_student")
+THRESHOLDS = (0.5, 0.6, 0.7, 0.8, 0.9, 0.95)
+
+
+def load_samples(path, max_unique):
+    """{text: [count, label]} over the corpus, streamed; stops adding new texts at max_unique."""
+    samples = {}
+    total = 0
+    for record in read_records(list_shards(path)):
+        total += 1
+        text = record.get("text", "").strip()
+        if not text:
+            continue
+        entry = samples.get(text)
+        if entry is not None:
+            entry[0] += 1
+        elif len(samples) < max_unique:
+            samples[text] = [1, record.get("label")]
+    print(f"Loaded {total} samples ({len(samples)} unique queries).")
+    return samples
+
+
+def is_holdout(text: str) -> bool:
+    return zlib.crc32(text.encode()) % 10 == 0
+
+
+class Teacher:
+    """DistilBERT through inference.backends, labels ordered by its label_map.json."""
+    def __init__(self, backend_name, model_dir=TEACHER_DIR, max_len=64):
+        from inference.backends import get_backend
+        with open(os.path.join(model_dir, "label_map.json"), "r") as f:
+            label_map = json.load(f)
+        self.labels = [label for label, _ in sorted(label_map.items(), key=lambda item: item[1])]
+        self.backend = get_backend(backend_name, model_dir, max_len).load()
+
+    def predict_proba(self, texts, chunk_size=64):
+        probs = np.zeros((len(texts), len(self.labels)), dtype=np.float64)
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i])) # similar lengths pad less
+        for start in range(0, len(order), chunk_size):
+            indices = order[start:start + chunk_size]
+            probs[indices] = self.backend.predict_proba([texts[i] for i in indices])
+        return probs
+
+
+def single_query_ms(predict, texts, repeats=200):
+    predict(texts[:1]) # warm
+    timings = []
+    for text in (texts * (repeats // max(len(texts), 1) + 1))[:repeats]:
+        start = time.perf_counter()
+        predict([text])
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def evaluate(student, teacher_probs, texts, gold, teacher_ms, student_ms):
+    student_probs = student.predict_proba(texts)
+    student_pred = student_probs.argmax(axis=1)
+    confidence = student_probs.max(axis=1)
+    teacher_pred = teacher_probs.argmax(axis=1)
+    has_gold = gold >= 0
+
+    def accuracy(pred):
+        return float((pred[has_gold] == gold[has_gold]).mean()) if has_gold.any() else float("nan")
+
+    report = {
+        "holdout": len(texts),
+        "teacher": {"accuracy": accuracy(teacher_pred), "ms_per_query": teacher_ms},
+        "student": {
+            "accuracy": accuracy(student_pred),
+            "agreement": float((student_pred == teacher_pred).mean()),
+            "ms_per_query": student_ms,
+        },
+        "cascade": [],
+    }
+    for threshold in THRESHOLDS:
+        served = confidence >= threshold
+        pred = np.where(served, student_pred, teacher_pred)
+        report["cascade"].append({
+            "threshold": threshold,
+            "student_coverage": float(served.mean()),
+            "accuracy": accuracy(pred),
+            "agreement": float((pred == teacher_pred).mean()),
+            "mean_ms": student_ms + (1 - float(served.mean())) * (teacher_ms or 0.0),
+        })
+    return report
+
+
+def print_report(report):
+    teacher, student = report["teacher"], report["student"]
+    print(f"--- 📊 HOLDOUT ({report['holdout']} unique queries) ---")
+    if teacher["ms_per_query"] is None:
+        print("   teacher: none (--no-teacher; agreement is against the data's labels)")
+    else:
+        print(f"   teacher: accuracy {teacher['accuracy']:.2%} | {teacher['ms_per_query']:.3f} ms/query")
+    print(f"   student: accuracy {student['accuracy']:.2%} | agreement {student['agreement']:.2%} | "
+          f"{student['ms_per_query']:.3f} ms/query")
+    print("   cascade (student first, teacher below threshold):")
+    for row in report["cascade"]:
+        print(f"     >= {row['threshold']:.2f}: student serves {row['student_coverage']:6.1%} | "
+              f"accuracy {row['accuracy']:.2%} | agreement {row['agreement']:.2%} | ~{row['mean_ms']:.3f} ms/query")
+
+
+def distill(data_path=DATA_PATH, out_dir=STUDENT_DIR, teacher_backend="torch", use_teacher=True,
+            temperature=2.0, alpha=0.1, epochs=8, max_unique=500_000, seed=0):
+    print("--- 🧪 DISTILLING INTENT STUDENT (hashed n-grams) ---")
+    samples = load_samples(data_path, max_unique)
+
+    if use_teacher:
+        if not os.path.exists(os.path.join(TEACHER_DIR, "label_map.json")):
+            print(f"❌ No teacher at {TEACHER_DIR}. Train it first (training/train_bert.py) or pass --no-teacher.")
+            return None
+        teacher = Teacher(teacher_backend)
+        labels = teacher.labels
+    else:
+        teacher = None
+        labels = list(TEMPLATES)
+
+    texts = list(samples)
+    counts = np.array([samples[t][0] for t in texts], dtype=np.float64)
+    gold = np.array([labels.index(samples[t][1]) if samples[t][1] in labels else -1 for t in texts])
+    hard = np.eye(len(labels))[np.maximum(gold, 0)] * (gold >= 0)[:, None]
+
+    start = time.perf_counter()
+    if teacher:
+        teacher_probs = teacher.predict_proba(texts)
+        print(f"Teacher labelled {len(texts)} queries in {time.perf_counter() - start:.1f}s")
+    else:
+        teacher_probs = hard * 0.97 + 0.03 / len(labels) # smoothed gold labels stand in for the teacher
+    soft = softmax(np.log(np.clip(teacher_probs, 1e-9, 1.0)) / temperature)
+
+    holdout = np.array([is_holdout(t) for t in texts])
+    train_idx, test_idx = np.flatnonzero(~holdout), np.flatnonzero(holdout)
+    if not len(test_idx): # tiny corpora: evaluate on the training set rather than nothing
+        test_idx = train_idx
+
+    student = HashedNgramStudent(labels)
+    start = time.perf_counter()
+    student.fit(
+        [texts[i] for i in train_idx], soft[train_idx], sample_weight=counts[train_idx],
+        hard_targets=hard[train_idx] if alpha else None,
+        temperature=temperature, alpha=alpha, epochs=epochs, seed=seed,
+    )
+    print(f"Student trained on {len(train_idx)} unique queries in {time.perf_counter() - start:.1f}s")
+
+    test_texts = [texts[i] for i in test_idx]
+    latency_sample = test_texts[:200]
+    teacher_ms = single_query_ms(teacher.backend.predict_proba, latency_sample) if teacher else None
+    student_ms = single_query_ms(student.predict_proba, latency_sample)
+    report = evaluate(student, teacher_probs[test_idx], test_texts, gold[test_idx], teacher_ms, student_ms)
+    print_report(report)
+
+    student.save(
+        out_dir,
+        teacher=teacher.backend.model_version if teacher else None,
+        temperature=temperature,
+        trained_on=len(train_idx),
+        report=report,
+    )
+    print(f"✅ Student saved to {out_dir} (serve with INTENT_STUDENT=true, INTENT_STUDENT_THRESHOLD)")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distil DistilBERT into the hashed n-gram intent student")
+    parser.add_argument("--data", default=DATA_PATH, help="Training JSONL or shard directory")
+    parser.add_argument("--out", default=STUDENT_DIR)
+    parser.add_argument("--backend", default="torch", help="Teacher backend (inference/backends.py)")
+    parser.add_argument("--no-teacher", action="store_true", help="Train on the data's own labels")
+    parser.add_argument("--temperature", type=float, default=2.0)
+    parser.add_argument("--alpha", type=float, default=0.1, help="Weight of the hard-label loss")
+    parser.add_argument("--epochs", type=int, default=8)
+    parser.add_argument("--max-unique", type=int, default=500_000, help="Cap on distinct queries kept")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    report = distill(args.data, args.out, args.backend, not args.no_teacher, args.temperature,
+                     args.alpha, args.epochs, args.max_unique, args.seed)
+    sys.exit(0 if report else 1)
@@ -1,6 +1,8 @@
+import argparse
 import random
 import json
 import os
+import time
 
 TOPICS = [
     "binary search", "linked lists", "recursion", "dynamic programming", "hash maps", "trees"
@@ -33,26 +35,54 @@ TEMPLATES = {
     ]
 }
 
-def generate_data(num_samples=100, output_file="synthetic_data.jsonl"):
-    print(f"Generating {num_samples} samples...")
-    data = []
-    
+def iter_samples(num_samples, seed=None):
+    """Yields {"text", "label"} samples one at a time; a seed makes the sequence reproducible."""
+    rng = random.Random(seed) if seed is not None else random
+    intents = list(TEMPLATES.keys())
     for _ in range(num_samples):
-        intent = random.choice(list(TEMPLATES.keys()))
-        template = random.choice(TEMPLATES[intent])
-        topic = random.choice(TOPICS)
-        query = template.format(topic=topic)
-        
-        data.append({
-            "text": query,
+        intent = rng.choice(intents)
+        template = rng.choice(TEMPLATES[intent])
+        topic = rng.choice(TOPICS)
+        yield {
+            "text": template.format(topic=topic),
             "label": intent
-        })
-        
+        }
+
+def generate_data(num_samples=100, output_file="synthetic_data.jsonl", seed=None):
+    print(f"Generating {num_samples} samples...")
     with open(output_file, "w") as f:
-        for item in data:
+        for item in iter_samples(num_samples, seed):
             f.write(json.dumps(item) + "\n")
             
     print(f"Saved to {output_file}")
 
+def generate_shards(num_samples, output_dir, shard_size=100_000, seed=0, compress=True):
+    """
+    Streams `num_samples` samples into sharded (gzip) JSONL under `output_dir`, with a
+    manifest for training.shards / train_bert's streaming loader. Memory use does not
+    grow with num_samples.
+    """
+    from training.shards import ShardWriter
+
+    print(f"Generating {num_samples} samples into {output_dir} ({shard_size} per shard)...")
+    start = time.perf_counter()
+    with ShardWriter(output_dir, shard_size=shard_size, compress=compress) as writer:
+        for item in iter_samples(num_samples, seed):
+            writer.write(item)
+    elapsed = time.perf_counter() - start
+    print(f"Saved {writer.total} samples in {len(writer.shards)} shards ({writer.total / elapsed:.0f} samples/s)")
+    return writer.shards
+
 if __name__ == "__main__":
-    generate_data()
+    parser = argparse.ArgumentParser(description="Synthetic intent training data")
+    parser.add_argument("--samples", type=int, default=100)
+    parser.add_argument("--out", default="synthetic_data.jsonl", help="JSONL file, or a directory with --shard-size")
+    parser.add_argument("--shard-size", type=int, default=0, help="Write sharded JSONL with this many samples per shard")
+    parser.add_argument("--no-compress", action="store_true", help="Plain .jsonl shards instead of .jsonl.gz")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.shard_size:
+        generate_shards(args.samples, args.out, args.shard_size, args.seed or 0, not args.no_compress)
+    else:
+        generate_data(args.samples, args.out, args.seed)
@@ -1,8 +1,12 @@
 import json
 import os
+import sys
+import time
+import argparse
+import hashlib
 import torch
-from torch.utils.data import Dataset, DataLoader
-from transformers import DistilBertTokenizer, DistilBertForSequenceClassification
+from torch.utils.data import Dataset, IterableDataset, DataLoader, Sampler, get_worker_info
+from transformers import DistilBertTokenizerFast, DistilBertForSequenceClassification
 from torch.optim import AdamW
 import random
 
@@ -12,12 +16,18 @@ BATCH_SIZE = 8       # Low for memory safety
 LEARNING_RATE = 5e-5
 MODEL_NAME = 'distilbert-base-uncased'
 MAX_LEN = 64         # Short text inputs
+SEED = 42
+SHUFFLE_BUFFER = 10_000 # Streaming: samples held for shuffling, per loader worker
+POOL_BATCHES = 50    # Length-sorting window, in batches
+NUM_WORKERS = int(os.getenv("TRAIN_NUM_WORKERS", "2"))
+NUM_THREADS = int(os.getenv("TRAIN_NUM_THREADS", "0")) # 0 = cores left over after the loader workers
 
 # --- PATHS ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(BASE_DIR)
 DATA_PATH = os.path.join(PROJECT_ROOT, "training", "synthetic_data.jsonl")
 MODEL_SAVE_DIR = os.path.join(PROJECT_ROOT, "inference", "models", "bert_intent")
+TOKEN_CACHE_DIR = os.path.join(PROJECT_ROOT, "cache", "training")
 
 # Ensure synthetic data exists
 if not os.path.exists(DATA_PATH):
@@ -33,56 +43,250 @@ LABEL_MAP = {
     "quick_revision": 3
 }
 
+def pretokenize(data_path, tokenizer, max_len=MAX_LEN, cache_dir=TOKEN_CACHE_DIR, rebuild=False):
+    """
+    Tokenizes the JSONL once and caches it as unpadded token ids in a single tensor file.
+    The cache key covers the source file (size + mtime), tokenizer and max_len, so editing
+    the data or changing the tokenizer rebuilds it. Returns {"ids", "offsets", "labels"}:
+    sample i is ids[offsets[i]:offsets[i + 1]].
+    """
+    stat = os.stat(data_path)
+    key = hashlib.sha256(
+        f"{os.path.abspath(data_path)}|{stat.st_size}|{stat.st_mtime_ns}|"
+        f"{tokenizer.name_or_path}|{len(tokenizer)}|{max_len}".encode()
+    ).hexdigest()[:16]
+    cache_path = os.path.join(cache_dir, f"{os.path.basename(data_path)}.{key}.pt")
+    if not rebuild and os.path.exists(cache_path):
+        print(f"Loaded pre-tokenized samples from {cache_path}")
+        return torch.load(cache_path)
+
+    start = time.perf_counter()
+    texts, labels = [], []
+    with open(data_path, 'r') as f:
+        for line in f:
+            item = json.loads(line)
+            texts.append(item['text'])
+            labels.append(LABEL_MAP.get(item['label'], 0)) # Default to 0 if unknown
+
+    encoded = tokenizer(texts, add_special_tokens=True, truncation=True, max_length=max_len)["input_ids"]
+    lengths = torch.tensor([len(ids) for ids in encoded], dtype=torch.long)
+    offsets = torch.zeros(len(encoded) + 1, dtype=torch.long)
+    torch.cumsum(lengths, dim=0, out=offsets[1:])
+    data = {
+        "ids": torch.tensor([t for ids in encoded for t in ids], dtype=torch.int32),
+        "offsets": offsets,
+        "labels": torch.tensor(labels, dtype=torch.long),
+    }
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = cache_path + ".tmp"
+    torch.save(data, tmp_path)
+    os.replace(tmp_path, cache_path)
+    print(f"Tokenized {len(texts)} samples in {time.perf_counter() - start:.2f}s -> {cache_path}")
+    return data
+
 class IntentDataset(Dataset):
-    def __init__(self, data, tokenizer, max_len):
-        self.data = data
-        self.tokenizer = tokenizer
-        self.max_len = max_len
+    """Pre-tokenized samples from pretokenize(); padding happens per batch in PadCollator."""
+    def __init__(self, data):
+        self.ids = data["ids"]
+        self.offsets = data["offsets"]
+        self.labels = data["labels"]
+        self.lengths = (self.offsets[1:] - self.offsets[:-1]).tolist()
 
     def __len__(self):
-        return len(self.data)
+        return len(self.labels)
 
     def __getitem__(self, index):
-        text = self.data[index]['text']
-        label = self.data[index]['label']
-        label_id = LABEL_MAP.get(label, 0) # Default to 0 if unknown
-
-        encoding = self.tokenizer.encode_plus(
-            text,
-            add_special_tokens=True,
-            max_length=self.max_len,
-            return_token_type_ids=False,
-            padding='max_length',
-            truncation=True,
-            return_attention_mask=True,
-            return_tensors='pt',
-        )
+        ids = self.ids[self.offsets[index]:self.offsets[index + 1]].long()
+        return ids, self.labels[index]
+
+class LengthBucketSampler(Sampler):
+    """
+    Yields batches of similar-length samples: shuffles, sorts each window of
+    `pool_batches` batches by length, cuts it into batches and shuffles the batch order.
+    Seeded per epoch (set_epoch) so runs are reproducible.
+    """
+    def __init__(self, lengths, batch_size, shuffle=True, seed=SEED, pool_batches=POOL_BATCHES):
+        self.lengths = lengths
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.seed = seed
+        self.pool_size = batch_size * pool_batches
+        self.epoch = 0
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def __len__(self):
+        full, rest = divmod(len(self.lengths), self.pool_size)
+        return full * (self.pool_size // self.batch_size) + -(-rest // self.batch_size)
+
+    def __iter__(self):
+        generator = torch.Generator()
+        generator.manual_seed(self.seed + self.epoch)
+        if self.shuffle:
+            order = torch.randperm(len(self.lengths), generator=generator).tolist()
+        else:
+            order = list(range(len(self.lengths)))
+
+        batches = []
+        for i in range(0, len(order), self.pool_size):
+            pool = sorted(order[i:i + self.pool_size], key=self.lengths.__getitem__)
+            batches.extend(pool[j:j + self.batch_size] for j in range(0, len(pool), self.batch_size))
+        if self.shuffle:
+            batches = [batches[i] for i in torch.randperm(len(batches), generator=generator).tolist()]
+        return iter(batches)
 
+class PadCollator:
+    """Pads a batch to its longest sample (not MAX_LEN)."""
+    def __init__(self, pad_id):
+        self.pad_id = pad_id
+
+    def __call__(self, batch):
+        width = max(len(ids) for ids, _ in batch)
+        input_ids = torch.full((len(batch), width), self.pad_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(batch), width), dtype=torch.long)
+        for row, (ids, _) in enumerate(batch):
+            input_ids[row, :len(ids)] = ids
+            attention_mask[row, :len(ids)] = 1
         return {
-            'text': text,
-            'input_ids': encoding['input_ids'].flatten(),
-            'attention_mask': encoding['attention_mask'].flatten(),
-            'labels': torch.tensor(label_id, dtype=torch.long)
+            'input_ids': input_ids,
+            'attention_mask': attention_mask,
+            'labels': torch.stack([label for _, label in batch]),
         }
 
-def train():
+class StreamingIntentDataset(IterableDataset):
+    """
+    Streams a sharded corpus (training/shards.py) for datasets too big to pre-tokenize in
+    memory. Each epoch shuffles shard order, splits shards across loader workers, mixes
+    samples through a fixed-size shuffle buffer, then tokenizes and length-buckets them a
+    pool at a time. Yields ready batches (use batch_size=None with PadCollator). All
+    randomness derives from (seed, epoch, worker), so runs are reproducible; memory is
+    bounded by the buffer and pool sizes, not the corpus.
+    """
+    def __init__(self, path, tokenizer, batch_size=BATCH_SIZE, max_len=MAX_LEN,
+                 shuffle_buffer=SHUFFLE_BUFFER, pool_batches=POOL_BATCHES, seed=SEED):
+        from training.shards import count_records, list_shards
+        self.shards = list_shards(path)
+        self.total = count_records(path)
+        self.tokenizer = tokenizer
+        self.batch_size = batch_size
+        self.max_len = max_len
+        self.shuffle_buffer = shuffle_buffer
+        self.pool_size = batch_size * pool_batches
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def _worker_shards(self, rng):
+        shards = list(self.shards)
+        rng.shuffle(shards)
+        info = get_worker_info()
+        if info is None:
+            return shards
+        if len(shards) < info.num_workers and info.id == 0:
+            print(f"⚠️ {len(shards)} shards for {info.num_workers} loader workers; some workers will idle")
+        return shards[info.id::info.num_workers]
+
+    def _shuffled(self, records, rng):
+        buffer = []
+        for record in records:
+            if len(buffer) < self.shuffle_buffer:
+                buffer.append(record)
+                continue
+            i = rng.randrange(len(buffer))
+            yield buffer[i]
+            buffer[i] = record
+        rng.shuffle(buffer)
+        yield from buffer
+
+    def _batches(self, pool, rng):
+        encoded = self.tokenizer(
+            [item['text'] for item in pool], add_special_tokens=True, truncation=True, max_length=self.max_len
+        )["input_ids"]
+        samples = sorted(
+            ((torch.tensor(ids, dtype=torch.long), torch.tensor(LABEL_MAP.get(item['label'], 0), dtype=torch.long))
+             for ids, item in zip(encoded, pool)),
+            key=lambda sample: len(sample[0]),
+        )
+        batches = [samples[i:i + self.batch_size] for i in range(0, len(samples), self.batch_size)]
+        rng.shuffle(batches)
+        return batches
+
+    def __iter__(self):
+        from training.shards import read_records
+        info = get_worker_info()
+        worker_id = info.id if info else 0
+        shard_rng = random.Random(self.seed * 1000003 + self.epoch) # same order in every worker
+        rng = random.Random((self.seed * 1000003 + self.epoch) * 1009 + worker_id)
+
+        pool = []
+        for record in self._shuffled(read_records(self._worker_shards(shard_rng)), rng):
+            pool.append(record)
+            if len(pool) >= self.pool_size:
+                yield from self._batches(pool, rng)
+                pool = []
+        if pool:
+            yield from self._batches(pool, rng)
+
+def configure_threads(num_workers, num_threads=NUM_THREADS):
+    """
+    Gives the training process the cores the loader workers don't use; each worker
+    gets one thread (worker_init) so they don't oversubscribe the CPU.
+    """
+    if num_threads <= 0:
+        num_threads = max(1, (os.cpu_count() or 1) - num_workers)
+    torch.set_num_threads(num_threads)
+    return num_threads
+
+def worker_init(_worker_id):
+    torch.set_num_threads(1)
+
+def train(data_path=DATA_PATH, num_workers=NUM_WORKERS, num_threads=NUM_THREADS, rebuild_cache=False):
     print("--- 🧠 INITIALIZING NEURAL TRAINING (DistilBERT) ---")
-    
-    # 1. Load Data
-    raw_data = []
-    with open(DATA_PATH, 'r') as f:
-        for line in f:
-            raw_data.append(json.loads(line))
-    print(f"Loaded {len(raw_data)} training samples.")
+    torch.manual_seed(SEED)
 
-    # 2. Tokenizer & Dataset
-    tokenizer = DistilBertTokenizer.from_pretrained(MODEL_NAME)
-    dataset = IntentDataset(raw_data, tokenizer, MAX_LEN)
-    loader = DataLoader(dataset, batch_size=BATCH_SIZE, shuffle=True)
+    # 1. Load Data: a JSONL file is tokenized once and cached; a shard directory is streamed
+    tokenizer = DistilBertTokenizerFast.from_pretrained(MODEL_NAME)
+    collate = PadCollator(tokenizer.pad_token_id)
+    if os.path.isdir(data_path):
+        dataset = StreamingIntentDataset(data_path, tokenizer)
+        print(f"Streaming {dataset.total or 'an unknown number of'} training samples from {len(dataset.shards)} shards.")
+        sampler = dataset
+        # Not persistent: workers must pick up set_epoch() through a fresh copy each epoch
+        loader = DataLoader(
+            dataset,
+            batch_size=None,
+            collate_fn=collate,
+            num_workers=num_workers,
+            worker_init_fn=worker_init if num_workers else None,
+            pin_memory=torch.cuda.is_available(),
+        )
+    else:
+        dataset = IntentDataset(pretokenize(data_path, tokenizer, MAX_LEN, rebuild=rebuild_cache))
+        print(f"Loaded {len(dataset)} training samples.")
+
+        # 2. Length-bucketed, dynamically padded batches
+        sampler = LengthBucketSampler(dataset.lengths, BATCH_SIZE)
+        loader = DataLoader(
+            dataset,
+            batch_sampler=sampler,
+            collate_fn=collate,
+            num_workers=num_workers,
+            worker_init_fn=worker_init if num_workers else None,
+            persistent_workers=num_workers > 0,
+            pin_memory=torch.cuda.is_available(),
+        )
 
     # 3. Model
     device = torch.device('cuda') if torch.cuda.is_available() else torch.device('cpu')
-    print(f"Training on: {device}")
+    if device.type == 'cpu':
+        threads = configure_threads(num_workers, num_threads)
+        print(f"Training on: cpu ({threads} threads, {num_workers} loader workers)")
+    else:
+        print(f"Training on: {device} ({num_workers} loader workers)")
     
     model = DistilBertForSequenceClassification.from_pretrained(
         MODEL_NAME, 
@@ -96,13 +300,20 @@ def train():
 
     # 5. Training Loop
     for epoch in range(EPOCHS):
+        sampler.set_epoch(epoch)
         total_loss = 0
+        batches = samples = tokens = padded = 0
+        start = time.perf_counter()
         for batch in loader:
             optimizer.zero_grad()
+            batches += 1
+            samples += batch['labels'].size(0)
+            tokens += int(batch['attention_mask'].sum()) # counted on the CPU copy, no device sync
+            padded += batch['attention_mask'].numel()
             
-            input_ids = batch['input_ids'].to(device)
-            mask = batch['attention_mask'].to(device)
-            labels = batch['labels'].to(device)
+            input_ids = batch['input_ids'].to(device, non_blocking=True)
+            mask = batch['attention_mask'].to(device, non_blocking=True)
+            labels = batch['labels'].to(device, non_blocking=True)
             
             outputs = model(input_ids, attention_mask=mask, labels=labels)
             loss = outputs.loss
@@ -111,8 +322,12 @@ def train():
             loss.backward()
             optimizer.step()
             
-        avg_loss = total_loss / len(loader)
-        print(f"Epoch {epoch+1}/{EPOCHS} | Loss: {avg_loss:.4f}")
+        elapsed = time.perf_counter() - start
+        avg_loss = total_loss / max(batches, 1)
+        print(
+            f"Epoch {epoch+1}/{EPOCHS} | Loss: {avg_loss:.4f} | {elapsed:.1f}s | "
+            f"{samples / elapsed:.1f} samples/s | padding {1 - tokens / max(padded, 1):.0%}"
+        )
 
     # 6. Save Artifacts
     if not os.path.exists(MODEL_SAVE_DIR):
@@ -128,5 +343,87 @@ def train():
         
     print("✅ Training Complete. The Brain is Ready.")
 
+def export_onnx(model_dir=MODEL_SAVE_DIR, opset=14):
+    """
+    Exports the trained classifier to `model.onnx` for INTENT_BACKEND=onnx.
+    Sequence and batch axes stay dynamic so the engine can pad per batch. Traces with the
+    fast tokenizer the serving backends load (inference/backends.py), so parity compares
+    like with like. Needs requirements-onnx.txt.
+    """
+    print(f"--- 📦 EXPORTING ONNX GRAPH ({model_dir}) ---")
+    tokenizer = DistilBertTokenizerFast.from_pretrained(model_dir)
+    model = DistilBertForSequenceClassification.from_pretrained(model_dir)
+    model.eval()
+    model.config.return_dict = False
+
+    sample = tokenizer(["What is binary search?"], return_tensors="pt", padding=True)
+    out_path = os.path.join(model_dir, "model.onnx")
+    torch.onnx.export(
+        model,
+        (sample["input_ids"], sample["attention_mask"]),
+        out_path,
+        input_names=["input_ids", "attention_mask"],
+        output_names=["logits"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "logits": {0: "batch"},
+        },
+        opset_version=opset,
+    )
+    print(f"✅ Exported {out_path}")
+    return out_path
+
+def check_parity(backend_name, data_path=DATA_PATH, model_dir=MODEL_SAVE_DIR):
+    """
+    Confirms `backend_name` predicts the same labels as the fp32 reference on `data_path`
+    and reports per-query latency for both. Returns True when every label matches.
+    """
+    sys.path.insert(0, PROJECT_ROOT)
+    from inference.backends import get_backend
+
+    texts = []
+    with open(data_path, 'r') as f:
+        for line in f:
+            texts.append(json.loads(line)['text'])
+
+    print(f"--- ⚖️  PARITY CHECK: torch (fp32) vs {backend_name} on {len(texts)} samples ---")
+    results = {}
+    for name in ("torch", backend_name):
+        backend = get_backend(name, model_dir, MAX_LEN).load()
+        backend.predict_proba(texts[:1]) # warm
+        start = time.perf_counter()
+        preds = [int(backend.predict_proba([t]).argmax(axis=1)[0]) for t in texts]
+        elapsed_ms = (time.perf_counter() - start) * 1000 / len(texts)
+        results[name] = (preds, elapsed_ms)
+        print(f"   {name:>6}: {elapsed_ms:.2f} ms/query")
+
+    reference, ref_ms = results["torch"]
+    candidate, cand_ms = results[backend_name]
+    mismatches = [texts[i] for i, (a, b) in enumerate(zip(reference, candidate)) if a != b]
+    print(f"   Speedup: {ref_ms / cand_ms:.2f}x | Label mismatches: {len(mismatches)}/{len(texts)}")
+    for text in mismatches[:10]:
+        print(f"   ✗ {text}")
+
+    if mismatches:
+        print("❌ Parity check FAILED")
+        return False
+    print("✅ Parity check passed")
+    return True
+
 if __name__ == "__main__":
-    train()
+    parser = argparse.ArgumentParser(description="DistilBERT intent model pipeline")
+    parser.add_argument("command", nargs="?", default="train", choices=["train", "export-onnx", "parity"])
+    parser.add_argument("--backend", default="onnx", help="Backend to compare against fp32 (parity)")
+    parser.add_argument("--data", default=DATA_PATH, help="Training JSONL, or a shard directory to stream (train)")
+    parser.add_argument("--num-workers", type=int, default=NUM_WORKERS, help="DataLoader worker processes (train)")
+    parser.add_argument("--threads", type=int, default=NUM_THREADS, help="Torch CPU threads, 0 = auto (train)")
+    parser.add_argument("--rebuild-cache", action="store_true", help="Re-tokenize even if a cache exists (train)")
+    args = parser.parse_args()
+
+    if args.command == "train":
+        train(args.data, args.num_workers, args.threads, args.rebuild_cache)
+    elif args.command == "export-onnx":
+        export_onnx()
+    elif args.command == "parity":
+        sys.exit(0 if check_parity(args.backend) else 1)